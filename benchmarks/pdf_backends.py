@@ -0,0 +1,102 @@
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from local_config import global_config
+from benchmarks.sample_documents import DEFAULT_STYLE, sample_resume_html
+from src.utils.pdf_renderer import PDF_RENDERERS, get_pdf_renderer
+
+try:
+    import psutil
+except ImportError:  # without psutil only the memory of the Python process is reported
+    psutil = None
+
+"""
+Throughput (documents per second) and peak resident memory of the PDF backends, each one measured in a fresh process.
+With psutil installed the peak covers the whole process tree (chromedriver and Chrome included), sampled every 50 ms;
+without it, only the Python process.
+
+Run it from the repository root: `python -m benchmarks.pdf_backends --documents 50` (the chrome backend needs Chrome).
+"""
+
+
+def process_tree_rss_mb() -> float:
+    process = psutil.Process()
+    return sum(p.memory_info().rss for p in [process, *process.children(recursive=True)]) / (1024 * 1024)
+
+
+class PeakMemorySampler(threading.Thread):
+
+    def __init__(self, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak_mb = max(self.peak_mb, process_tree_rss_mb())
+            self._stop_event.wait(self.interval)
+
+    def stop(self) -> float:
+        self._stop_event.set()
+        self.join()
+        return self.peak_mb
+
+
+def measure(backend: str, documents: int, style: str) -> dict:
+    # Every document is printed, not copied from the render cache of a previous run
+    global_config.PDF_RENDER_CACHE_ENABLED = False
+    sampler = PeakMemorySampler() if psutil is not None else None
+    if sampler is not None:
+        sampler.start()
+    renderer = get_pdf_renderer(backend)
+    html_docs = [sample_resume_html(style, variant) for variant in range(documents)]
+    with tempfile.TemporaryDirectory() as directory:
+        # Warm up document, pays for the browser launch (chrome) or the module imports (reportlab)
+        renderer.render(sample_resume_html(style, variant=-1))
+        output_paths = [Path(directory) / f"{variant}.pdf" for variant in range(documents)]
+        start = time.perf_counter()
+        renderer.render_many(html_docs, output_paths)
+        seconds = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss_mb = sampler.stop() if sampler is not None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "backend": backend,
+        "documents": documents,
+        "seconds": seconds,
+        "docs_per_second": documents / seconds,
+        "peak_rss_mb": peak_rss_mb,
+        "process_tree": sampler is not None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Documents per second and peak RSS of the PDF render backends")
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--style", default=DEFAULT_STYLE, help="CSS file of src/generate_templates/styles/resumes")
+    parser.add_argument("--backend", choices=list(PDF_RENDERERS), help="Measure one backend in this process")
+    args = parser.parse_args()
+
+    if args.backend:
+        print(json.dumps(measure(args.backend, args.documents, args.style)))
+        sys.exit(0)
+
+    print(f"{'backend':<10} {'docs':>5} {'seconds':>8} {'docs/s':>8} {'peak RSS MB':>12}")
+    for backend in PDF_RENDERERS:
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.pdf_backends", "--backend", backend,
+             "--documents", str(args.documents), "--style", args.style],
+            capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            print(f"{backend:<10} failed: {completed.stderr.strip().splitlines()[-1:]}")
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(f"{backend:<10} {result['documents']:>5} {result['seconds']:>8.2f} {result['docs_per_second']:>8.2f} "
+              f"{result['peak_rss_mb']:>12.0f}")
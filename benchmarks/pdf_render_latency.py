@@ -0,0 +1,69 @@
+import argparse
+import os
+import tempfile
+import time
+import urllib.parse
+from selenium.webdriver.chrome.webdriver import WebDriver
+from benchmarks.sample_documents import DEFAULT_STYLE, sample_resume_html
+from src.utils.chrome_utils import HTML_to_PDF, HTML_to_PDF_file, PDF_PRINT_OPTIONS, init_browser
+from src.utils.tracing import LatencyHistogram
+
+"""
+Per document PDF render latency of the readiness strategies:
+- fixed_sleep: load the page as a data: URL and wait 2 seconds before printing, what HTML_to_PDF used to do
+- event: HTML_to_PDF as it is, printing once the page loaded, the fonts are ready and the network is quiet
+- stream: HTML_to_PDF_file, same readiness but the PDF is streamed to a file instead of returned as base64
+
+Needs Chrome. Run it from the repository root: `python -m benchmarks.pdf_render_latency --documents 20`
+"""
+
+FIXED_SLEEP_SECONDS = 2
+
+
+def render_fixed_sleep(html_content: str, driver: WebDriver) -> str:
+    driver.get(f"data:text/html;charset=utf-8,{urllib.parse.quote(html_content)}")
+    time.sleep(FIXED_SLEEP_SECONDS)
+    return driver.execute_cdp_cmd("Page.printToPDF", PDF_PRINT_OPTIONS)["data"]
+
+
+def render_stream(html_content: str, driver: WebDriver) -> int:
+    with tempfile.TemporaryDirectory() as directory:
+        return HTML_to_PDF_file(html_content, driver, os.path.join(directory, "resume.pdf"))
+
+
+STRATEGIES = {
+    "fixed_sleep": render_fixed_sleep,
+    "event": HTML_to_PDF,
+    "stream": render_stream,
+}
+
+
+def run(strategy: str, documents: int, style: str, driver: WebDriver) -> LatencyHistogram:
+    render = STRATEGIES[strategy]
+    histogram = LatencyHistogram()
+    # Warm up run, the first page of a browser pays for its renderer process and the font download
+    render(sample_resume_html(style, variant=-1), driver)
+    for variant in range(documents):
+        html_content = sample_resume_html(style, variant)
+        start = time.perf_counter()
+        render(html_content, driver)
+        histogram.record(time.perf_counter() - start)
+    return histogram
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per document PDF render latency, fixed sleep against event driven")
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--style", default=DEFAULT_STYLE, help="CSS file of src/generate_templates/styles/resumes")
+    parser.add_argument("--strategy", choices=[*STRATEGIES, "all"], default="all")
+    args = parser.parse_args()
+
+    browser = init_browser(headless=True)
+    try:
+        print(f"{'strategy':<12} {'docs':>5} {'p50 s':>8} {'p95 s':>8} {'max s':>8} {'docs/s':>8}")
+        for name in (STRATEGIES if args.strategy == "all" else [args.strategy]):
+            result = run(name, args.documents, args.style, browser)
+            print(f"{name:<12} {result.count:>5} {result.percentile(50):>8.3f} {result.percentile(95):>8.3f} "
+                  f"{result.max_seconds:>8.3f} {result.count / result.total_seconds:>8.2f}")
+    finally:
+        browser.quit()
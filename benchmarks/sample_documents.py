@@ -0,0 +1,21 @@
+from pathlib import Path
+from string import Template
+from local_config import global_config
+from src.generate_templates.resume_json_renderer import render_section
+from src.utils.llm_utils.mock_openai_server import CANNED_SECTIONS
+
+"""
+Sample documents shared by the benchmarks: a complete resume built from the mock server's canned sections, in any of
+the styles of src/generate_templates/styles/resumes, so renders are measured on realistic HTML without an LLM call.
+"""
+
+STYLES_DIRECTORY = Path(__file__).resolve().parent.parent / "src" / "generate_templates" / "styles" / "resumes"
+DEFAULT_STYLE = "style_cloyola.css"
+
+
+def sample_resume_html(style_file: str = DEFAULT_STYLE, variant: int = 0) -> str:
+    # variant changes the name in the header, so documents of a run are distinct (and never served from a cache)
+    sections = dict(CANNED_SECTIONS, header=dict(CANNED_SECTIONS["header"], name=f"Jane Doe {variant}"))
+    body_html = "\n".join(render_section(name, data) for name, data in sections.items())
+    style_css = (STYLES_DIRECTORY / style_file).read_text(encoding="utf-8")
+    return Template(global_config.html_template).substitute(body=body_html, style_css=style_css)
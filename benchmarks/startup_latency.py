@@ -0,0 +1,110 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Stamped before the heavy imports, only used when the benchmark is not given the parent's launch time
+IMPORT_STARTED_AT = time.time()
+
+import yaml
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service as ChromeService
+from local_config import global_config
+from benchmarks.sample_documents import DEFAULT_STYLE, sample_resume_html
+from src.utils.chrome_render_pool import ChromeRenderPool
+from src.utils.chrome_utils import chrome_browser_options, init_browser
+
+"""
+Time from process start to the first PDF on disk, each run in a fresh Python process (interpreter start and imports
+included). Scenarios:
+- install: chromedriver looked up with ChromeDriverManager().install() on launch, what init_browser used to do
+- cold: ChromeDriverResolver with no record yet, it resolves the driver and records it
+- cached: ChromeDriverResolver reusing the record of the previous run
+- prewarm: cached, and the browser launched in the background while the configuration is parsed, like main()
+Between process start and the render every run parses the YAML files of data_folder_example, plus --work-seconds of
+idle time standing in for the resume generation.
+
+Needs Chrome. Run it from the repository root: `python -m benchmarks.startup_latency --runs 5`
+"""
+
+SCENARIOS = ("install", "cold", "cached", "prewarm")
+CONFIG_DIRECTORY = Path(__file__).resolve().parents[1] / "data_folder_example"
+
+
+def install_driver_factory():
+    from webdriver_manager.chrome import ChromeDriverManager
+    options = chrome_browser_options(headless=True)
+    return webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=options)
+
+
+def first_pdf(scenario: str, started_at: float, work_seconds: float, style: str) -> dict:
+    imported = time.time() - started_at
+    if scenario == "install":
+        pool = ChromeRenderPool(size=1, driver_factory=install_driver_factory)
+    else:
+        pool = ChromeRenderPool(size=1, driver_factory=lambda: init_browser(headless=True))
+    if scenario == "prewarm":
+        pool.prewarm_in_background()
+
+    for config_file in sorted(CONFIG_DIRECTORY.glob("*.yaml")):
+        yaml.safe_load(config_file.read_text(encoding="utf-8"))
+    time.sleep(work_seconds)
+    html_content = sample_resume_html(style)
+
+    with tempfile.TemporaryDirectory() as directory:
+        pool.render_to_file(html_content, Path(directory) / "resume.pdf")
+        seconds = time.time() - started_at
+    pool.shutdown()
+    return {"scenario": scenario, "seconds": seconds, "imported_seconds": imported}
+
+
+def run(scenario: str, runs: int, work_seconds: float, style: str, cache_path: Path) -> list:
+    results = []
+    for _ in range(runs):
+        if scenario == "cold":
+            cache_path.unlink(missing_ok=True)
+        started_at = time.time()
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup_latency", "--scenario", scenario, "--started-at",
+             str(started_at), "--work-seconds", str(work_seconds), "--style", style, "--cache-path", str(cache_path)],
+            capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"{scenario} run failed: {completed.stderr.strip().splitlines()[-1:]}")
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time from process start to the first PDF")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--work-seconds", type=float, default=0.0, help="Idle time standing in for resume generation")
+    parser.add_argument("--style", default=DEFAULT_STYLE, help="CSS file of src/generate_templates/styles/resumes")
+    parser.add_argument("--scenario", choices=SCENARIOS, help="Measure one scenario in this process")
+    parser.add_argument("--started-at", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--cache-path", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        if args.cache_path:
+            global_config.CHROMEDRIVER_CACHE_PATH = args.cache_path
+        print(json.dumps(first_pdf(args.scenario, args.started_at or IMPORT_STARTED_AT, args.work_seconds, args.style)))
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as cache_directory:
+        cache_path = Path(cache_directory) / "chromedriver.json"
+        print(f"{'scenario':<10} {'runs':>5} {'median s':>9} {'max s':>8} {'imports s':>10}")
+        for scenario in SCENARIOS:
+            try:
+                results = run(scenario, args.runs, args.work_seconds, args.style, cache_path)
+            except RuntimeError as e:
+                print(f"{scenario:<10} {e}")
+                continue
+            seconds = [result["seconds"] for result in results]
+            imported = statistics.median(result["imported_seconds"] for result in results)
+            print(f"{scenario:<10} {len(results):>5} {statistics.median(seconds):>9.2f} {max(seconds):>8.2f} "
+                  f"{imported:>10.2f}")
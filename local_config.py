@@ -1,4 +1,5 @@
 # In this file, you can set the configurations of the app.
+import os
 from pathlib import Path
 from src.utils.constants import DEBUG, ERROR, LLM_MODEL, OPENAI
 
@@ -26,7 +27,8 @@ class GlobalConfig:
 
         self.LLM_MODEL_TYPE = 'openai'
         self.LLM_MODEL = 'gpt-4o'
-        # Only required for OLLAMA models
+        # Required for OLLAMA models. For openai it overrides the endpoint, e.g. "http://127.0.0.1:8089/v1" for
+        # src/utils/llm_utils/mock_openai_server.py
         self.LLM_API_URL = ''
 
         # This controls how many times we attempt to contact openAI to get an answer before declaring it an error
@@ -34,6 +36,177 @@ class GlobalConfig:
         # This is how long we wait for a 200 response from openAI before declaring it timeout'd
         self.OPEN_AI_DELAY = 10
 
+        # Disk backed cache of LLM responses keyed on model, temperature and the rendered prompt, identical prompts are
+        # answered locally instead of calling the provider again. Entries are evicted by count (LRU) and by age.
+        self.LLM_CACHE_ENABLED = True
+        self.LLM_CACHE_PATH: Path = self.LOG_OUTPUT_FILE_PATH / "llm_response_cache.sqlite3"
+        self.LLM_CACHE_MAX_ENTRIES = 5000
+        self.LLM_CACHE_MAX_AGE_SECONDS = 60 * 60 * 24 * 30
+
+        # Record/replay of model calls. "record" saves every request and response (with latency and usage) to the
+        # cassette file, "replay" answers from it without any provider client or API key, None talks to the provider.
+        # While recording the response cache and the resume fragment store are bypassed, so every prompt of the run
+        # reaches the model and ends up in the cassette.
+        self.LLM_CASSETTE_MODE = None
+        self.LLM_CASSETTE_PATH: Path = Path("data_folder/cassettes/default.jsonl")
+        # Sleep for the recorded latency when replaying, so timings of a replayed run resemble the recorded one
+        self.LLM_CASSETTE_REPLAY_LATENCY = False
+
+        # Requests and tokens per minute allowed for each model, shared by every thread of the process. Models that are
+        # not listed use the "default" entry.
+        self.LLM_RATE_LIMITS = {
+            "default": {"requests_per_minute": 500, "tokens_per_minute": 30000},
+            "gpt-4o": {"requests_per_minute": 500, "tokens_per_minute": 30000},
+            "gpt-4o-mini": {"requests_per_minute": 500, "tokens_per_minute": 200000},
+        }
+        # Several worker processes calling the same models share the buckets through the state file below instead,
+        # at the cost of a locked file read and write per call
+        self.LLM_RATE_LIMIT_SHARE_ACROSS_PROCESSES = False
+        self.LLM_RATE_LIMIT_STATE_PATH: Path = self.LOG_OUTPUT_FILE_PATH / "llm_rate_limit_state.json"
+        # Exponential backoff (with jitter) used when the provider errors without telling us how long to wait
+        self.LLM_BACKOFF_BASE_SECONDS = 1
+        self.LLM_BACKOFF_MAX_SECONDS = 60
+
+        # Offline batch mode, "openai" submits to the OpenAI Batch API and "local" uses a file based stand-in that
+        # answers every request locally (no network needed).
+        self.LLM_BATCH_CLIENT = 'openai'
+        self.LLM_BATCH_LOCAL_DIRECTORY: Path = self.LOG_OUTPUT_FILE_PATH / "batches" / "local"
+        self.LLM_BATCH_POLL_SECONDS = 60
+
+        # Every LLM call is appended to open_ai_calls.jsonl by a background thread, flushed in batches and rotated
+        # (gzipped) once the file reaches LLM_LOG_MAX_BYTES. Only the newest LLM_LOG_BACKUP_COUNT rotated files are kept.
+        self.LLM_LOG_MAX_BYTES = 50 * 1024 * 1024
+        self.LLM_LOG_BACKUP_COUNT = 10
+        self.LLM_LOG_FLUSH_SECONDS = 1.0
+        self.LLM_LOG_BATCH_SIZE = 100
+
+        # USD per million tokens for each model, matched on the longest prefix of the model name the provider returns.
+        # cached_input is the price of input tokens served from the provider's prompt cache (defaults to input).
+        self.LLM_MODEL_PRICING = {
+            "default": {"input": 2.50, "output": 10.00},
+            "gpt-4o": {"input": 2.50, "output": 10.00, "cached_input": 1.25},
+            "gpt-4o-mini": {"input": 0.15, "output": 0.60, "cached_input": 0.075},
+            "gpt-4-turbo": {"input": 10.00, "output": 30.00},
+            "gpt-3.5-turbo": {"input": 0.50, "output": 1.50},
+            "claude-3-5-sonnet": {"input": 3.00, "output": 15.00},
+            "claude-3-haiku": {"input": 0.25, "output": 1.25},
+        }
+        # Spend ceiling (USD) for one run, None disables it. Once reached new LLM work is either refused ("stop") or
+        # sent to LLM_BUDGET_DOWNGRADE_MODEL ("downgrade").
+        self.LLM_BUDGET_USD = None
+        self.LLM_BUDGET_ACTION = 'stop'
+        self.LLM_BUDGET_DOWNGRADE_MODEL = 'gpt-4o-mini'
+
+        # Token budget of each rendered prompt (keyed by prompt type, e.g. the resume section name). Prompts over budget
+        # are compressed: job description boilerplate is stripped, the bullet lists of LLM_PROMPT_BULLET_LISTS are cut
+        # to each of LLM_PROMPT_LIST_LIMITS in turn, then LLM_PROMPT_DROPPABLE_SECTIONS are removed from whole-resume
+        # inputs (the cover letter prompt) in order.
+        self.LLM_PROMPT_TOKEN_BUDGETS = {
+            "default": 4000,
+            "experience": 6000,
+            "cover_letter": 6000,
+        }
+        self.LLM_PROMPT_LIST_LIMITS = [6, 3]
+        self.LLM_PROMPT_BULLET_LISTS = ["key_responsibilities", "skills_acquired"]
+        self.LLM_PROMPT_DROPPABLE_SECTIONS = ["interests", "languages", "achievements", "certifications", "projects"]
+
+        # Model tiers used by LlmManager.for_category: cheap/fast work (summaries, classification) goes to the "fast"
+        # tier and HTML generation to the "strong" tier. When a tier fails the next one in its fallback order is tried.
+        self.LLM_MODEL_TIERS = {
+            "fast": {"model_type": 'openai', "model": 'gpt-4o-mini'},
+            "strong": {"model_type": 'openai', "model": 'gpt-4o'},
+        }
+        self.LLM_PROMPT_CATEGORY_TIERS = {
+            "summarize": "fast",
+            "classify": "fast",
+            "html": "strong",
+            "default": "strong",
+        }
+        self.LLM_TIER_FALLBACK_ORDER = {
+            "fast": ["fast", "strong"],
+            "strong": ["strong", "fast"],
+        }
+        # Summarise the job description with the fast tier before it is embedded in the resume section prompts
+        self.LLM_SUMMARIZE_JOB_DESCRIPTION = True
+        # "json" asks the LLM for each resume section as compact JSON, validated against the section's schema and
+        # rendered to HTML locally; "html" asks for the section HTML directly
+        self.LLM_RESUME_OUTPUT_FORMAT = "html"
+        # How many times a section is asked for when its JSON answer does not parse or match the schema
+        self.LLM_JSON_SECTION_MAX_ATTEMPTS = 2
+        # Generated resume sections are kept as HTML fragments keyed on the section inputs, the prompt template and the
+        # model, so regenerating a resume only calls the LLM for the sections whose inputs changed
+        self.RESUME_FRAGMENT_STORE_ENABLED = True
+        self.RESUME_FRAGMENT_STORE_DIRECTORY: Path = self.LOG_OUTPUT_FILE_PATH / "resume_fragments"
+        self.RESUME_FRAGMENT_STORE_MAX_AGE_SECONDS = 60 * 60 * 24 * 90
+
+        # Hedged requests: a call still running after the LLM_HEDGE_PERCENTILE of the model's recent latencies gets a
+        # duplicate sent to LLM_HEDGE_SECONDARY (or the same model when None), the first answer wins. Every hedge is a
+        # second paid request, so it is off by default; enable it once a secondary model (or the spend) is settled.
+        self.LLM_HEDGING_ENABLED = False
+        self.LLM_HEDGE_PERCENTILE = 95
+        self.LLM_HEDGE_WINDOW_SIZE = 200
+        self.LLM_HEDGE_MIN_SAMPLES = 20
+        self.LLM_HEDGE_DEFAULT_DELAY_SECONDS = 30
+        self.LLM_HEDGE_MAX_THREADS = 16
+        self.LLM_HEDGE_SECONDARY = None
+        # A provider/model is skipped for LLM_CIRCUIT_BREAKER_COOLDOWN_SECONDS after this many consecutive failures
+        self.LLM_CIRCUIT_BREAKER_FAILURES = 5
+        self.LLM_CIRCUIT_BREAKER_COOLDOWN_SECONDS = 60
+
+        # Persistent httpx connection pool shared by every LLM client of the process
+        self.LLM_HTTP_MAX_CONNECTIONS = 100
+        self.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+        self.LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS = 120
+        self.LLM_HTTP_TIMEOUT_SECONDS = 120
+
+        # Spans around LLM calls, PDF renders, style loads and file writes (see src/utils/tracing.py). Durations go to
+        # latency histograms with about 1 / 2 ** TRACE_HISTOGRAM_SIGNIFICANT_BITS relative precision; with
+        # TRACE_OTEL_EXPORT the first TRACE_MAX_SPANS spans are also written as OpenTelemetry JSON.
+        self.TRACE_ENABLED = True
+        self.TRACE_HISTOGRAM_SIGNIFICANT_BITS = 7
+        self.TRACE_OTEL_EXPORT = False
+        self.TRACE_MAX_SPANS = 10000
+
+        # Warm headless Chrome instances shared by every PDF render of the process (see src/utils/chrome_render_pool.py).
+        # A browser is replaced after CHROME_POOL_MAX_RENDERS renders or once its processes grew by more than
+        # CHROME_POOL_MAX_MEMORY_GROWTH_MB (memory is only checked when psutil is installed).
+        self.CHROME_POOL_SIZE = 2
+        self.CHROME_POOL_HEADLESS = True
+        self.CHROME_POOL_MAX_RENDERS = 50
+        self.CHROME_POOL_MAX_MEMORY_GROWTH_MB = 300
+        self.CHROME_POOL_ACQUIRE_TIMEOUT_SECONDS = 120
+        # CHROME_PREWARM launches the first pooled browser in the background as soon as main() starts, while the
+        # configuration is parsed and the resume generated.
+        self.CHROME_PREWARM = True
+        # chromedriver is resolved once and recorded in CHROMEDRIVER_CACHE_PATH with the Chrome it matches, later runs
+        # reuse it while both are unchanged on disk. With CHROMEDRIVER_OFFLINE it is never downloaded, only a driver
+        # on PATH or one webdriver_manager downloaded before is used. CHROMEDRIVER_PATH (a Path) skips the resolution.
+        self.CHROMEDRIVER_PATH = None
+        self.CHROMEDRIVER_CACHE_PATH: Path = self.LOG_OUTPUT_FILE_PATH / "chromedriver.json"
+        self.CHROMEDRIVER_OFFLINE = False
+        # Batches are printed on up to CHROME_RENDER_CONCURRENCY tabs of one browser at a time, each tab gets its own
+        # renderer process (see src/utils/chrome_multi_target.py).
+        self.CHROME_RENDER_CONCURRENCY = min(8, os.cpu_count() or 1)
+        self.CHROME_RENDER_TIMEOUT_SECONDS = 60
+        # A page is printed once it loaded, its web fonts are ready and the network has been quiet for
+        # CHROME_NETWORK_QUIET_MS, or after CHROME_PAGE_READY_TIMEOUT_SECONDS whatever its state.
+        self.CHROME_PAGE_READY_TIMEOUT_SECONDS = 10
+        self.CHROME_NETWORK_QUIET_MS = 500
+
+        # Fonts and icons come from the local bundle in assets/render_bundle, inlined into each document before it is
+        # printed (see src/utils/render_assets.py). Offline, stylesheets from Google Fonts or cdnjs are dropped too when
+        # the bundle provides all their families, which it does for every font of the resume styles.
+        self.RENDER_ASSETS_OFFLINE = True
+
+        # Backend printing the HTML documents to PDF (see src/utils/pdf_renderer.py): "chrome" for headless Chrome,
+        # "reportlab" for the browser free renderer (lighter and faster, approximates the CSS of the resume styles).
+        self.PDF_RENDER_BACKEND = "chrome"
+        # Printed PDFs are kept on disk keyed on the hash of their final HTML and print options, printing the same
+        # document again copies the stored PDF. Least recently used PDFs are evicted past PDF_RENDER_CACHE_MAX_BYTES.
+        self.PDF_RENDER_CACHE_ENABLED = True
+        self.PDF_RENDER_CACHE_DIRECTORY: Path = self.LOG_OUTPUT_FILE_PATH / "pdf_render_cache"
+        self.PDF_RENDER_CACHE_MAX_BYTES = 500 * 1024 * 1024
+
         self.html_template = """
                             <!DOCTYPE html>
                             <html lang="en">
@@ -41,9 +214,7 @@ class GlobalConfig:
                                 <meta charset="UTF-8">
                                 <meta name="viewport" content="width=device-width, initial-scale=1.0">
                                 <title>Resume</title>
-                                <link href="https://fonts.googleapis.com/css2?family=Barlow:wght@400;600&display=swap" rel="stylesheet" />
-                                <link href="https://fonts.googleapis.com/css2?family=Barlow:wght@400;600&display=swap" rel="stylesheet" /> 
-                                <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.3/css/all.min.css" /> 
+                                <link rel="stylesheet" href="assets/render_bundle/bundle.css" />
                                     <style>
                                         $style_css
                                     </style>
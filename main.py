@@ -14,9 +14,15 @@ import re
 from src.libs.resume_and_cover_builder import ResumeFacade, ResumeGenerator, StyleManager
 from src.resume_schemas.job_application_profile import JobApplicationProfile
 from src.resume_schemas.resume import Resume
+from local_config import global_config
 from src.logging import logger
-from src.utils.chrome_utils import init_browser
+from src.utils.chrome_render_pool import ChromeRenderPool
+from src.utils.llm_utils.resume_generator import ResumeGenerator as BatchResumeGenerator
+from src.utils.pdf_renderer import get_pdf_renderer
+from src.utils.llm_utils.llm_cassette import REPLAY
+from src.utils.tracing import Tracer
 from src.utils.constants import (
+    JOB_DESCRIPTIONS_FOLDER,
     PLAIN_TEXT_RESUME_YAML,
     SECRETS_YAML,
     WORK_PREFERENCES_YAML,
@@ -168,7 +174,8 @@ class ConfigValidator:
     def validate_secrets(secrets_yaml_path: Path) -> str:
         """Validate the secrets YAML file and retrieve the LLM API key."""
         secrets = ConfigValidator.load_yaml(secrets_yaml_path)
-        mandatory_secrets = ["llm_api_key"]
+        # Replayed runs answer every LLM call from the cassette, they need no API key
+        mandatory_secrets = [] if global_config.LLM_CASSETTE_MODE == REPLAY else ["llm_api_key"]
 
         for secret in mandatory_secrets:
             if secret not in secrets:
@@ -177,7 +184,7 @@ class ConfigValidator:
             if not secrets[secret]:
                 raise ConfigError(f"Secret '{secret}' cannot be empty in {secrets_yaml_path}")
 
-        return secrets["llm_api_key"]
+        return secrets.get("llm_api_key")
 
 
 class FileManager:
@@ -215,6 +222,17 @@ class FileManager:
 
         return uploads
 
+    @staticmethod
+    def get_job_descriptions(app_data_folder: Path) -> Dict[str, str]:
+        """Read the job descriptions to tailor the resume for, file name (without .txt) -> job description text."""
+        job_descriptions_folder = app_data_folder / JOB_DESCRIPTIONS_FOLDER
+        if not job_descriptions_folder.is_dir():
+            return {}
+        return {
+            job_description_file.stem: job_description_file.read_text(encoding="utf-8")
+            for job_description_file in sorted(job_descriptions_folder.glob("*.txt"))
+        }
+
 
 def create_cover_letter(parameters: dict, llm_api_key: str, style: str, job_url: str):
     """
@@ -248,7 +266,6 @@ def create_cover_letter(parameters: dict, llm_api_key: str, style: str, job_url:
         logger.info(f"using job with url: {job_url}")
         resume_generator = ResumeGenerator()
         resume_object = Resume(plain_text_resume)
-        driver = init_browser()
         resume_generator.set_resume_object(resume_object)
         resume_facade = ResumeFacade(            
             api_key=llm_api_key,
@@ -257,9 +274,11 @@ def create_cover_letter(parameters: dict, llm_api_key: str, style: str, job_url:
             resume_object=resume_object,
             output_path=Path("data_folder/output"),
         )
-        resume_facade.set_driver(driver)
-        resume_facade.link_to_job(job_url)
-        result_base64, suggested_name = resume_facade.create_cover_letter()         
+        # A warm browser is leased from the shared pool instead of launching a new Chrome for this document
+        with ChromeRenderPool.shared().lease() as driver:
+            resume_facade.set_driver(driver)
+            resume_facade.link_to_job(job_url)
+            result_base64, suggested_name = resume_facade.create_cover_letter()
 
         # Decodifica Base64 in dati binari
         try:
@@ -281,7 +300,7 @@ def create_cover_letter(parameters: dict, llm_api_key: str, style: str, job_url:
         
         output_path = output_dir / "cover_letter_tailored.pdf"
         try:
-            with open(output_path, "wb") as file:
+            with Tracer.span("file.write"), open(output_path, "wb") as file:
                 file.write(pdf_data)
             logger.info(f"CV salvato in: {output_path}")
         except IOError as e:
@@ -323,7 +342,6 @@ def create_resume_pdf_job_tailored(parameters: dict, llm_api_key: str, style: st
         logger.info(f"using job with url: {job_url}")
         resume_generator = ResumeGenerator()
         resume_object = Resume(plain_text_resume)
-        driver = init_browser()
         resume_generator.set_resume_object(resume_object)
         resume_facade = ResumeFacade(            
             api_key=llm_api_key,
@@ -332,9 +350,10 @@ def create_resume_pdf_job_tailored(parameters: dict, llm_api_key: str, style: st
             resume_object=resume_object,
             output_path=Path("data_folder/output"),
         )
-        resume_facade.set_driver(driver)
-        resume_facade.link_to_job(job_url)
-        result_base64, suggested_name = resume_facade.create_resume_pdf_job_tailored()         
+        with ChromeRenderPool.shared().lease() as driver:
+            resume_facade.set_driver(driver)
+            resume_facade.link_to_job(job_url)
+            result_base64, suggested_name = resume_facade.create_resume_pdf_job_tailored()
 
         # Decodifica Base64 in dati binari
         try:
@@ -356,7 +375,7 @@ def create_resume_pdf_job_tailored(parameters: dict, llm_api_key: str, style: st
         
         output_path = output_dir / "resume_tailored.pdf"
         try:
-            with open(output_path, "wb") as file:
+            with Tracer.span("file.write"), open(output_path, "wb") as file:
                 file.write(pdf_data)
             logger.info(f"CV salvato in: {output_path}")
         except IOError as e:
@@ -398,29 +417,16 @@ def create_resume_pdf(parameters: dict, llm_api_key: str, style: str):
             if not found_style:
                 logger.warning(f"Given unknown style {style}")
 
+        # The resume generator builds its LLM clients from global_config.API_KEY, which ResumeFacade used to set
+        global_config.API_KEY = llm_api_key
+
         # Initialize the Resume Generator
         resume_generator = ResumeGenerator()
         resume_object = Resume(plain_text_resume)
-        driver = init_browser()
         resume_generator.set_resume_object(resume_object)
 
-        # Create the ResumeFacade
-        resume_facade = ResumeFacade(
-            api_key=llm_api_key,
-            style_manager=style_manager,
-            resume_generator=resume_generator,
-            resume_object=resume_object,
-            output_path=Path("data_folder/output"),
-        )
-        resume_facade.set_driver(driver)
-        result_base64 = resume_facade.create_resume_pdf()
-
-        # Decode Base64 to binary data
-        try:
-            pdf_data = base64.b64decode(result_base64)
-        except base64.binascii.Error as e:
-            logger.error("Error decoding Base64: %s", e)
-            raise
+        # Generate the HTML, then print it with the configured PDF backend (Chrome or reportlab)
+        resume_html = resume_generator.create_resume(style_manager.get_style_path())
 
         # Define the output directory using `suggested_name`
         output_dir = Path(parameters["outputFileDirectory"])
@@ -428,8 +434,7 @@ def create_resume_pdf(parameters: dict, llm_api_key: str, style: str):
         # Write the PDF file
         output_path = output_dir / "resume_base.pdf"
         try:
-            with open(output_path, "wb") as file:
-                file.write(pdf_data)
+            get_pdf_renderer().render_to_file(resume_html, output_path)
             logger.info(f"Resume saved at: {output_path}")
         except IOError as e:
             logger.error("Error writing file: %s", e)
@@ -438,7 +443,43 @@ def create_resume_pdf(parameters: dict, llm_api_key: str, style: str):
         logger.exception(f"An error occurred while creating the CV: {e}")
         raise
 
-        
+
+def create_resume_pdfs_job_tailored_batch(parameters: dict, llm_api_key: str, style: str, job_descriptions: Dict[str, str]):
+    """
+    Logic to tailor the resume for many jobs through the LLM batch mode, then render one PDF per job.
+    :param job_descriptions: job id -> job description text, the job id is used as the output folder name.
+    """
+    try:
+        logger.info(f"Generating {len(job_descriptions)} tailored CVs in batch mode. Style: {style}")
+
+        # The resume generator builds its LLM clients from global_config.API_KEY
+        global_config.API_KEY = llm_api_key
+
+        with open(parameters["uploads"]["plainTextResume"], "r", encoding="utf-8") as file:
+            plain_text_resume = file.read()
+
+        style_manager = StyleManager()
+        style_manager.set_selected_style(style)
+        style_path = style_manager.get_style_path()
+
+        # The batch mode lives in the in-tree resume generator (see ResumeGenerator.create_resumes_job_description_batch)
+        resume_generator = BatchResumeGenerator()
+        resume_generator.set_resume_object(Resume(plain_text_resume))
+        resumes_html = resume_generator.create_resumes_job_description_batch(style_path, job_descriptions)
+
+        output_paths = []
+        for job_id in resumes_html:
+            output_dir = Path(parameters["outputFileDirectory"]) / job_id
+            output_dir.mkdir(parents=True, exist_ok=True)
+            output_paths.append(output_dir / "resume_tailored.pdf")
+        # With Chrome the PDFs are printed on parallel tabs and streamed straight to their files
+        for output_path in get_pdf_renderer().render_many(resumes_html.values(), output_paths):
+            logger.info(f"Resume saved at: {output_path}")
+    except Exception as e:
+        logger.exception(f"An error occurred while creating the batch of CVs: {e}")
+        raise
+
+
 def do_action(action: str, parameters: dict, llm_api_key: str):
     """
     Decide which function to call based on the selected user actions.
@@ -461,6 +502,10 @@ def do_action(action: str, parameters: dict, llm_api_key: str):
                 logger.info("Designing a personalized cover letter to enhance your job application...")
                 create_cover_letter(parameters, llm_api_key, "Cloyola Grey", "todo")
 
+            if "Generate Tailored Resumes for Job Descriptions".lower() == action.lower():
+                logger.info("Tailoring your resume for every job description in one LLM batch...")
+                create_resume_pdfs_job_tailored_batch(parameters, llm_api_key, "Cloyola Grey", parameters["jobDescriptions"])
+
         else:
             logger.warning("No actions selected. Nothing to execute.")
     except Exception as e:
@@ -471,6 +516,10 @@ def do_action(action: str, parameters: dict, llm_api_key: str):
 def main():
     """Main entry point for the AIHawk Job Application Bot."""
     try:
+        # Chrome starts while the configuration is parsed and the resume generated, the first PDF does not wait for it
+        if global_config.CHROME_PREWARM and global_config.PDF_RENDER_BACKEND == "chrome":
+            ChromeRenderPool.shared().prewarm_in_background()
+
         # Define and validate the data folder
         data_folder = Path("data_folder")
         secrets_file, config_file, plain_text_resume_file, output_folder = FileManager.validate_data_folder(data_folder)
@@ -482,9 +531,14 @@ def main():
         # Prepare parameters
         config["uploads"] = FileManager.get_uploads(plain_text_resume_file)
         config["outputFileDirectory"] = output_folder
+        config["jobDescriptions"] = FileManager.get_job_descriptions(data_folder)
 
-        # Handle selected actions and execute them
-        do_action("Generate Resume", config, llm_api_key)
+        # Handle selected actions and execute them: with job descriptions in data_folder/job_descriptions the resume is
+        # tailored for each of them through the LLM batch mode, otherwise the base resume is generated
+        if config["jobDescriptions"]:
+            do_action("Generate Tailored Resumes for Job Descriptions", config, llm_api_key)
+        else:
+            do_action("Generate Resume", config, llm_api_key)
 
     except ConfigError as ce:
         logger.error(f"Configuration error: {ce}")
@@ -500,6 +554,10 @@ def main():
         logger.debug(traceback.format_exc())
     except Exception as e:
         logger.exception(f"An unexpected error occurred: {e}")
+    finally:
+        # Where the time of this run went: LLM calls, PDF renders, style loads, file writes
+        Tracer.export()
+        print(Tracer.summary_table())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,283 @@
+# Used when the LLM answers resume sections as compact JSON instead of HTML. Each section has a JSON schema the answer
+# is validated against and a renderer that fills the same markup as the templates in resume_template.py, so the HTML is
+# always well formed and the model only spends output tokens on the actual content.
+from html import escape
+from typing import Callable, Dict, List, Optional
+
+import jsonschema
+
+_string_list = {"type": "array", "items": {"type": "string"}}
+_nullable_string = {"type": ["string", "null"]}
+
+RESUME_SECTION_SCHEMAS: Dict[str, Dict] = {
+    "header": {
+        "type": "object",
+        "properties": {
+            "name": {"type": "string"},
+            "location": _nullable_string,
+            "phone": _nullable_string,
+            "email": _nullable_string,
+            "linkedin": _nullable_string,
+            "github": _nullable_string,
+        },
+        "required": ["name"],
+    },
+    "education": {
+        "type": "object",
+        "properties": {
+            "entries": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "institution": {"type": "string"},
+                        "location": _nullable_string,
+                        "degree": {"type": "string"},
+                        "grade": _nullable_string,
+                        "dates": _nullable_string,
+                        "courses": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {"name": {"type": "string"}, "grade": _nullable_string},
+                                "required": ["name"],
+                            },
+                        },
+                    },
+                    "required": ["institution", "degree"],
+                },
+            },
+        },
+        "required": ["entries"],
+    },
+    "experience": {
+        "type": "object",
+        "properties": {
+            "entries": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "company": {"type": "string"},
+                        "location": _nullable_string,
+                        "title": {"type": "string"},
+                        "dates": _nullable_string,
+                        "bullets": _string_list,
+                    },
+                    "required": ["company", "title", "bullets"],
+                },
+            },
+        },
+        "required": ["entries"],
+    },
+    "projects": {
+        "type": "object",
+        "properties": {
+            "entries": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string"},
+                        "link": _nullable_string,
+                        "bullets": _string_list,
+                    },
+                    "required": ["name", "bullets"],
+                },
+            },
+        },
+        "required": ["entries"],
+    },
+    "achievements": {
+        "type": "object",
+        "properties": {
+            "items": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"name": {"type": "string"}, "description": _nullable_string},
+                    "required": ["name"],
+                },
+            },
+        },
+        "required": ["items"],
+    },
+    "additional_skills": {
+        "type": "object",
+        "properties": {"skills": _string_list, "languages": _string_list},
+        "required": ["skills"],
+    },
+}
+RESUME_SECTION_SCHEMAS["certifications"] = RESUME_SECTION_SCHEMAS["achievements"]
+
+# Shape of the expected answer, shown to the model in place of the HTML template. Braces are doubled because the
+# prompts go through ChatPromptTemplate.
+RESUME_SECTION_JSON_EXAMPLES: Dict[str, str] = {
+    "header": '{{"name": "[Name and Surname]", "location": "[City, Country]", "phone": "[Prefix Phone number]", '
+              '"email": "[Email]", "linkedin": "[LinkedIn URL or null]", "github": "[GitHub URL or null]"}}',
+    "education": '{{"entries": [{{"institution": "[University Name]", "location": "[Location]", '
+                 '"degree": "[Degree] in [Field of Study]", "grade": "[Grade or null]", "dates": "[Start Year] – [End Year]", '
+                 '"courses": [{{"name": "[Course Name]", "grade": "[Grade]"}}]}}]}}',
+    "experience": '{{"entries": [{{"company": "[Company Name]", "location": "[Location]", "title": "[Job Title]", '
+                  '"dates": "[Start Date] – [End Date]", "bullets": ["[Responsibility or achievement]"]}}]}}',
+    "projects": '{{"entries": [{{"name": "[Project Name]", "link": "[Github Repo or Link or null]", '
+                '"bullets": ["[Notable recognition or contribution]"]}}]}}',
+    "achievements": '{{"items": [{{"name": "[Award or Recognition or Scholarship or Honor]", "description": "[Describe]"}}]}}',
+    "certifications": '{{"items": [{{"name": "[Certification Name]", "description": "[Describe]"}}]}}',
+    "additional_skills": '{{"skills": ["[Specific Skill or Technology]"], "languages": ["[Language]: [Proficiency]"]}}',
+}
+
+
+def json_output_instructions(section_name: str) -> str:
+    return f"""
+- **Output Format**
+Answer with a single JSON object of this shape (repeat list items as needed, use null for missing values):
+{RESUME_SECTION_JSON_EXAMPLES[section_name]}
+Provide only the JSON, without any explanations or additional text and also without ```json ```"""
+
+
+def _bullets(bullets: List[str]) -> str:
+    return "\n".join(f"          <li>{escape(bullet)}</li>" for bullet in bullets)
+
+
+def _render_header(data: Dict) -> str:
+    contact_items = [
+        ("fas fa-map-marker-alt", data.get("location"), None),
+        ("fas fa-phone", data.get("phone"), None),
+        ("fas fa-envelope", data.get("email"), None),
+        ("fab fa-linkedin", "LinkedIn", data.get("linkedin")),
+        ("fab fa-github", "GitHub", data.get("github")),
+    ]
+    contact_html = []
+    for icon, text, link in contact_items:
+        if link:
+            contact_html.append(f'    <p class="{icon}">\n      <a href="{escape(link)}">{text}</a>\n    </p>')
+        elif text and icon.startswith("fas"):
+            contact_html.append(f'    <p class="{icon}">\n      <span>{escape(text)}</span>\n    </p>')
+    return (
+        f"<header>\n  <h1>{escape(data['name'])}</h1>\n  <div class=\"contact-info\">\n"
+        + "\n".join(contact_html)
+        + "\n  </div>\n</header>"
+    )
+
+
+def _render_education(data: Dict) -> str:
+    entries = []
+    for entry in data["entries"]:
+        title = escape(entry["degree"])
+        if entry.get("grade"):
+            title += f" | Grade: {escape(entry['grade'])}"
+        courses = "\n".join(
+            f"          <li>{escape(course['name'])}" + (f" → Grade: {escape(course['grade'])}" if course.get("grade") else "") + "</li>"
+            for course in entry.get("courses") or []
+        )
+        entries.append(f"""
+    <div class="entry">
+      <div class="entry-header">
+          <span class="entry-name">{escape(entry['institution'])}</span>
+          <span class="entry-location">{escape(entry.get('location') or '')}</span>
+      </div>
+      <div class="entry-details">
+          <span class="entry-title">{title}</span>
+          <span class="entry-year">{escape(entry.get('dates') or '')}</span>
+      </div>""" + (f"""
+      <ul class="compact-list">
+{courses}
+      </ul>""" if courses else "") + """
+    </div>""")
+    return f'<section id="education">\n    <h2>Education</h2>{"".join(entries)}\n</section>'
+
+
+def _render_experience(data: Dict) -> str:
+    entries = "".join(
+        f"""
+    <div class="entry">
+      <div class="entry-header">
+          <span class="entry-name">{escape(entry['company'])}</span>
+          <span class="entry-location">{escape(entry.get('location') or '')}</span>
+      </div>
+      <div class="entry-details">
+          <span class="entry-title">{escape(entry['title'])}</span>
+          <span class="entry-year">{escape(entry.get('dates') or '')}</span>
+      </div>
+      <ul class="compact-list">
+{_bullets(entry['bullets'])}
+      </ul>
+    </div>"""
+        for entry in data["entries"]
+    )
+    return f'<section id="work-experience">\n    <h2>Work Experience</h2>{entries}\n</section>'
+
+
+def _render_projects(data: Dict) -> str:
+    entries = []
+    for entry in data["entries"]:
+        name = escape(entry["name"])
+        if entry.get("link"):
+            name = f'<a href="{escape(entry["link"])}">{name}</a>'
+        entries.append(f"""
+    <div class="entry">
+      <div class="entry-header">
+          <span class="entry-name"><i class="fab fa-github"></i> {name}</span>
+      </div>
+      <ul class="compact-list">
+{_bullets(entry['bullets'])}
+      </ul>
+    </div>""")
+    return f'<section id="side-projects">\n    <h2>Side Projects</h2>{"".join(entries)}\n</section>'
+
+
+def _render_named_items(section_id: str, title: str) -> Callable[[Dict], str]:
+    def render(data: Dict) -> str:
+        items = "\n".join(
+            f"      <li><strong>{escape(item['name'])}:</strong> {escape(item.get('description') or '')}</li>"
+            for item in data["items"]
+        )
+        return f'<section id="{section_id}">\n    <h2>{title}</h2>\n    <ul class="compact-list">\n{items}\n    </ul>\n</section>'
+    return render
+
+
+def _render_additional_skills(data: Dict) -> str:
+    skills = [escape(skill) for skill in data["skills"]]
+    languages = data.get("languages") or []
+    half = (len(skills) + 1) // 2
+    second_column = [f"<li>{skill}</li>" for skill in skills[half:]]
+    if languages:
+        second_column.append(f"<li><strong>Languages:</strong> {escape(', '.join(languages))}</li>")
+    first_column = "\n".join(f"          <li>{skill}</li>" for skill in skills[:half])
+    second_column = "\n".join(f"          {item}" for item in second_column)
+    return f"""<section id="skills-languages">
+    <h2>Additional Skills</h2>
+    <div class="two-column">
+      <ul class="compact-list">
+{first_column}
+      </ul>
+      <ul class="compact-list">
+{second_column}
+      </ul>
+    </div>
+</section>"""
+
+
+RESUME_SECTION_RENDERERS: Dict[str, Callable[[Dict], str]] = {
+    "header": _render_header,
+    "education": _render_education,
+    "experience": _render_experience,
+    "projects": _render_projects,
+    "achievements": _render_named_items("achievements", "Achievements"),
+    "certifications": _render_named_items("certifications", "Certifications"),
+    "additional_skills": _render_additional_skills,
+}
+
+
+def validate_section(section_name: str, data) -> Optional[str]:
+    """Returns None when data matches the section's schema, otherwise the validation error message."""
+    try:
+        jsonschema.validate(data, RESUME_SECTION_SCHEMAS[section_name])
+    except jsonschema.ValidationError as e:
+        return e.message
+    return None
+
+
+def render_section(section_name: str, data: Dict) -> str:
+    return RESUME_SECTION_RENDERERS[section_name](data)
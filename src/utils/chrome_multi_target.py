@@ -0,0 +1,147 @@
+import itertools
+import json
+import queue
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Sequence, Union
+from local_config import global_config
+from src.logging import logger
+from src.utils.chrome_utils import HTML_to_PDF, HTML_to_PDF_file, PDF_PRINT_OPTIONS, page_ready_expression, \
+    write_pdf_stream
+from src.utils.render_assets import RenderAssets
+from src.utils.tracing import Tracer
+
+try:
+    from websockets.sync.client import connect
+except ImportError:  # websockets comes with undetected-chromedriver, without it documents are rendered one by one
+    connect = None
+
+"""
+This module renders many documents at once in a single Chrome process. Selenium only drives the one tab of its window,
+so the renderer talks to the browser's DevTools endpoint directly: it opens up to CHROME_RENDER_CONCURRENCY page
+targets (Target.createTarget), each with its own websocket, and prints documents on them from a thread pool. Every tab
+gets its own renderer process, so printing scales with cores instead of queueing behind the driver. Documents are set
+with Page.setDocumentContent and printed as soon as they loaded, their fonts are ready and the network is quiet.
+"""
+
+
+class CDPConnection:
+    """Minimal synchronous DevTools client for one websocket (the browser or a single page target)."""
+
+    def __init__(self, websocket_url: str, timeout: float):
+        self.timeout = timeout
+        self._ids = itertools.count(1)
+        self._socket = connect(websocket_url, max_size=None, compression=None, open_timeout=timeout)
+        # Main frame of a page target, set once the tab is opened
+        self.frame_id: str = None
+
+    def send(self, method: str, params: Dict = None) -> Dict:
+        message_id = next(self._ids)
+        self._socket.send(json.dumps({"id": message_id, "method": method, "params": params or {}}))
+        deadline = time.monotonic() + self.timeout
+        while True:
+            message = json.loads(self._socket.recv(timeout=max(0.0, deadline - time.monotonic())))
+            # Events of enabled domains arrive on the same socket, only the reply to this command is of interest
+            if message.get("id") != message_id:
+                continue
+            if "error" in message:
+                raise RuntimeError(f"{method} failed: {message['error'].get('message')}")
+            return message.get("result", {})
+
+    def close(self):
+        try:
+            self._socket.close()
+        except Exception as e:
+            logger.debug(f"Failed to close DevTools connection: {e}")
+
+
+class MultiTargetRenderer:
+
+    def __init__(self, driver, concurrency: int = None, timeout: float = None):
+        self.driver = driver
+        self.concurrency = concurrency or global_config.CHROME_RENDER_CONCURRENCY
+        self.timeout = timeout or global_config.CHROME_RENDER_TIMEOUT_SECONDS
+        self._target_ids: List[str] = []
+
+    def debugger_address(self) -> str:
+        # host:port of the DevTools endpoint chromedriver started Chrome with
+        return (getattr(self.driver, "capabilities", None) or {}).get("goog:chromeOptions", {}).get("debuggerAddress")
+
+    def _browser_websocket_url(self, debugger_address: str) -> str:
+        with urllib.request.urlopen(f"http://{debugger_address}/json/version", timeout=self.timeout) as response:
+            return json.load(response)["webSocketDebuggerUrl"]
+
+    def _open_tab(self, browser: CDPConnection, debugger_address: str) -> CDPConnection:
+        target_id = browser.send("Target.createTarget", {"url": "about:blank"})["targetId"]
+        self._target_ids.append(target_id)
+        tab = CDPConnection(f"ws://{debugger_address}/devtools/page/{target_id}", self.timeout)
+        tab.frame_id = tab.send("Page.getFrameTree")["frameTree"]["frame"]["id"]
+        return tab
+
+    @staticmethod
+    def wait_until_ready(tab: CDPConnection) -> bool:
+        ready = tab.send("Runtime.evaluate", {"expression": page_ready_expression(), "awaitPromise": True})
+        if not ready.get("result", {}).get("value"):
+            logger.warning("Page not ready before the timeout, printing it anyway")
+            return False
+        return True
+
+    def _render_on_driver(self, html_content: str, output_path: Path = None):
+        if output_path is None:
+            return HTML_to_PDF(html_content, self.driver)
+        HTML_to_PDF_file(html_content, self.driver, output_path)
+        return output_path
+
+    def _render_on_tab(self, tabs: "queue.Queue[CDPConnection]", html_content: str, output_path: Path = None):
+        if not isinstance(html_content, str) or not html_content.strip():
+            raise ValueError("The HTML content must be a non empty string.")
+        tab = tabs.get()
+        try:
+            with Tracer.span("pdf.render", mode="multi_target"):
+                tab.send("Runtime.evaluate", {"expression": "performance.clearResourceTimings()"})
+                html_content = RenderAssets.localize(html_content)
+                tab.send("Page.setDocumentContent", {"frameId": tab.frame_id, "html": html_content})
+                self.wait_until_ready(tab)
+                if output_path is None:
+                    return tab.send("Page.printToPDF", PDF_PRINT_OPTIONS)["data"]
+                result = tab.send("Page.printToPDF", dict(PDF_PRINT_OPTIONS, transferMode="ReturnAsStream"))
+                write_pdf_stream(tab.send, result["stream"], output_path)
+                return output_path
+        finally:
+            tabs.put(tab)
+
+    def render_many(self, html_docs: Sequence[str], output_paths: Sequence[Path] = None) -> List[Union[str, Path]]:
+        """
+        Renders the HTML documents concurrently on tabs of the driver's browser.
+        :param output_paths: when given, the PDF of html_docs[i] is streamed to output_paths[i] instead of returned.
+        :return: the PDFs as base64 strings (or the output paths), in the order of html_docs.
+        """
+        html_docs = list(html_docs)
+        output_paths = list(output_paths) if output_paths is not None else [None] * len(html_docs)
+        if len(output_paths) != len(html_docs):
+            raise ValueError("render_many needs one output path per document")
+        debugger_address = self.debugger_address()
+        if connect is None or debugger_address is None or len(html_docs) < 2 or self.concurrency < 2:
+            return [self._render_on_driver(html_content, path) for html_content, path in zip(html_docs, output_paths)]
+
+        browser = CDPConnection(self._browser_websocket_url(debugger_address), self.timeout)
+        self._target_ids = []
+        tabs: "queue.Queue[CDPConnection]" = queue.Queue()
+        try:
+            for _ in range(min(self.concurrency, len(html_docs))):
+                tabs.put(self._open_tab(browser, debugger_address))
+            logger.debug(f"Rendering {len(html_docs)} documents on {tabs.qsize()} tabs")
+            with ThreadPoolExecutor(max_workers=tabs.qsize(), thread_name_prefix="pdf-render") as executor:
+                return list(executor.map(lambda html_content, output_path: self._render_on_tab(
+                    tabs, html_content, output_path), html_docs, output_paths))
+        finally:
+            while not tabs.empty():
+                tabs.get_nowait().close()
+            for target_id in self._target_ids:
+                try:
+                    browser.send("Target.closeTarget", {"targetId": target_id})
+                except Exception as e:
+                    logger.warning(f"Failed to close render tab {target_id}: {e}")
+            browser.close()
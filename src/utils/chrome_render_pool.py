@@ -0,0 +1,227 @@
+import atexit
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Union
+from local_config import global_config
+from src.logging import logger
+from src.utils.chrome_utils import HTML_to_PDF, HTML_to_PDF_file, init_browser
+
+try:
+    import psutil
+except ImportError:  # without psutil browsers are only recycled by render count
+    psutil = None
+
+"""
+This module keeps a pool of warm headless Chrome instances so documents do not pay for a browser launch (and the
+chromedriver lookup) each. Browsers are leased one document at a time, health checked before every lease and recycled
+after CHROME_POOL_MAX_RENDERS renders or once their process tree grew by more than CHROME_POOL_MAX_MEMORY_GROWTH_MB.
+Every browser still alive is shut down when the process exits.
+"""
+
+
+class _PooledBrowser:
+    def __init__(self, driver):
+        self.driver = driver
+        self.renders = 0
+        self.baseline_rss_mb = ChromeRenderPool.rss_mb(driver)
+
+
+class ChromeRenderPool:
+    _shared: "ChromeRenderPool" = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, size: int = None, max_renders: int = None, max_memory_growth_mb: float = None,
+                 driver_factory: Callable[[], object] = None):
+        self.size = size or global_config.CHROME_POOL_SIZE
+        self.max_renders = max_renders or global_config.CHROME_POOL_MAX_RENDERS
+        self.max_memory_growth_mb = max_memory_growth_mb or global_config.CHROME_POOL_MAX_MEMORY_GROWTH_MB
+        self.driver_factory = driver_factory or (lambda: init_browser(headless=global_config.CHROME_POOL_HEADLESS))
+        self._idle: "queue.Queue[_PooledBrowser]" = queue.Queue()
+        # id(driver) -> browser, for every browser launched and not retired yet (idle or leased)
+        self._browsers: Dict[int, _PooledBrowser] = {}
+        self._lock = threading.Lock()
+        # Browsers being launched ahead of their lease by prewarm()
+        self._prewarming = 0
+        self._closed = False
+
+    @classmethod
+    def shared(cls) -> "ChromeRenderPool":
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = ChromeRenderPool()
+                atexit.register(cls._shared.shutdown)
+            return cls._shared
+
+    @staticmethod
+    def rss_mb(driver) -> Optional[float]:
+        # Resident memory of chromedriver and every Chrome process it started
+        process = getattr(getattr(driver, "service", None), "process", None)
+        if psutil is None or process is None:
+            return None
+        try:
+            root = psutil.Process(process.pid)
+            return sum(p.memory_info().rss for p in [root, *root.children(recursive=True)]) / (1024 * 1024)
+        except psutil.Error:
+            return None
+
+    @staticmethod
+    def is_healthy(driver) -> bool:
+        try:
+            driver.execute_cdp_cmd("Browser.getVersion", {})
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled Chrome failed its health check: {e}")
+            return False
+
+    def _launch(self) -> _PooledBrowser:
+        start = time.perf_counter()
+        browser = _PooledBrowser(self.driver_factory())
+        with self._lock:
+            self._browsers[id(browser.driver)] = browser
+        logger.debug(f"Launched pooled Chrome in {time.perf_counter() - start:.2f}s ({len(self._browsers)}/{self.size})")
+        return browser
+
+    def _retire(self, browser: _PooledBrowser, reason: str):
+        with self._lock:
+            self._browsers.pop(id(browser.driver), None)
+        logger.debug(f"Retiring pooled Chrome after {browser.renders} renders: {reason}")
+        try:
+            browser.driver.quit()
+        except Exception as e:
+            logger.warning(f"Failed to quit pooled Chrome: {e}")
+
+    def _recycle_reason(self, browser: _PooledBrowser) -> Optional[str]:
+        if browser.renders >= self.max_renders:
+            return f"reached {self.max_renders} renders"
+        rss_mb = self.rss_mb(browser.driver)
+        if rss_mb is not None and browser.baseline_rss_mb is not None \
+                and rss_mb - browser.baseline_rss_mb > self.max_memory_growth_mb:
+            return f"memory grew from {browser.baseline_rss_mb:.0f} MB to {rss_mb:.0f} MB"
+        return None
+
+    def prewarm(self, count: int = None):
+        # Launches browsers ahead of the first lease, up to the pool size
+        for _ in range(count or self.size):
+            with self._lock:
+                if len(self._browsers) + self._prewarming >= self.size:
+                    return
+                self._prewarming += 1
+            try:
+                self._idle.put(self._launch())
+            finally:
+                with self._lock:
+                    self._prewarming -= 1
+
+    def prewarm_in_background(self, count: int = 1) -> threading.Thread:
+        """Runs prewarm() on a daemon thread, so the browser starts while the caller does something else."""
+        def run():
+            try:
+                self.prewarm(count)
+            except Exception as e:
+                logger.warning(f"Failed to prewarm Chrome, it is launched on the first lease instead: {e}")
+
+        thread = threading.Thread(target=run, name="chrome-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+    def acquire(self, timeout: float = None):
+        if self._closed:
+            raise RuntimeError("The Chrome render pool has been shut down")
+        timeout = timeout or global_config.CHROME_POOL_ACQUIRE_TIMEOUT_SECONDS
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    prewarming = self._prewarming > 0
+                    can_launch = len(self._browsers) + self._prewarming < self.size
+                remaining = deadline - time.monotonic()
+                if prewarming:
+                    # A browser launched ahead is closer to ready than a new one, polled in case its launch fails
+                    if remaining <= 0:
+                        raise TimeoutError(f"No pooled Chrome became available within {timeout}s")
+                    try:
+                        browser = self._idle.get(timeout=min(0.1, remaining))
+                    except queue.Empty:
+                        continue
+                elif can_launch:
+                    return self._launch().driver
+                else:
+                    try:
+                        browser = self._idle.get(timeout=max(0.0, remaining))
+                    except queue.Empty:
+                        raise TimeoutError(f"No pooled Chrome became available within {timeout}s")
+            if self.is_healthy(browser.driver):
+                return browser.driver
+            self._retire(browser, "failed health check")
+
+    def release(self, driver, failed: bool = False, renders: int = 1):
+        with self._lock:
+            browser = self._browsers.get(id(driver))
+        if browser is None:
+            return
+        browser.renders += renders
+        reason = "render failed and the browser is unhealthy" if failed and not self.is_healthy(driver) else None
+        reason = reason or self._recycle_reason(browser)
+        if reason is not None or self._closed:
+            self._retire(browser, reason or "pool shut down")
+            return
+        try:
+            # Frees the previous document before the browser waits for its next lease
+            driver.get("about:blank")
+        except Exception as e:
+            self._retire(browser, f"could not reset the page: {e}")
+            return
+        self._idle.put(browser)
+
+    @contextmanager
+    def lease(self, timeout: float = None):
+        driver = self.acquire(timeout)
+        failed = False
+        try:
+            yield driver
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.release(driver, failed)
+
+    def render(self, html_content: str) -> str:
+        """Renders the HTML on a pooled browser and returns the PDF as base64, like HTML_to_PDF."""
+        with self.lease() as driver:
+            return HTML_to_PDF(html_content, driver)
+
+    def render_to_file(self, html_content: str, output_path: Path) -> int:
+        """Renders the HTML on a pooled browser and streams the PDF to output_path, returns its size in bytes."""
+        with self.lease() as driver:
+            return HTML_to_PDF_file(html_content, driver, output_path)
+
+    def render_many(self, html_docs: Sequence[str], output_paths: Sequence[Path] = None) -> List[Union[str, Path]]:
+        """
+        Renders the documents in parallel on tabs of one pooled browser, see MultiTargetRenderer.render_many.
+        :return: the base64 PDFs in order, or the output paths once the PDFs were streamed to them.
+        """
+        from src.utils.chrome_multi_target import MultiTargetRenderer
+        html_docs = list(html_docs)
+        if not html_docs:
+            return []
+        driver = self.acquire()
+        failed = False
+        try:
+            return MultiTargetRenderer(driver).render_many(html_docs, output_paths)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.release(driver, failed, renders=len(html_docs))
+
+    def shutdown(self):
+        self._closed = True
+        with self._lock:
+            browsers = list(self._browsers.values())
+        for browser in browsers:
+            self._retire(browser, "pool shut down")
@@ -1,15 +1,130 @@
+import base64
 import os
-import time
+from pathlib import Path
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager  # Import webdriver_manager
-import urllib
+from selenium.common.exceptions import TimeoutException
+from local_config import global_config
 from src.logging import logger
+from src.utils.chromedriver_resolver import ChromeDriverResolver
+from src.utils.render_assets import RenderAssets
+from src.utils.tracing import Tracer
 
-def chrome_browser_options():
+# Page.printToPDF options, shared by every renderer
+PDF_PRINT_OPTIONS = {
+    "printBackground": True,          # Includi lo sfondo nella stampa
+    "landscape": False,               # Stampa in verticale (False per ritratto)
+    "paperWidth": 8.27,               # Larghezza del foglio in pollici (A4)
+    "paperHeight": 11.69,             # Altezza del foglio in pollici (A4)
+    "marginTop": 0.8,                  # Margine superiore in pollici (circa 2 cm)
+    "marginBottom": 0.8,               # Margine inferiore in pollici (circa 2 cm)
+    "marginLeft": 0.5,                 # Margine sinistro in pollici (circa 1.27 cm)
+    "marginRight": 0.5,                # Margine destro in pollici (circa 1.27 cm)
+    "displayHeaderFooter": False,      # Non visualizzare intestazioni e piè di pagina
+    "preferCSSPageSize": True,         # Preferire le dimensioni della pagina CSS
+    "generateDocumentOutline": False,  # Non generare un sommario del documento
+    "generateTaggedPDF": False,        # Non generare PDF taggato
+    "transferMode": "ReturnAsBase64"   # Restituire il PDF come stringa base64
+}
+
+# Promise resolving to true once the document loaded, its web fonts are ready and no resource finished loading for
+# quiet_ms (the counterpart of Chrome's "networkIdle"), or to false after timeout_ms whatever the state of the page.
+# It stands in for the CDP Page.lifecycleEvent signals: documents are set with Page.setDocumentContent, which is no
+# navigation, so Chrome does not emit a fresh load/networkIdle for them, and the Selenium driver can only send CDP
+# commands, not listen to events. The same checks run in the page instead, one round trip for the whole wait.
+PAGE_READY_EXPRESSION = """
+Promise.race([
+    new Promise(resolve => setTimeout(() => resolve(false), %(timeout_ms)d)),
+    new Promise(resolve => {
+        if (document.readyState === "complete") {
+            resolve();
+        } else {
+            window.addEventListener("load", () => resolve(), {once: true});
+        }
+    }).then(() => document.fonts.ready).then(() => new Promise(resolve => {
+        (function waitForQuiet() {
+            const responses = performance.getEntriesByType("resource").map(entry => entry.responseEnd);
+            const quietFor = performance.now() - Math.max(0, ...responses);
+            if (responses.length === 0 || quietFor >= %(quiet_ms)d) {
+                resolve(true);
+            } else {
+                setTimeout(waitForQuiet, %(quiet_ms)d - quietFor);
+            }
+        })();
+    })),
+])
+"""
+
+# Size of the chunks a streamed PDF is read in
+PDF_STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+def page_ready_expression(timeout: float = None) -> str:
+    timeout = timeout or global_config.CHROME_PAGE_READY_TIMEOUT_SECONDS
+    return PAGE_READY_EXPRESSION % {"timeout_ms": int(timeout * 1000), "quiet_ms": global_config.CHROME_NETWORK_QUIET_MS}
+
+
+def load_html(driver, html_content: str):
+    """
+    Replaces the document of the driver's page with the HTML, its fonts and icons taken from the local bundle. There is
+    no data: URL to percent-encode and no navigation. Resource timings of the previous document are cleared so they do
+    not count for the network quiet check.
+    """
+    frame_id = driver.execute_cdp_cmd("Page.getFrameTree", {})["frameTree"]["frame"]["id"]
+    driver.execute_script("performance.clearResourceTimings()")
+    html_content = RenderAssets.localize(html_content)
+    driver.execute_cdp_cmd("Page.setDocumentContent", {"frameId": frame_id, "html": html_content})
+
+
+def wait_for_page_ready(driver, timeout: float = None) -> bool:
+    """
+    Waits for the page to be ready to print: loaded, web fonts ready and the network quiet. These are the load,
+    document.fonts.ready and networkIdle conditions, evaluated in the page (see PAGE_READY_EXPRESSION for why not
+    through Page.lifecycleEvent).
+    :return: False when the page was still not ready after the timeout, it is printed as it is then.
+    """
+    timeout = timeout or global_config.CHROME_PAGE_READY_TIMEOUT_SECONDS
+    # The expression gives up on its own after the timeout, the script timeout is only a safety net
+    driver.set_script_timeout(timeout + 5)
+    try:
+        ready = driver.execute_async_script(
+            f"({page_ready_expression(timeout)}).then(arguments[arguments.length - 1]);")
+    except TimeoutException:
+        ready = False
+    if not ready:
+        logger.warning(f"Page not ready after {timeout}s, printing it anyway")
+    return bool(ready)
+
+
+def write_pdf_stream(send_command, stream_handle: str, output_path: Path) -> int:
+    """
+    Copies a PDF printed with transferMode ReturnAsStream to output_path chunk by chunk, so the whole document is never
+    held in memory as base64.
+    :param send_command: sends a DevTools command and returns its result, driver.execute_cdp_cmd or CDPConnection.send.
+    :return: the number of bytes written.
+    """
+    written = 0
+    try:
+        with open(output_path, "wb") as file:
+            while True:
+                chunk = send_command("IO.read", {"handle": stream_handle, "size": PDF_STREAM_CHUNK_SIZE})
+                data = chunk.get("data", "")
+                data = base64.b64decode(data) if chunk.get("base64Encoded") else data.encode("utf-8")
+                file.write(data)
+                written += len(data)
+                if chunk.get("eof"):
+                    break
+    finally:
+        send_command("IO.close", {"handle": stream_handle})
+    return written
+
+
+def chrome_browser_options(headless: bool = False):
     logger.debug("Setting Chrome browser options")
     options = Options()
+    if headless:
+        options.add_argument("--headless=new")
     options.add_argument("--start-maximized")
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
@@ -35,19 +150,22 @@ def chrome_browser_options():
     
     return options
 
-def init_browser() -> webdriver.Chrome:
+@Tracer.traced("browser.init")
+def init_browser(headless: bool = False) -> webdriver.Chrome:
     try:
-        options = chrome_browser_options()
-        # Use webdriver_manager to handle ChromeDriver
-        driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=options)
+        options = chrome_browser_options(headless)
+        # The driver recorded by a previous run is reused while Chrome and the driver are unchanged on disk
+        driver = webdriver.Chrome(service=ChromeService(ChromeDriverResolver.shared().resolve()), options=options)
         logger.debug("Chrome browser initialized successfully.")
         return driver
     except Exception as e:
+        ChromeDriverResolver.shared().invalidate()
         logger.error(f"Failed to initialize browser: {str(e)}")
         raise RuntimeError(f"Failed to initialize browser: {str(e)}")
 
 
 
+@Tracer.traced("pdf.render")
 def HTML_to_PDF(html_content, driver):
     """
     Converte una stringa HTML in un PDF e restituisce il PDF come stringa base64.
@@ -62,32 +180,34 @@ def HTML_to_PDF(html_content, driver):
     if not isinstance(html_content, str) or not html_content.strip():
         raise ValueError("Il contenuto HTML deve essere una stringa non vuota.")
 
-    # Codifica l'HTML in un URL di tipo data
-    encoded_html = urllib.parse.quote(html_content)
-    data_url = f"data:text/html;charset=utf-8,{encoded_html}"
-
     try:
-        driver.get(data_url)
-        # Attendi che la pagina si carichi completamente
-        time.sleep(2)  # Potrebbe essere necessario aumentare questo tempo per HTML complessi
+        # Carica l'HTML direttamente nella pagina, senza codificarlo in un URL di tipo data
+        load_html(driver, html_content)
+        # Attendi che la pagina si carichi completamente (font e risorse esterne incluse)
+        wait_for_page_ready(driver)
 
         # Esegue il comando CDP per stampare la pagina in PDF
-        pdf_base64 = driver.execute_cdp_cmd("Page.printToPDF", {
-            "printBackground": True,          # Includi lo sfondo nella stampa
-            "landscape": False,               # Stampa in verticale (False per ritratto)
-            "paperWidth": 8.27,               # Larghezza del foglio in pollici (A4)
-            "paperHeight": 11.69,             # Altezza del foglio in pollici (A4)
-            "marginTop": 0.8,                  # Margine superiore in pollici (circa 2 cm)
-            "marginBottom": 0.8,               # Margine inferiore in pollici (circa 2 cm)
-            "marginLeft": 0.5,                 # Margine sinistro in pollici (circa 1.27 cm)
-            "marginRight": 0.5,                # Margine destro in pollici (circa 1.27 cm)
-            "displayHeaderFooter": False,      # Non visualizzare intestazioni e piè di pagina
-            "preferCSSPageSize": True,         # Preferire le dimensioni della pagina CSS
-            "generateDocumentOutline": False,  # Non generare un sommario del documento
-            "generateTaggedPDF": False,        # Non generare PDF taggato
-            "transferMode": "ReturnAsBase64"   # Restituire il PDF come stringa base64
-        })
+        pdf_base64 = driver.execute_cdp_cmd("Page.printToPDF", PDF_PRINT_OPTIONS)
         return pdf_base64['data']
     except Exception as e:
         logger.error(f"Si è verificata un'eccezione WebDriver: {e}")
         raise RuntimeError(f"Si è verificata un'eccezione WebDriver: {e}")
+
+
+@Tracer.traced("pdf.render", mode="stream")
+def HTML_to_PDF_file(html_content, driver, output_path) -> int:
+    """
+    Like HTML_to_PDF, but streams the PDF straight to output_path instead of returning it as base64.
+    :return: the size of the PDF in bytes.
+    """
+    if not isinstance(html_content, str) or not html_content.strip():
+        raise ValueError("Il contenuto HTML deve essere una stringa non vuota.")
+
+    try:
+        load_html(driver, html_content)
+        wait_for_page_ready(driver)
+        result = driver.execute_cdp_cmd("Page.printToPDF", dict(PDF_PRINT_OPTIONS, transferMode="ReturnAsStream"))
+        return write_pdf_stream(driver.execute_cdp_cmd, result["stream"], output_path)
+    except Exception as e:
+        logger.error(f"Si è verificata un'eccezione WebDriver: {e}")
+        raise RuntimeError(f"Si è verificata un'eccezione WebDriver: {e}")
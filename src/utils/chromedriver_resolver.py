@@ -0,0 +1,188 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from typing import List, Optional
+from local_config import global_config
+from src.logging import logger
+from src.utils.tracing import Tracer
+
+"""
+This module finds the chromedriver to launch Chrome with without asking webdriver_manager every time. The driver
+resolved first is recorded in CHROMEDRIVER_CACHE_PATH along with the Chrome it was matched to (path, size and
+modification time of both files, and their versions). Later runs only stat the two files: while neither changed the
+recorded driver is used as is, no subprocess and no network. Once Chrome updates the driver is resolved again:
+- a chromedriver on PATH or one webdriver_manager downloaded before (~/.wdm), when its major version matches Chrome's.
+  A local driver is only taken when Chrome's version is known, and never once it failed to start a session.
+- otherwise ChromeDriverManager().install(), unless CHROMEDRIVER_OFFLINE, in which case resolution fails
+CHROMEDRIVER_PATH skips all of this and is used as given.
+"""
+
+VERSION_PATTERN = re.compile(r"(\d+)\.\d+\.\d+(?:\.\d+)?")
+
+CHROME_EXECUTABLES = ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome")
+
+
+def find_chrome_binary() -> Optional[Path]:
+    for name in CHROME_EXECUTABLES:
+        path = shutil.which(name)
+        if path:
+            return Path(path).resolve()
+    if sys.platform == "darwin":
+        candidates = [Path("/Applications/Google Chrome.app/Contents/MacOS/Google Chrome")]
+    elif sys.platform == "win32":
+        candidates = [Path(os.environ[variable]) / "Google" / "Chrome" / "Application" / "chrome.exe"
+                      for variable in ("PROGRAMFILES", "PROGRAMFILES(X86)", "LOCALAPPDATA") if variable in os.environ]
+    else:
+        candidates = []
+    return next((path for path in candidates if path.is_file()), None)
+
+
+def executable_version(path: Path) -> Optional[str]:
+    # "Google Chrome 120.0.6099.109" / "ChromeDriver 120.0.6099.109 (...)", Chrome on Windows prints nothing
+    try:
+        completed = subprocess.run([str(path), "--version"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = VERSION_PATTERN.search(completed.stdout)
+    return match.group(0) if match else None
+
+
+def chrome_version(chrome: Path) -> Optional[str]:
+    version = executable_version(chrome)
+    if version is None:
+        # Chrome on Windows prints nothing, its installation keeps the files of each version in a directory named after it
+        versions = [path.name for path in chrome.parent.iterdir() if path.is_dir() and VERSION_PATTERN.fullmatch(path.name)]
+        version = max(versions, key=lambda name: tuple(map(int, name.split("."))), default=None)
+    return version
+
+
+def major_version(version: Optional[str]) -> Optional[str]:
+    return version.split(".")[0] if version else None
+
+
+def fingerprint(path: Optional[Path]) -> Optional[List]:
+    # Changes whenever the file is replaced (an update, a new download)
+    if path is None:
+        return None
+    try:
+        stat = Path(path).stat()
+    except OSError:
+        return None
+    return [str(path), stat.st_size, stat.st_mtime_ns]
+
+
+class ChromeDriverResolver:
+    _shared: "ChromeDriverResolver" = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, cache_path: Path = None, offline: bool = None):
+        self.cache_path = Path(cache_path or global_config.CHROMEDRIVER_CACHE_PATH)
+        self.offline = global_config.CHROMEDRIVER_OFFLINE if offline is None else offline
+        self._driver_path: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "ChromeDriverResolver":
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = ChromeDriverResolver()
+            return cls._shared
+
+    def _load(self) -> Optional[dict]:
+        try:
+            return json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, record: dict):
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            self.cache_path.write_text(json.dumps(record, indent=2), encoding="utf-8")
+        except OSError as e:
+            logger.warning(f"Failed to record the chromedriver in {self.cache_path}: {e}")
+
+    def _save(self, driver_path: Path, driver_version: Optional[str], chrome: Optional[Path],
+              chrome_version: Optional[str]):
+        self._write({
+            "driver": fingerprint(driver_path),
+            "driver_version": driver_version,
+            "chrome": fingerprint(chrome),
+            "chrome_version": chrome_version,
+        })
+
+    @staticmethod
+    def _local_drivers() -> List[Path]:
+        drivers = []
+        on_path = shutil.which("chromedriver")
+        if on_path:
+            drivers.append(Path(on_path))
+        # Drivers webdriver_manager downloaded before, newest first
+        downloaded = Path.home() / ".wdm" / "drivers" / "chromedriver"
+        if downloaded.is_dir():
+            found = [path for path in downloaded.rglob("chromedriver*") if path.is_file() and path.suffix in ("", ".exe")]
+            drivers.extend(sorted(found, key=lambda path: path.stat().st_mtime, reverse=True))
+        return drivers
+
+    def _resolve(self) -> str:
+        if global_config.CHROMEDRIVER_PATH:
+            driver_path = Path(global_config.CHROMEDRIVER_PATH)
+            if not driver_path.is_file():
+                raise RuntimeError(f"CHROMEDRIVER_PATH {driver_path} does not exist")
+            return str(driver_path)
+
+        chrome = find_chrome_binary()
+        record = self._load()
+        if record is not None and record["driver"] is not None and record["driver"] == fingerprint(record["driver"][0]) \
+                and record["chrome"] == fingerprint(chrome):
+            logger.debug(f"Using the recorded chromedriver {record['driver_version']} at {record['driver'][0]}")
+            return record["driver"][0]
+
+        version = chrome_version(chrome) if chrome is not None else None
+        # Drivers that failed to start a session since the last successful resolution
+        failed_drivers = (record or {}).get("failed_drivers", [])
+        if version is None:
+            logger.warning("Could not read the version of Chrome, local chromedrivers cannot be matched to it")
+        elif failed_drivers and not self.offline:
+            logger.debug("The last chromedriver failed to start Chrome, downloading a matching one")
+        else:
+            for driver_path in self._local_drivers():
+                if fingerprint(driver_path) in failed_drivers:
+                    continue
+                driver_version = executable_version(driver_path)
+                if driver_version and major_version(driver_version) == major_version(version):
+                    logger.debug(f"Using the local chromedriver {driver_version} at {driver_path} for Chrome {version}")
+                    self._save(driver_path, driver_version, chrome, version)
+                    return str(driver_path)
+
+        if self.offline:
+            raise RuntimeError(f"No local chromedriver matches Chrome {version or '(version unknown)'} and "
+                               f"CHROMEDRIVER_OFFLINE is on, set CHROMEDRIVER_PATH or put a matching chromedriver on PATH")
+        from webdriver_manager.chrome import ChromeDriverManager
+        driver_path = Path(ChromeDriverManager().install())
+        driver_version = executable_version(driver_path)
+        logger.debug(f"Downloaded chromedriver {driver_version} to {driver_path} for Chrome {version}")
+        self._save(driver_path, driver_version, chrome, version)
+        return str(driver_path)
+
+    def resolve(self) -> str:
+        """The path of the chromedriver matching the installed Chrome, resolved once per process."""
+        with self._lock:
+            if self._driver_path is None:
+                with Tracer.span("browser.resolve_driver"):
+                    self._driver_path = self._resolve()
+            return self._driver_path
+
+    def invalidate(self):
+        # The driver failed to start a session: the record is dropped and the driver is not picked again locally
+        with self._lock:
+            record = self._load() or {}
+            failed_drivers = record.get("failed_drivers", [])
+            if self._driver_path is not None and fingerprint(self._driver_path) not in failed_drivers:
+                failed_drivers.append(fingerprint(self._driver_path))
+            self._driver_path = None
+            self._write({"driver": None, "failed_drivers": failed_drivers})
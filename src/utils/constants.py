@@ -8,6 +8,8 @@ DATE_24_HOURS = "24_hours"
 SECRETS_YAML = "secrets.yaml"
 WORK_PREFERENCES_YAML = "work_preferences.yaml"
 PLAIN_TEXT_RESUME_YAML = "plain_text_resume.yaml"
+# Optional folder of the data folder, one .txt job description per job to tailor the resume for
+JOB_DESCRIPTIONS_FOLDER = "job_descriptions"
 
 
 # String constants used in the application
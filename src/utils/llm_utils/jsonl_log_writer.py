@@ -0,0 +1,86 @@
+import atexit
+import gzip
+import json
+import queue
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+from loguru import logger
+
+"""
+This module contains a JSONL writer that takes log records off the request thread. Records are queued, written by a
+background thread in batches (one compact json object per line), rotated and gzipped once the file gets too big, and
+flushed when the interpreter exits.
+"""
+
+
+class JsonlLogWriter:
+
+    def __init__(self, path: Path, max_bytes: int, backup_count: int, flush_interval: float, batch_size: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Dict]" = queue.Queue()
+        self._closed = threading.Event()
+        self._file_lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="jsonl-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, record: Dict):
+        if self._closed.is_set():
+            # Late records (after close) are written synchronously rather than dropped.
+            self._write_batch([record])
+            return
+        self._queue.put(record)
+
+    def _drain(self, first_record: Dict) -> List[Dict]:
+        batch = [first_record]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._closed.is_set() and self._queue.empty()):
+            try:
+                record = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            try:
+                self._write_batch(self._drain(record))
+            except Exception as e:
+                logger.error(f"Failed to write log records to {self.path}: {e}")
+
+    def _write_batch(self, batch: List[Dict]):
+        lines = "".join(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n" for record in batch)
+        with self._file_lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+            if self.path.stat().st_size >= self.max_bytes:
+                self._rotate()
+
+    def _rotate(self):
+        rotated_path = self.path.with_name(f"{self.path.stem}.{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}{self.path.suffix}.gz")
+        with open(self.path, "rb") as source, gzip.open(rotated_path, "wb") as target:
+            shutil.copyfileobj(source, target)
+        self.path.unlink()
+
+        backups = sorted(self.path.parent.glob(f"{self.path.stem}.*{self.path.suffix}.gz"))
+        for old_backup in backups[:-self.backup_count] if self.backup_count else backups:
+            old_backup.unlink()
+        logger.debug(f"Rotated {self.path} to {rotated_path}")
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._thread.join()
@@ -0,0 +1,124 @@
+import json
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Dict, List
+from local_config import global_config
+from loguru import logger
+from src.utils.llm_utils.mock_openai_server import canned_reply
+
+"""
+This module contains the clients used to submit OpenAI Batch JSONL files. OpenAIBatchClient talks to the real batch
+endpoint, LocalBatchClient is a file based stand-in that answers every request locally with canned sections so the whole batch flow can be
+exercised without network access.
+"""
+
+BATCH_COMPLETED = "completed"
+BATCH_FAILED_STATES = ("failed", "expired", "cancelled")
+
+
+class BatchClient(ABC):
+    @abstractmethod
+    def submit(self, input_path: Path) -> str:
+        pass
+
+    @abstractmethod
+    def status(self, batch_id: str) -> str:
+        pass
+
+    @abstractmethod
+    def download_results(self, batch_id: str) -> List[Dict]:
+        pass
+
+
+class OpenAIBatchClient(BatchClient):
+    def __init__(self, api_key: str):
+        from openai import OpenAI
+        self.client = OpenAI(api_key=api_key)
+
+    def submit(self, input_path: Path) -> str:
+        with open(input_path, "rb") as f:
+            batch_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        logger.info(f"Submitted batch {batch.id} from {input_path}")
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def download_results(self, batch_id: str) -> List[Dict]:
+        batch = self.client.batches.retrieve(batch_id)
+        results = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                content = self.client.files.content(file_id).text
+                results.extend(json.loads(line) for line in content.splitlines() if line.strip())
+        return results
+
+
+def canned_responder(request_body: Dict) -> str:
+    # Default answer for the local stand-in: the mock server's sample content for the section the prompt asks for, as
+    # HTML or JSON like the prompt requires, so assembled resumes look like real ones.
+    return canned_reply("\n".join(str(message.get("content", "")) for message in request_body["messages"]))
+
+
+class LocalBatchClient(BatchClient):
+    def __init__(self, batch_directory: Path = None, responder: Callable[[Dict], str] = canned_responder):
+        self.batch_directory = Path(batch_directory or global_config.LLM_BATCH_LOCAL_DIRECTORY)
+        self.batch_directory.mkdir(parents=True, exist_ok=True)
+        self.responder = responder
+
+    def _output_path(self, batch_id: str) -> Path:
+        return self.batch_directory / f"{batch_id}_output.jsonl"
+
+    def submit(self, input_path: Path) -> str:
+        batch_id = f"batch_local_{uuid.uuid4().hex}"
+        with open(input_path, "r", encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+
+        # The stand-in completes the batch straight away and writes an output file in the same format as OpenAI.
+        with open(self._output_path(batch_id), "w", encoding="utf-8") as f:
+            for request in requests:
+                content = self.responder(request["body"])
+                prompt_tokens = sum(len(message["content"]) // 4 for message in request["body"]["messages"])
+                completion_tokens = len(content) // 4
+                result = {
+                    "id": f"batch_req_{uuid.uuid4().hex}",
+                    "custom_id": request["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "request_id": uuid.uuid4().hex,
+                        "body": {
+                            "id": f"chatcmpl-{uuid.uuid4().hex}",
+                            "object": "chat.completion",
+                            "created": int(time.time()),
+                            "model": request["body"]["model"],
+                            "choices": [{
+                                "index": 0,
+                                "message": {"role": "assistant", "content": content},
+                                "finish_reason": "stop",
+                            }],
+                            "usage": {
+                                "prompt_tokens": prompt_tokens,
+                                "completion_tokens": completion_tokens,
+                                "total_tokens": prompt_tokens + completion_tokens,
+                            },
+                        },
+                    },
+                    "error": None,
+                }
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        logger.info(f"Local batch {batch_id} completed {len(requests)} requests from {input_path}")
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        return BATCH_COMPLETED if self._output_path(batch_id).exists() else "failed"
+
+    def download_results(self, batch_id: str) -> List[Dict]:
+        with open(self._output_path(batch_id), "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
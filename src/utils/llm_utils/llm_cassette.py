@@ -0,0 +1,98 @@
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List
+from langchain_core.messages import AIMessage
+from local_config import global_config
+from src.logging import logger
+from src.utils.llm_utils.llm_response_cache import LLMResponseCache
+
+"""
+This module stores recorded model calls ("cassettes") so a run can be replayed without network or API key. A cassette is
+a JSONL file, one line per call with the model, the rendered prompt, the reply (content, metadata and token usage) and
+the latency of the call. Calls are matched on model and prompt, a prompt recorded several times is replayed in the
+order it was recorded.
+"""
+
+RECORD = "record"
+REPLAY = "replay"
+
+
+class CassetteMissError(KeyError):
+    """Raised in replay mode when the cassette holds no recording for a prompt."""
+    pass
+
+
+class LLMCassette:
+    _lock = threading.Lock()
+    _cassettes: Dict[Path, "LLMCassette"] = {}
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._write_lock = threading.Lock()
+        # key -> recorded calls, and how many of them have been replayed so far
+        self.recordings: Dict[str, List[Dict]] = {}
+        self.replay_positions: Dict[str, int] = {}
+        if self.path.exists():
+            self._load()
+
+    @classmethod
+    def shared(cls, path: Path = None) -> "LLMCassette":
+        # One instance per file so every model of the process appends to, and replays from, the same recordings
+        path = Path(path or global_config.LLM_CASSETTE_PATH)
+        with cls._lock:
+            if path not in cls._cassettes:
+                cls._cassettes[path] = LLMCassette(path)
+            return cls._cassettes[path]
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.recordings.setdefault(entry["key"], []).append(entry)
+        logger.debug(f"Loaded {sum(map(len, self.recordings.values()))} recorded LLM calls from {self.path}")
+
+    @staticmethod
+    def make_key(model_name: str, prompt) -> str:
+        return LLMResponseCache.make_key(model_name, None, prompt)
+
+    def record(self, model_name: str, prompt, reply: AIMessage, latency: float):
+        entry = {
+            "key": self.make_key(model_name, prompt),
+            "model": model_name,
+            "prompt": LLMResponseCache.render_prompt(prompt),
+            "latency": latency,
+            "reply": {
+                "content": reply.content,
+                "id": reply.id,
+                "response_metadata": reply.response_metadata,
+                "usage_metadata": reply.usage_metadata,
+            },
+        }
+        with self._write_lock:
+            self.recordings.setdefault(entry["key"], []).append(entry)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+
+    def replay(self, model_name: str, prompt):
+        """
+        Returns (reply, recorded latency) for the prompt. Repeated prompts get their recordings in order, the last one
+        is served again once they are used up.
+        """
+        key = self.make_key(model_name, prompt)
+        with self._write_lock:
+            entries = self.recordings.get(key)
+            if not entries:
+                raise CassetteMissError(f"No recorded {model_name} call in {self.path} for this prompt")
+            position = self.replay_positions.get(key, 0)
+            self.replay_positions[key] = position + 1
+            entry = entries[min(position, len(entries) - 1)]
+        reply = entry["reply"]
+        return AIMessage(
+            content=reply["content"],
+            id=reply["id"],
+            response_metadata=reply["response_metadata"],
+            usage_metadata=reply["usage_metadata"],
+        ), entry["latency"]
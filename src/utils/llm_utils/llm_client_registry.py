@@ -0,0 +1,104 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import hashlib
+import threading
+from typing import Callable, Dict, Tuple
+from local_config import global_config
+from src.logging import logger
+
+"""
+This module hands out process wide, shared LLM clients so documents reuse warm connections instead of building a new
+client (and connection pool, and TLS handshakes) every time:
+- one tuned httpx connection pool for sync calls and one for async calls
+- one AIModel instance per (provider, model, params), shared by every LlmManager
+- one long lived event loop running on a background thread, the async httpx pool is bound to it so async calls from
+  different documents keep reusing the same connections
+"""
+
+_lock = threading.Lock()
+_models: Dict[Tuple, object] = {}
+_http_client = None
+_async_http_client = None
+_loop: asyncio.AbstractEventLoop = None
+
+
+def _http_limits():
+    import httpx
+    return httpx.Limits(
+        max_connections=global_config.LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=global_config.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=global_config.LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+def get_http_client():
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            import httpx
+            _http_client = httpx.Client(limits=_http_limits(), timeout=global_config.LLM_HTTP_TIMEOUT_SECONDS)
+        return _http_client
+
+
+def get_async_http_client():
+    global _async_http_client
+    with _lock:
+        if _async_http_client is None:
+            import httpx
+            _async_http_client = httpx.AsyncClient(limits=_http_limits(), timeout=global_config.LLM_HTTP_TIMEOUT_SECONDS)
+        return _async_http_client
+
+
+def get_model(provider: str, llm_model: str, api_key: str, factory: Callable[[], object], **params):
+    """
+    Returns the shared model for (provider, model, params), building it with factory() the first time.
+    The api key is part of the key (hashed) so different accounts never share a client.
+    """
+    api_key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+    key = (provider, llm_model, api_key_hash, tuple(sorted(params.items())))
+    with _lock:
+        model = _models.get(key)
+    if model is not None:
+        return model
+    model = factory()
+    with _lock:
+        # Another thread may have built the same model meanwhile, keep the first one so everyone shares it
+        model = _models.setdefault(key, model)
+    logger.debug(f"Registered shared {provider} model {llm_model}")
+    return model
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-event-loop", daemon=True).start()
+        return _loop
+
+
+def run_async(coroutine):
+    """
+    Runs a coroutine on the shared LLM event loop and blocks until it is done. The caller's context variables (job and
+    prompt type used for cost tracking) are carried over to the task.
+    """
+    loop = _get_loop()
+    context = contextvars.copy_context()
+    result = concurrent.futures.Future()
+
+    def start():
+        # create_task copies the current context, running it inside `context` makes that the caller's context
+        task = context.run(loop.create_task, coroutine)
+
+        def done(finished_task: asyncio.Task):
+            if finished_task.cancelled():
+                result.cancel()
+            elif finished_task.exception() is not None:
+                result.set_exception(finished_task.exception())
+            else:
+                result.set_result(finished_task.result())
+        task.add_done_callback(done)
+
+    loop.call_soon_threadsafe(start)
+    return result.result()
@@ -0,0 +1,141 @@
+import atexit
+import contextvars
+import json
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Optional
+from local_config import global_config
+from loguru import logger
+
+"""
+This module keeps track of what the LLM calls of this process cost. Prices come from global_config.LLM_MODEL_PRICING,
+spend is accumulated per run, per job and per prompt type, and the configured budget is checked before every new call.
+The job and prompt type of a call are taken from the surrounding LLMCostTracker.context(), which also follows asyncio
+tasks since it is stored in context variables.
+"""
+
+BUDGET_OK = "ok"
+BUDGET_STOP = "stop"
+BUDGET_DOWNGRADE = "downgrade"
+
+_current_job_id = contextvars.ContextVar("llm_cost_job_id", default=None)
+_current_prompt_type = contextvars.ContextVar("llm_cost_prompt_type", default=None)
+
+
+class BudgetExceededError(Exception):
+    """Raised when the LLM budget of the run is spent and no more LLM work should be started."""
+    pass
+
+
+class LLMCostTracker:
+    _lock = threading.Lock()
+    run_cost = 0.0
+    cost_per_job: Dict[str, float] = defaultdict(float)
+    cost_per_prompt_type: Dict[str, float] = defaultdict(float)
+    cost_per_model: Dict[str, float] = defaultdict(float)
+    input_tokens = 0
+    cached_input_tokens = 0
+
+    @staticmethod
+    def price_for(model_name: str) -> Dict[str, float]:
+        # Providers answer with dated names (gpt-4o-2024-08-06), so the longest configured prefix wins.
+        pricing = global_config.LLM_MODEL_PRICING
+        matches = [name for name in pricing if name != "default" and model_name.startswith(name)]
+        if not matches:
+            logger.warning(f"No pricing configured for model {model_name}, using the default price")
+            return pricing["default"]
+        return pricing[max(matches, key=len)]
+
+    @staticmethod
+    def cost_of(model_name: str, input_tokens: int, output_tokens: int, cached_input_tokens: int = 0) -> float:
+        # Input tokens served from the provider's prompt cache are billed at the discounted cached_input price
+        price = LLMCostTracker.price_for(model_name)
+        cached_price = price.get("cached_input", price["input"])
+        return (
+            (input_tokens - cached_input_tokens) * price["input"]
+            + cached_input_tokens * cached_price
+            + output_tokens * price["output"]
+        ) / 1_000_000
+
+    @staticmethod
+    @contextmanager
+    def context(job_id: str = None, prompt_type: str = None):
+        # Attributes every LLM call made inside the block to the given job and/or prompt type.
+        tokens = []
+        if job_id is not None:
+            tokens.append((_current_job_id, _current_job_id.set(job_id)))
+        if prompt_type is not None:
+            tokens.append((_current_prompt_type, _current_prompt_type.set(prompt_type)))
+        try:
+            yield
+        finally:
+            for variable, token in reversed(tokens):
+                variable.reset(token)
+
+    @staticmethod
+    def current_prompt_type() -> Optional[str]:
+        return _current_prompt_type.get()
+
+    @classmethod
+    def record(cls, model_name: str, input_tokens: int, output_tokens: int,
+               job_id: str = None, prompt_type: str = None, cached_input_tokens: int = 0) -> float:
+        cost = cls.cost_of(model_name, input_tokens, output_tokens, cached_input_tokens)
+        job_id = job_id or _current_job_id.get() or "unassigned"
+        prompt_type = prompt_type or _current_prompt_type.get() or "unassigned"
+        with cls._lock:
+            cls.run_cost += cost
+            cls.cost_per_job[job_id] += cost
+            cls.cost_per_prompt_type[prompt_type] += cost
+            cls.cost_per_model[model_name] += cost
+            cls.input_tokens += input_tokens
+            cls.cached_input_tokens += cached_input_tokens
+        return cost
+
+    @classmethod
+    def check_budget(cls) -> str:
+        budget = global_config.LLM_BUDGET_USD
+        if budget is None or cls.run_cost < budget:
+            return BUDGET_OK
+        return global_config.LLM_BUDGET_ACTION
+
+    @classmethod
+    def enforce_budget(cls) -> Optional[str]:
+        # Returns the model to downgrade to, or raises if new LLM work has to stop. None means nothing to do.
+        action = cls.check_budget()
+        if action == BUDGET_OK:
+            return None
+        if action == BUDGET_DOWNGRADE:
+            return global_config.LLM_BUDGET_DOWNGRADE_MODEL
+        raise BudgetExceededError(
+            f"LLM budget of ${global_config.LLM_BUDGET_USD:.2f} reached (spent ${cls.run_cost:.4f}), refusing new LLM calls"
+        )
+
+    @classmethod
+    def summary(cls) -> Dict:
+        with cls._lock:
+            return {
+                "run_cost": cls.run_cost,
+                "budget": global_config.LLM_BUDGET_USD,
+                "cost_per_job": dict(cls.cost_per_job),
+                "cost_per_prompt_type": dict(cls.cost_per_prompt_type),
+                "cost_per_model": dict(cls.cost_per_model),
+                "input_tokens": cls.input_tokens,
+                "cached_input_tokens": cls.cached_input_tokens,
+                "prompt_cache_hit_rate": cls.cached_input_tokens / cls.input_tokens if cls.input_tokens else 0.0,
+            }
+
+    @classmethod
+    def write_summary(cls):
+        if cls.run_cost == 0:
+            return
+        summary_path = global_config.LOG_OUTPUT_FILE_PATH / "llm_costs.json"
+        try:
+            summary_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(summary_path, "w", encoding="utf-8") as f:
+                json.dump(cls.summary(), f, indent=4)
+        except OSError as e:
+            logger.error(f"Failed to write LLM cost summary to {summary_path}: {e}")
+
+
+atexit.register(LLMCostTracker.write_summary)
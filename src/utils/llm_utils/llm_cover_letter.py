@@ -0,0 +1,42 @@
+import textwrap
+from src.utils.llm_utils.llm_cost_tracker import LLMCostTracker
+from src.utils.llm_utils.llm_logger import LLMLogger
+from src.utils.llm_utils.llm_manager import LlmManager
+from src.utils.llm_utils.open_ai_action_wrapper import OpenAiActionWrapper
+from src.utils.llm_utils.prompt_budget import PromptBudgeter
+from src.utils.llm_utils.prompts import cover_letter_prompts
+
+"""
+This module contains the class that asks the LLM to write a cover letter for a job description. The prompt embeds the
+whole resume and the job description, so it is fitted to the "cover_letter" token budget before it is sent: bullets are
+shortened and low value resume sections dropped before the job description itself is cut (see prompt_budget).
+"""
+
+
+class LLMCoverLetterJobDescription:
+    def __init__(self, api_key: str, strings=None, llm_manager: LlmManager = None):
+        self.llm_manager = llm_manager or LlmManager(api_key)
+        self.llm = OpenAiActionWrapper(self.llm_manager.for_category("html"))
+        self.prompt_budgeter = PromptBudgeter(self.llm.llm.model_name)
+        self.strings = strings or cover_letter_prompts
+        self.resume = None
+        self.job_description = ""
+
+    def set_resume(self, resume):
+        self.resume = resume
+
+    def set_job_description_from_text(self, job_description_text: str):
+        self.job_description = job_description_text
+
+    def cover_letter_prompt(self):
+        prompt, compression_stats = self.prompt_budgeter.fit(
+            "cover_letter", textwrap.dedent(self.strings.cover_letter_template),
+            {"resume": self.resume, "job_description": self.job_description},
+        )
+        LLMLogger.log_prompt_compression(compression_stats)
+        return prompt
+
+    def generate_cover_letter(self) -> str:
+        with LLMCostTracker.context(prompt_type="cover_letter"):
+            reply = self.llm(self.cover_letter_prompt())
+        return reply.content.replace("```html", "").replace("```", "").strip()
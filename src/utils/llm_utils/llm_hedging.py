@@ -0,0 +1,225 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Optional
+from local_config import global_config
+from src.logging import logger
+
+"""
+This module cuts the tail latency of LLM calls. When a call has not returned after the configured percentile of the
+latencies observed for that model, a duplicate (hedge) request is sent to the same model or to a secondary AIModel and
+whichever answers first wins, the other one is cancelled. Each provider/model also has a circuit breaker so a degraded
+provider is skipped instead of making every call wait for it to time out.
+"""
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """The model's circuit breaker is open and no other model can take the call."""
+    pass
+
+
+def model_key(model) -> str:
+    return f"{model.__class__.__name__}:{model.llm_model}"
+
+
+class CircuitBreaker:
+    _lock = threading.Lock()
+    _breakers: Dict[str, "CircuitBreaker"] = {}
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+
+    @classmethod
+    def for_model(cls, model) -> "CircuitBreaker":
+        key = model_key(model)
+        with cls._lock:
+            if key not in cls._breakers:
+                cls._breakers[key] = CircuitBreaker(key)
+            return cls._breakers[key]
+
+    def allow(self) -> bool:
+        with CircuitBreaker._lock:
+            if self.state == OPEN and time.time() - self.opened_at >= global_config.LLM_CIRCUIT_BREAKER_COOLDOWN_SECONDS:
+                # Let a single trial call through, its outcome decides whether the breaker closes again
+                self.state = HALF_OPEN
+                return True
+            return self.state == CLOSED
+
+    def record_success(self):
+        with CircuitBreaker._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+
+    def release_trial(self):
+        # The trial call ended without an outcome (cancelled as the losing leg of a hedge), the next call gets to retry
+        with CircuitBreaker._lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+
+    def record_failure(self):
+        with CircuitBreaker._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= global_config.LLM_CIRCUIT_BREAKER_FAILURES:
+                if self.state != OPEN:
+                    logger.warning(f"Circuit breaker for {self.name} opened after {self.consecutive_failures} failures")
+                self.state = OPEN
+                self.opened_at = time.time()
+
+
+class LatencyWindow:
+    _lock = threading.Lock()
+    _windows: Dict[str, deque] = {}
+
+    @classmethod
+    def observe(cls, model, latency: float):
+        with cls._lock:
+            window = cls._windows.setdefault(model_key(model), deque(maxlen=global_config.LLM_HEDGE_WINDOW_SIZE))
+            window.append(latency)
+
+    @classmethod
+    def hedge_delay(cls, model) -> float:
+        # Until enough calls have been observed the configured default delay is used
+        with cls._lock:
+            latencies = sorted(cls._windows.get(model_key(model), ()))
+        if len(latencies) < global_config.LLM_HEDGE_MIN_SAMPLES:
+            return global_config.LLM_HEDGE_DEFAULT_DELAY_SECONDS
+        index = min(len(latencies) - 1, int(global_config.LLM_HEDGE_PERCENTILE / 100 * len(latencies)))
+        return latencies[index]
+
+
+def _timed_invoke(model, prompt):
+    start = time.perf_counter()
+    breaker = CircuitBreaker.for_model(model)
+    resolved = False
+    try:
+        reply = model.invoke(prompt)
+        breaker.record_success()
+        resolved = True
+    except Exception:
+        breaker.record_failure()
+        resolved = True
+        raise
+    finally:
+        if not resolved:
+            breaker.release_trial()
+    LatencyWindow.observe(model, time.perf_counter() - start)
+    return reply
+
+
+async def _timed_ainvoke(model, prompt):
+    start = time.perf_counter()
+    breaker = CircuitBreaker.for_model(model)
+    resolved = False
+    try:
+        reply = await model.ainvoke(prompt)
+        breaker.record_success()
+        resolved = True
+    except Exception:
+        breaker.record_failure()
+        resolved = True
+        raise
+    finally:
+        # Cancelled as the losing leg of a hedge: not the provider's fault, a trial call is handed back
+        if not resolved:
+            breaker.release_trial()
+    LatencyWindow.observe(model, time.perf_counter() - start)
+    return reply
+
+
+def _pick_models(primary, secondary):
+    # Skips models whose breaker is open, a distinct secondary stands in for a degraded primary. Without one the call
+    # fails fast instead of reaching a provider that is known to be failing.
+    primary_breaker = CircuitBreaker.for_model(primary)
+    primary_allowed = primary_breaker.allow()
+    if secondary is None or model_key(secondary) == model_key(primary):
+        if not primary_allowed:
+            raise CircuitOpenError(f"Circuit breaker open for {model_key(primary)} and no hedge model is configured")
+        # A half open breaker lets a single trial call through, it is not hedged with a second call to the same model
+        return primary, None if primary_breaker.state == HALF_OPEN else secondary
+    secondary_allowed = CircuitBreaker.for_model(secondary).allow()
+    if not primary_allowed and not secondary_allowed:
+        raise CircuitOpenError(f"Circuit breaker open for {model_key(primary)} and {model_key(secondary)}")
+    if not primary_allowed:
+        logger.debug(f"Skipping {model_key(primary)}, its circuit breaker is open")
+        return secondary, None
+    return primary, secondary if secondary_allowed else None
+
+
+def _release_unused_hedge(first, hedge):
+    # allow() may have turned the hedge's breaker half open for a trial call that was never sent
+    if hedge is not None and model_key(hedge) != model_key(first):
+        CircuitBreaker.for_model(hedge).release_trial()
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=global_config.LLM_HEDGE_MAX_THREADS, thread_name_prefix="llm-hedge")
+    return _executor
+
+
+def hedged_invoke(primary, secondary, prompt):
+    first, hedge = _pick_models(primary, secondary)
+    if not global_config.LLM_HEDGING_ENABLED or hedge is None:
+        _release_unused_hedge(first, hedge)
+        return _timed_invoke(first, prompt)
+
+    futures = {_get_executor().submit(_timed_invoke, first, prompt)}
+    done, _ = wait(futures, timeout=LatencyWindow.hedge_delay(first))
+    if not done:
+        logger.debug(f"{model_key(first)} is slow, hedging with {model_key(hedge)}")
+        futures.add(_get_executor().submit(_timed_invoke, hedge, prompt))
+    else:
+        _release_unused_hedge(first, hedge)
+
+    errors = []
+    while futures:
+        done, futures = wait(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for pending in futures:
+                    # Threads can't be interrupted, the losing call finishes in the background and is discarded
+                    pending.cancel()
+                return future.result()
+            errors.append(future.exception())
+    raise errors[0]
+
+
+async def hedged_ainvoke(primary, secondary, prompt):
+    first, hedge = _pick_models(primary, secondary)
+    if not global_config.LLM_HEDGING_ENABLED or hedge is None:
+        _release_unused_hedge(first, hedge)
+        return await _timed_ainvoke(first, prompt)
+
+    tasks = {asyncio.ensure_future(_timed_ainvoke(first, prompt))}
+    done, _ = await asyncio.wait(tasks, timeout=LatencyWindow.hedge_delay(first))
+    if not done:
+        logger.debug(f"{model_key(first)} is slow, hedging with {model_key(hedge)}")
+        tasks.add(asyncio.ensure_future(_timed_ainvoke(hedge, prompt)))
+    else:
+        _release_unused_hedge(first, hedge)
+
+    errors = []
+    try:
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                errors.append(task.exception())
+        raise errors[0]
+    finally:
+        for pending in tasks:
+            pending.cancel()
@@ -1,66 +1,124 @@
-import json
-from datetime import datetime
-from typing import Dict
-from local_config import global_config
-from langchain_core.prompt_values import StringPromptValue
-from langchain_openai import ChatOpenAI
-
-'''
-Custom logger class so that all communications with 3rd party api's / OLLAMA models will have their own distinct logs.
-'''
-class LLMLogger:
-
-    def __init__(self, llm: ChatOpenAI):
-        self.llm = llm
-
-    @staticmethod
-    def log_request(prompts, parsed_reply: Dict[str, Dict]):
-        calls_log = global_config.LOG_OUTPUT_FILE_PATH / "open_ai_calls.json"
-        if isinstance(prompts, StringPromptValue):
-            prompts = prompts.text
-        elif isinstance(prompts, Dict):
-            # Convert prompts to a dictionary if they are not in the expected format
-            prompts = {
-                f"prompt_{i + 1}": prompt.content
-                for i, prompt in enumerate(prompts.messages)
-            }
-        else:
-            prompts = {
-                f"prompt_{i + 1}": prompt.content
-                for i, prompt in enumerate(prompts.messages)
-            }
-
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        # Extract token usage details from the response
-        token_usage = parsed_reply["usage_metadata"]
-        output_tokens = token_usage["output_tokens"]
-        input_tokens = token_usage["input_tokens"]
-        total_tokens = token_usage["total_tokens"]
-
-        # Extract model details from the response
-        model_name = parsed_reply["response_metadata"]["model_name"]
-        prompt_price_per_token = 0.00000015
-        completion_price_per_token = 0.0000006
-
-        # Calculate the total cost of the API call
-        total_cost = (input_tokens * prompt_price_per_token) + (
-                output_tokens * completion_price_per_token
-        )
-
-        # Create a log entry with all relevant information
-        log_entry = {
-            "model": model_name,
-            "time": current_time,
-            "prompts": prompts,
-            "replies": parsed_reply["content"],  # Response content
-            "total_tokens": total_tokens,
-            "input_tokens": input_tokens,
-            "output_tokens": output_tokens,
-            "total_cost": total_cost,
-        }
-
-        # Write the log entry to the log file in JSON format
-        with open(calls_log, "a", encoding="utf-8") as f:
-            json_string = json.dumps(log_entry, ensure_ascii=False, indent=4)
-            f.write(json_string + "\n")
+import atexit
+import json
+import threading
+from datetime import datetime
+from typing import Dict
+from local_config import global_config
+from langchain_core.prompt_values import StringPromptValue
+from langchain_openai import ChatOpenAI
+from loguru import logger
+from src.utils.llm_utils.jsonl_log_writer import JsonlLogWriter
+from src.utils.llm_utils.llm_cost_tracker import LLMCostTracker
+
+'''
+Custom logger class so that all communications with 3rd party api's / OLLAMA models will have their own distinct logs.
+'''
+class LLMLogger:
+    # One background writer per log file and process, created on first use
+    _writers: Dict[str, JsonlLogWriter] = {}
+    # Latest response cache counters, kept in memory and written once when the interpreter exits
+    _cache_stats: Dict[str, int] = None
+    _cache_stats_lock = threading.Lock()
+
+    def __init__(self, llm: ChatOpenAI):
+        self.llm = llm
+
+    @staticmethod
+    def _get_writer(file_name: str) -> JsonlLogWriter:
+        if file_name not in LLMLogger._writers:
+            LLMLogger._writers[file_name] = JsonlLogWriter(
+                path=global_config.LOG_OUTPUT_FILE_PATH / file_name,
+                max_bytes=global_config.LLM_LOG_MAX_BYTES,
+                backup_count=global_config.LLM_LOG_BACKUP_COUNT,
+                flush_interval=global_config.LLM_LOG_FLUSH_SECONDS,
+                batch_size=global_config.LLM_LOG_BATCH_SIZE,
+            )
+        return LLMLogger._writers[file_name]
+
+    @staticmethod
+    def log_prompt_compression(compression_stats: Dict):
+        # Token counts of a prompt before and after PromptBudgeter compressed it
+        LLMLogger._get_writer("prompt_compression.jsonl").write(
+            dict(compression_stats, time=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+
+    @staticmethod
+    def log_cache_stats(cache_stats: Dict[str, int]):
+        # Called on every cache lookup, so it only keeps the counters, they are cumulative for the run
+        with LLMLogger._cache_stats_lock:
+            if LLMLogger._cache_stats is None:
+                atexit.register(LLMLogger.write_cache_stats)
+            LLMLogger._cache_stats = dict(cache_stats)
+
+    @staticmethod
+    def write_cache_stats():
+        with LLMLogger._cache_stats_lock:
+            cache_stats = LLMLogger._cache_stats
+        if cache_stats is None:
+            return
+        stats_log = global_config.LOG_OUTPUT_FILE_PATH / "llm_cache_stats.json"
+        lookups = cache_stats["hits"] + cache_stats["misses"]
+        cache_stats = dict(cache_stats, hit_rate=cache_stats["hits"] / lookups if lookups else 0.0)
+        logger.debug(f"LLM response cache stats: {cache_stats}")
+        try:
+            stats_log.parent.mkdir(parents=True, exist_ok=True)
+            with open(stats_log, "w", encoding="utf-8") as f:
+                json.dump(cache_stats, f, indent=4)
+        except OSError as e:
+            logger.error(f"Failed to write LLM cache stats to {stats_log}: {e}")
+
+    @staticmethod
+    def log_request(prompts, parsed_reply: Dict[str, Dict], cache_hit: bool = False,
+                    job_id: str = None, prompt_type: str = None):
+        if isinstance(prompts, StringPromptValue):
+            prompts = prompts.text
+        elif isinstance(prompts, str):
+            pass
+        elif isinstance(prompts, Dict):
+            # Convert prompts to a dictionary if they are not in the expected format
+            prompts = {
+                f"prompt_{i + 1}": prompt.content
+                for i, prompt in enumerate(prompts.messages)
+            }
+        else:
+            prompts = {
+                f"prompt_{i + 1}": prompt.content
+                for i, prompt in enumerate(prompts.messages)
+            }
+
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        # Extract token usage details from the response
+        token_usage = parsed_reply["usage_metadata"]
+        output_tokens = token_usage["output_tokens"]
+        input_tokens = token_usage["input_tokens"]
+        total_tokens = token_usage["total_tokens"]
+        cached_input_tokens = token_usage.get("cached_input_tokens", 0)
+
+        # Extract model details from the response
+        model_name = parsed_reply["response_metadata"]["model_name"]
+
+        # Price the call from the model's pricing and add it to the run's spend, answers served from the response
+        # cache are free
+        total_cost = 0
+        if not cache_hit:
+            total_cost = LLMCostTracker.record(
+                model_name, input_tokens, output_tokens, job_id, prompt_type, cached_input_tokens
+            )
+
+        # Create a log entry with all relevant information
+        log_entry = {
+            "model": model_name,
+            "time": current_time,
+            "prompts": prompts,
+            "replies": parsed_reply["content"],  # Response content
+            "total_tokens": total_tokens,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cached_input_tokens": cached_input_tokens,
+            "total_cost": total_cost,
+            "cache_hit": cache_hit,
+        }
+
+        # Hand the entry to the background writer, it is written as one compact JSONL line
+        LLMLogger._get_writer("open_ai_calls.jsonl").write(log_entry)
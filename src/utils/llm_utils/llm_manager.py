@@ -1,8 +1,25 @@
+import asyncio
+import json
+import time
 from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List
 
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import AIMessage, BaseMessage
 from local_config import global_config
 from src.logging import logger
+from src.utils.llm_utils import llm_client_registry
+from src.utils.llm_utils.llm_batch_clients import (
+    BATCH_COMPLETED,
+    BATCH_FAILED_STATES,
+    BatchClient,
+    LocalBatchClient,
+    OpenAIBatchClient,
+)
+from src.utils.llm_utils.llm_cassette import RECORD, REPLAY, LLMCassette
+from src.utils.llm_utils.llm_hedging import hedged_ainvoke, hedged_invoke
+from src.utils.llm_utils.llm_logger import LLMLogger
+from src.utils.llm_utils.llm_router import RoutedLlm, TierStats
 from src.utils.constants import (
     CLAUDE,
     GEMINI,
@@ -19,16 +36,27 @@ Below are wrapper classes for different AI models that were initially found in t
 
 
 class AIModel(ABC):
+    llm_model: str = ""
+    temperature: float = None
+
     @abstractmethod
     def invoke(self, prompt: str) -> str:
         pass
 
+    @abstractmethod
+    async def ainvoke(self, prompt: str) -> str:
+        pass
+
 
 class OpenAIModel(AIModel):
-    def __init__(self, api_key: str, llm_model: str):
+    def __init__(self, api_key: str, llm_model: str, http_client=None, http_async_client=None, llm_api_url: str = ""):
         from langchain_openai import ChatOpenAI
+        self.llm_model = llm_model
+        self.temperature = 0.4
+        # An empty url keeps the default OpenAI endpoint, otherwise any compatible server (e.g. mock_openai_server)
         self.model = ChatOpenAI(
-            model_name=llm_model, openai_api_key=api_key, temperature=0.4
+            model_name=llm_model, openai_api_key=api_key, temperature=0.4, base_url=llm_api_url or None,
+            http_client=http_client, http_async_client=http_async_client,
         )
 
     def invoke(self, prompt: str) -> BaseMessage:
@@ -36,12 +64,19 @@ class OpenAIModel(AIModel):
         response = self.model.invoke(prompt)
         return response
 
+    async def ainvoke(self, prompt: str) -> BaseMessage:
+        logger.debug("Invoking OpenAI API asynchronously")
+        response = await self.model.ainvoke(prompt)
+        return response
+
 
 class ClaudeModel(AIModel):
     def __init__(self, api_key: str, llm_model: str):
         from langchain_anthropic import ChatAnthropic
         logger.error(
             f"Warning attempting to create a model: {self.__class__.__name__} this model is not currently supported by the project!")
+        self.llm_model = llm_model
+        self.temperature = 0.4
         self.model = ChatAnthropic(model=llm_model, api_key=api_key, temperature=0.4)
 
     def invoke(self, prompt: str) -> BaseMessage:
@@ -49,6 +84,11 @@ class ClaudeModel(AIModel):
         logger.debug("Invoking Claude API")
         return response
 
+    async def ainvoke(self, prompt: str) -> BaseMessage:
+        response = await self.model.ainvoke(prompt)
+        logger.debug("Invoking Claude API asynchronously")
+        return response
+
 
 class OllamaModel(AIModel):
     def __init__(self, llm_model: str, llm_api_url: str):
@@ -56,6 +96,7 @@ class OllamaModel(AIModel):
 
         logger.error(
             f"Warning attempting to create a model: {self.__class__.__name__} this model is not currently supported by the project!")
+        self.llm_model = llm_model
         if len(llm_api_url) > 0:
             logger.debug(f"Using Ollama with API URL: {llm_api_url}")
             self.model = ChatOllama(model=llm_model, base_url=llm_api_url)
@@ -66,18 +107,28 @@ class OllamaModel(AIModel):
         response = self.model.invoke(prompt)
         return response
 
+    async def ainvoke(self, prompt: str) -> BaseMessage:
+        response = await self.model.ainvoke(prompt)
+        return response
+
 
 class PerplexityModel(AIModel):
     def __init__(self, api_key: str, llm_model: str):
         from langchain_community.chat_models import ChatPerplexity
         logger.error(
             f"Warning attempting to create a model: {self.__class__.__name__} this model is not currently supported by the project!")
+        self.llm_model = llm_model
+        self.temperature = 0.4
         self.model = ChatPerplexity(model=llm_model, api_key=api_key, temperature=0.4)
 
     def invoke(self, prompt: str) -> BaseMessage:
         response = self.model.invoke(prompt)
         return response
 
+    async def ainvoke(self, prompt: str) -> BaseMessage:
+        response = await self.model.ainvoke(prompt)
+        return response
+
 
 # gemini doesn't seem to work because API doesn't rstitute answers for questions that involve answers that are too short
 class GeminiModel(AIModel):
@@ -90,6 +141,7 @@ class GeminiModel(AIModel):
 
         logger.error(
             f"Warning attempting to create a model: {self.__class__.__name__} this model is not currently supported by the project!")
+        self.llm_model = llm_model
         self.model = ChatGoogleGenerativeAI(
             model=llm_model,
             google_api_key=api_key,
@@ -112,6 +164,10 @@ class GeminiModel(AIModel):
         response = self.model.invoke(prompt)
         return response
 
+    async def ainvoke(self, prompt: str) -> BaseMessage:
+        response = await self.model.ainvoke(prompt)
+        return response
+
 
 class HuggingFaceModel(AIModel):
     def __init__(self, api_key: str, llm_model: str):
@@ -119,6 +175,8 @@ class HuggingFaceModel(AIModel):
 
         logger.error(
             f"Warning attempting to create a model: {self.__class__.__name__} this model is not currently supported by the project!")
+        self.llm_model = llm_model
+        self.temperature = 0.4
         self.model = HuggingFaceEndpoint(
             repo_id=llm_model, huggingfacehub_api_token=api_key, temperature=0.4
         )
@@ -131,21 +189,99 @@ class HuggingFaceModel(AIModel):
         )
         return response
 
+    async def ainvoke(self, prompt: str) -> BaseMessage:
+        response = await self.chatmodel.ainvoke(prompt)
+        logger.debug(
+            f"Invoking Model from Hugging Face API asynchronously. Response: {response}, Type: {type(response)}"
+        )
+        return response
+
+
+class CassetteModel(AIModel):
+    '''
+    Records the calls of the wrapped model to the cassette, or replays them from it when no model is wrapped. Replay
+    needs neither network nor API key, see llm_cassette.
+    '''
+
+    def __init__(self, llm_model: str, model: AIModel = None, cassette: LLMCassette = None,
+                 replay_latency: bool = None):
+        self.llm_model = llm_model
+        self.temperature = model.temperature if model is not None else None
+        self.model = model
+        self.cassette = cassette or LLMCassette.shared()
+        if replay_latency is None:
+            replay_latency = global_config.LLM_CASSETTE_REPLAY_LATENCY
+        self.replay_latency = replay_latency
+
+    def invoke(self, prompt: str) -> BaseMessage:
+        if self.model is None:
+            reply, latency = self.cassette.replay(self.llm_model, prompt)
+            if self.replay_latency:
+                time.sleep(latency)
+            return reply
+        start = time.perf_counter()
+        reply = self.model.invoke(prompt)
+        self.cassette.record(self.llm_model, prompt, reply, time.perf_counter() - start)
+        return reply
+
+    async def ainvoke(self, prompt: str) -> BaseMessage:
+        if self.model is None:
+            reply, latency = self.cassette.replay(self.llm_model, prompt)
+            if self.replay_latency:
+                await asyncio.sleep(latency)
+            return reply
+        start = time.perf_counter()
+        reply = await self.model.ainvoke(prompt)
+        self.cassette.record(self.llm_model, prompt, reply, time.perf_counter() - start)
+        return reply
+
 
 class LlmManager:
     def __init__(self, api_key: str):
+        self.api_key = api_key
         self.model = self._create_model(api_key)
+        # Models of each tier, created the first time a prompt category routes to them
+        self.tier_models: Dict[str, AIModel] = {}
+        self.secondary_model: AIModel = None
+        self.downgraded = False
+        # Prompts queued for the next batch submission, and the prompts of submitted batches keyed by custom_id
+        self.batch_requests: List[Dict] = []
+        self.batch_prompts: Dict[str, object] = {}
+
+    def _create_model(self, api_key: str, llm_model: str = None, llm_model_type: str = None) -> AIModel:
+        # Models are shared by every LlmManager of the process, see llm_client_registry
+        llm_model_type = llm_model_type or global_config.LLM_MODEL_TYPE
+        llm_model = llm_model or global_config.LLM_MODEL
+        return llm_client_registry.get_model(
+            llm_model_type, llm_model, api_key,
+            lambda: self._build_model(api_key, llm_model, llm_model_type),
+            llm_api_url=global_config.LLM_API_URL, cassette_mode=global_config.LLM_CASSETTE_MODE,
+        )
 
-    def _create_model(self, api_key: str) -> AIModel:
-        llm_model_type = global_config.LLM_MODEL_TYPE
-        llm_model = global_config.LLM_MODEL
+    @staticmethod
+    def _build_model(api_key: str, llm_model: str, llm_model_type: str) -> AIModel:
+        cassette_mode = global_config.LLM_CASSETTE_MODE
+        if cassette_mode == REPLAY:
+            logger.debug(f"Replaying {llm_model} calls from {global_config.LLM_CASSETTE_PATH}")
+            return CassetteModel(llm_model)
+        model = LlmManager._build_provider_model(api_key, llm_model, llm_model_type)
+        if cassette_mode == RECORD:
+            return CassetteModel(llm_model, model)
+        return model
 
-        llm_api_url = config.LLM_API_URL
+    @staticmethod
+    def _build_provider_model(api_key: str, llm_model: str, llm_model_type: str) -> AIModel:
+        llm_api_url = global_config.LLM_API_URL
 
         logger.debug(f"Using {llm_model_type} with {llm_model}")
 
         if llm_model_type == OPENAI:
-            return OpenAIModel(api_key, llm_model)
+            return OpenAIModel(
+                api_key, llm_model,
+                http_client=llm_client_registry.get_http_client(),
+                http_async_client=llm_client_registry.get_async_http_client(),
+                llm_api_url=llm_api_url,
+            )
         elif llm_model_type == CLAUDE:
             return ClaudeModel(api_key, llm_model)
         elif llm_model_type == OLLAMA:
@@ -159,8 +295,157 @@ class LlmManager:
         else:
             raise ValueError(f"Unsupported model type: {llm_model_type}")
 
+    @property
+    def model_name(self) -> str:
+        return self.model.llm_model
+
+    @property
+    def temperature(self) -> float:
+        return self.model.temperature
+
+    def downgrade(self, llm_model: str):
+        # Swaps the model for a cheaper one of the same provider, used once the LLM budget is reached. Every tier is
+        # served by the downgraded model from then on.
+        self.model = self._create_model(self.api_key, llm_model)
+        self.downgraded = True
+
+    def tier_model(self, tier: str) -> AIModel:
+        if self.downgraded:
+            return self.model
+        if tier not in self.tier_models:
+            tier_config = global_config.LLM_MODEL_TIERS[tier]
+            self.tier_models[tier] = self._create_model(
+                self.api_key, tier_config["model"], tier_config.get("model_type")
+            )
+        return self.tier_models[tier]
+
+    def hedge_model(self, primary: AIModel) -> AIModel:
+        # Model that receives the duplicate request of a slow call, the primary itself unless a secondary is configured
+        secondary_config = global_config.LLM_HEDGE_SECONDARY
+        if secondary_config is None:
+            return primary
+        if self.secondary_model is None:
+            self.secondary_model = self._create_model(
+                self.api_key, secondary_config["model"], secondary_config.get("model_type")
+            )
+        return self.secondary_model
+
+    def hedged_invoke(self, model: AIModel, prompt):
+        return hedged_invoke(model, self.hedge_model(model), prompt)
+
+    async def hedged_ainvoke(self, model: AIModel, prompt):
+        return await hedged_ainvoke(model, self.hedge_model(model), prompt)
+
+    def for_category(self, category: str) -> RoutedLlm:
+        '''
+        Returns a view of this manager that sends prompts of the given category (summarize, classify, html...) to
+        the tier configured in global_config.LLM_PROMPT_CATEGORY_TIERS, falling back along LLM_TIER_FALLBACK_ORDER.
+        '''
+        return RoutedLlm(self, category)
+
+    @staticmethod
+    def tier_stats() -> Dict[str, Dict]:
+        # Calls, failures, cost and latency percentiles of every tier used in this process
+        return TierStats.summary()
+
     def invoke(self, prompt: str) -> str:
-        return self.model.invoke(prompt)
+        return self.hedged_invoke(self.model, prompt)
+
+    async def ainvoke(self, prompt: str) -> str:
+        return await self.hedged_ainvoke(self.model, prompt)
+
+    '''
+    Batch mode: instead of invoking the model for every prompt, prompts produced for many jobs are queued with
+    add_batch_request, written to an OpenAI Batch JSONL file by submit_batch and answered later by collect_batch.
+    Latency per prompt is hours instead of seconds but throughput and cost are much better for overnight runs.
+    '''
+
+    def _create_batch_client(self) -> BatchClient:
+        if global_config.LLM_BATCH_CLIENT == "local":
+            return LocalBatchClient()
+        return OpenAIBatchClient(self.api_key)
+
+    @staticmethod
+    def _to_openai_messages(prompt) -> List[Dict[str, str]]:
+        roles = {"human": "user", "ai": "assistant", "system": "system"}
+        if isinstance(prompt, str):
+            return [{"role": "user", "content": prompt}]
+        messages = prompt.to_messages() if hasattr(prompt, "to_messages") else prompt
+        return [{"role": roles.get(message.type, "user"), "content": message.content} for message in messages]
+
+    def add_batch_request(self, custom_id: str, prompt, job_id: str = None, prompt_type: str = None):
+        self.batch_prompts[custom_id] = (prompt, job_id, prompt_type)
+        self.batch_requests.append({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": self.model_name,
+                "temperature": self.temperature,
+                "messages": self._to_openai_messages(prompt),
+            },
+        })
+
+    def submit_batch(self, batch_client: BatchClient = None) -> str:
+        batch_client = batch_client or self._create_batch_client()
+        batch_directory = global_config.LOG_OUTPUT_FILE_PATH / "batches"
+        batch_directory.mkdir(parents=True, exist_ok=True)
+        input_path = batch_directory / f"batch_input_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.jsonl"
+        with open(input_path, "w", encoding="utf-8") as f:
+            for request in self.batch_requests:
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+        logger.info(f"Submitting batch of {len(self.batch_requests)} requests from {input_path}")
+        self.batch_requests = []
+        return batch_client.submit(input_path)
+
+    def collect_batch(self, batch_id: str, batch_client: BatchClient = None) -> Dict[str, AIMessage]:
+        batch_client = batch_client or self._create_batch_client()
+        status = batch_client.status(batch_id)
+        while status != BATCH_COMPLETED:
+            if status in BATCH_FAILED_STATES:
+                raise RuntimeError(f"Batch {batch_id} finished with status {status}")
+            logger.debug(f"Batch {batch_id} is {status}, polling again in {global_config.LLM_BATCH_POLL_SECONDS} seconds")
+            time.sleep(global_config.LLM_BATCH_POLL_SECONDS)
+            status = batch_client.status(batch_id)
+
+        replies = {}
+        for result in batch_client.download_results(batch_id):
+            custom_id = result["custom_id"]
+            response = result.get("response") or {}
+            if result.get("error") or response.get("status_code") != 200:
+                logger.error(f"Batch request {custom_id} failed: {result.get('error') or response}")
+                continue
+            body = response["body"]
+            usage = body.get("usage", {})
+            usage_metadata = {
+                "input_tokens": usage.get("prompt_tokens", 0),
+                "output_tokens": usage.get("completion_tokens", 0),
+                "total_tokens": usage.get("total_tokens", 0),
+            }
+            cached_input_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+            response_metadata = {
+                "model_name": body.get("model", ""),
+                "system_fingerprint": body.get("system_fingerprint", ""),
+                "finish_reason": body["choices"][0].get("finish_reason", ""),
+                "logprobs": None,
+            }
+            content = body["choices"][0]["message"]["content"]
+            prompt, job_id, prompt_type = self.batch_prompts.pop(custom_id, (content, None, None))
+            LLMLogger.log_request(
+                prompts=prompt,
+                job_id=job_id,
+                prompt_type=prompt_type,
+                parsed_reply={
+                    "content": content,
+                    "response_metadata": response_metadata,
+                    "id": body.get("id"),
+                    "usage_metadata": dict(usage_metadata, cached_input_tokens=cached_input_tokens),
+                },
+            )
+            replies[custom_id] = AIMessage(
+                content=content, response_metadata=response_metadata, id=body.get("id"), usage_metadata=usage_metadata
+            )
+        return replies
 
 
 '''
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+from local_config import global_config
+from loguru import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows, the limiter is then only shared between threads of the same process
+    fcntl = None
+
+"""
+This module contains a token bucket rate limiter for LLM calls. Requests per minute and tokens per minute are tracked per
+model, so every thread draws from the same budget instead of each one sleeping on its own after a 429. The buckets live
+in memory, shared by the threads of the process. With LLM_RATE_LIMIT_SHARE_ACROSS_PROCESSES they live in a small json
+file guarded by a lock file instead, so every worker process on the machine shares them too; the async path then does
+that file IO on a worker thread rather than on the event loop.
+"""
+
+
+class LLMRateLimiter:
+    _thread_lock = threading.Lock()
+    # In process bucket states by state file path, so every limiter of the process using that path shares them
+    _memory_states: Dict[str, Dict] = {}
+
+    def __init__(self, state_path: Path = None, limits: Dict[str, Dict[str, int]] = None, shared: bool = None):
+        self.state_path = Path(state_path or global_config.LLM_RATE_LIMIT_STATE_PATH)
+        self.lock_path = self.state_path.with_suffix(self.state_path.suffix + ".lock")
+        self.limits = limits if limits is not None else global_config.LLM_RATE_LIMITS
+        self.shared = global_config.LLM_RATE_LIMIT_SHARE_ACROSS_PROCESSES if shared is None else shared
+        if self.shared:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def _limits_for(self, model_name: str) -> Dict[str, int]:
+        return self.limits.get(model_name, self.limits["default"])
+
+    @contextmanager
+    def _locked_state(self):
+        # Yields the bucket state; a shared one is written back while still holding both the thread and the file lock.
+        if not self.shared:
+            with LLMRateLimiter._thread_lock:
+                yield LLMRateLimiter._memory_states.setdefault(str(self.state_path), {})
+            return
+        with LLMRateLimiter._thread_lock, open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.state_path, "r", encoding="utf-8") as f:
+                        state = json.load(f)
+                except (FileNotFoundError, json.JSONDecodeError):
+                    state = {}
+                yield state
+                temp_path = self.state_path.with_suffix(f".{os.getpid()}.tmp")
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(state, f)
+                os.replace(temp_path, self.state_path)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _try_acquire(self, model_name: str, tokens: int) -> float:
+        # Takes one request and `tokens` tokens from the model's buckets, returns 0 or how long to wait before retrying.
+        limits = self._limits_for(model_name)
+        requests_per_minute = limits["requests_per_minute"]
+        tokens_per_minute = limits["tokens_per_minute"]
+        # A single prompt larger than the whole minute budget would otherwise never be allowed through.
+        tokens = min(tokens, tokens_per_minute)
+        now = time.time()
+        with self._locked_state() as state:
+            bucket = state.setdefault(model_name, {
+                "requests": requests_per_minute,
+                "tokens": tokens_per_minute,
+                "updated": now,
+                "blocked_until": 0,
+            })
+            elapsed = max(0.0, now - bucket["updated"])
+            bucket["requests"] = min(requests_per_minute, bucket["requests"] + elapsed * requests_per_minute / 60)
+            bucket["tokens"] = min(tokens_per_minute, bucket["tokens"] + elapsed * tokens_per_minute / 60)
+            bucket["updated"] = now
+
+            if bucket["blocked_until"] > now:
+                return bucket["blocked_until"] - now
+            if bucket["requests"] >= 1 and bucket["tokens"] >= tokens:
+                bucket["requests"] -= 1
+                bucket["tokens"] -= tokens
+                return 0
+            request_wait = (1 - bucket["requests"]) * 60 / requests_per_minute if bucket["requests"] < 1 else 0
+            token_wait = (tokens - bucket["tokens"]) * 60 / tokens_per_minute if bucket["tokens"] < tokens else 0
+            return max(request_wait, token_wait)
+
+    def acquire(self, model_name: str, tokens: int):
+        while True:
+            wait_time = self._try_acquire(model_name, tokens)
+            if wait_time <= 0:
+                return
+            logger.debug(f"Rate limiter holding {model_name} call for {wait_time:.2f} seconds")
+            time.sleep(wait_time)
+
+    async def aacquire(self, model_name: str, tokens: int):
+        while True:
+            if self.shared:
+                # Locking and rewriting the state file would block the event loop
+                wait_time = await asyncio.to_thread(self._try_acquire, model_name, tokens)
+            else:
+                wait_time = self._try_acquire(model_name, tokens)
+            if wait_time <= 0:
+                return
+            logger.debug(f"Rate limiter holding {model_name} call for {wait_time:.2f} seconds")
+            await asyncio.sleep(wait_time)
+
+    def block(self, model_name: str, wait_time: float):
+        # Called after a 429 so every worker backs off together instead of hammering the provider in lock step.
+        with self._locked_state() as state:
+            bucket = state.setdefault(model_name, {
+                "requests": 0,
+                "tokens": 0,
+                "updated": time.time(),
+                "blocked_until": 0,
+            })
+            bucket["blocked_until"] = max(bucket["blocked_until"], time.time() + wait_time)
+
+    @staticmethod
+    def estimate_tokens(prompt_text: str) -> int:
+        # Roughly four characters per token for english text, good enough to pace requests.
+        return max(1, len(prompt_text) // 4)
+
+    @staticmethod
+    def is_rate_limit_error(err: Exception) -> bool:
+        # openai/anthropic errors carry the status code themselves, httpx errors on their response
+        status_code = getattr(err, "status_code", None) or getattr(getattr(err, "response", None), "status_code", None)
+        return status_code == 429
+
+    @staticmethod
+    def retry_after_from_error(err: Exception) -> Optional[float]:
+        # Both openai and httpx errors carry the http response, the provider tells us how long to wait in its headers.
+        response = getattr(err, "response", None)
+        headers = getattr(response, "headers", None)
+        if not headers:
+            return None
+        retry_after_ms = headers.get("retry-after-ms")
+        retry_after = headers.get("retry-after")
+        try:
+            if retry_after_ms:
+                return float(retry_after_ms) / 1000.0
+            if retry_after:
+                return float(retry_after)
+        except ValueError:
+            logger.warning(f"Could not parse retry-after headers: {retry_after}, {retry_after_ms}")
+        return None
+
+    @staticmethod
+    def backoff_time(attempt: int) -> float:
+        # Exponential backoff with full jitter so retrying workers spread out instead of waking up together.
+        ceiling = min(global_config.LLM_BACKOFF_MAX_SECONDS, global_config.LLM_BACKOFF_BASE_SECONDS * (2 ** attempt))
+        return random.uniform(0, ceiling)
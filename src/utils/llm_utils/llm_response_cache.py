@@ -0,0 +1,103 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from local_config import global_config
+from loguru import logger
+
+"""
+This module contains a disk backed cache for LLM responses. Entries are content addressed on the model name, the
+temperature and a hash of the fully rendered prompt so that byte-identical prompts (resume headers, education,
+certifications...) are answered locally instead of going back to the provider.
+"""
+
+
+class LLMResponseCache:
+
+    def __init__(self, db_path: Path = None, max_entries: int = None, max_age_seconds: int = None):
+        self.db_path = Path(db_path or global_config.LLM_CACHE_PATH)
+        self.max_entries = max_entries if max_entries is not None else global_config.LLM_CACHE_MAX_ENTRIES
+        self.max_age_seconds = max_age_seconds if max_age_seconds is not None else global_config.LLM_CACHE_MAX_AGE_SECONDS
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, "
+                "model_name TEXT, "
+                "response TEXT NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "last_access REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # A short lived connection per operation keeps the cache safe to share between threads and processes.
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    @staticmethod
+    def render_prompt(prompts) -> str:
+        # Renders whatever langchain handed us (string, prompt value or list of messages) into stable text.
+        if isinstance(prompts, str):
+            return prompts
+        if hasattr(prompts, "to_string"):
+            return prompts.to_string()
+        if isinstance(prompts, (list, tuple)):
+            return json.dumps(
+                [getattr(message, "content", message) for message in prompts], ensure_ascii=False, sort_keys=True
+            )
+        return str(prompts)
+
+    @staticmethod
+    def make_key(model_name: str, temperature, prompts) -> str:
+        prompt_hash = hashlib.sha256(LLMResponseCache.render_prompt(prompts).encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{model_name}|{temperature}|{prompt_hash}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock, self._connect() as connection:
+            row = connection.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.max_age_seconds and now - row[1] > self.max_age_seconds:
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, key: str, model_name: str, response: Dict):
+        now = time.time()
+        with self._lock, self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, model_name, response, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model_name, json.dumps(response, ensure_ascii=False), now, now),
+            )
+            self._evict(connection, now)
+
+    def _evict(self, connection: sqlite3.Connection, now: float):
+        if self.max_age_seconds:
+            connection.execute("DELETE FROM responses WHERE created_at < ?", (now - self.max_age_seconds,))
+        if self.max_entries:
+            # Least recently used entries go first once we are over the configured size.
+            connection.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        with self._lock, self._connect() as connection:
+            connection.execute("DELETE FROM responses")
+        logger.debug(f"Cleared LLM response cache at {self.db_path}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
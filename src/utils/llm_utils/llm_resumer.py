@@ -0,0 +1,270 @@
+import asyncio
+import json
+import textwrap
+from langchain_core.prompts import ChatPromptTemplate
+from local_config import global_config
+from src.generate_templates import resume_json_renderer
+from src.logging import logger
+from src.utils.llm_utils import llm_client_registry
+from src.utils.llm_utils.llm_cassette import RECORD
+from src.utils.llm_utils.llm_cost_tracker import LLMCostTracker
+from src.utils.llm_utils.llm_logger import LLMLogger
+from src.utils.llm_utils.llm_manager import LlmManager
+from src.utils.llm_utils.open_ai_action_wrapper import OpenAiActionWrapper
+from src.utils.llm_utils.prompt_budget import PromptBudgeter
+from src.utils.llm_utils.prompts import resume_generation_prompts, resume_json_prompts
+from src.utils.llm_utils.resume_fragment_store import ResumeFragmentStore
+
+"""
+This module contains the class that asks the LLM to write each section of a resume. Every section comes from an
+independent prompt, so they are sent to the model concurrently and the resume takes about as long as its slowest section.
+Depending on global_config.LLM_RESUME_OUTPUT_FORMAT the model answers with the section HTML or with compact JSON that
+is validated and rendered to HTML locally (see resume_json_renderer).
+"""
+
+
+# Sections written from the candidate's data alone, they are generated once per resume version and reused for every job
+JOB_INDEPENDENT_SECTIONS = ("header", "education")
+
+
+class LLMResumer:
+    # Shared by every resumer of the process, stale fragments are pruned when it is created
+    _shared_fragment_store: ResumeFragmentStore = None
+
+    def __init__(self, api_key: str, strings=None, llm_manager: LlmManager = None, output_format: str = None):
+        self.llm_manager = llm_manager or LlmManager(api_key)
+        # HTML sections need the strong tier, summarising the job description is cheap work for the fast tier
+        self.llm = OpenAiActionWrapper(self.llm_manager.for_category("html"))
+        self.llm_summarizer = OpenAiActionWrapper(self.llm_manager.for_category("summarize"))
+        self.prompt_budgeter = PromptBudgeter(self.llm.llm.model_name)
+        self.output_format = output_format or global_config.LLM_RESUME_OUTPUT_FORMAT
+        if strings is None:
+            strings = resume_json_prompts if self.output_format == "json" else resume_generation_prompts
+        self.strings = strings
+        self.resume = None
+        self.job_description = ""
+        self.fragment_store = self._get_fragment_store()
+
+    @classmethod
+    def _get_fragment_store(cls):
+        # Stored fragments skip their prompts, which would then be missing from the cassette being recorded
+        if not global_config.RESUME_FRAGMENT_STORE_ENABLED or global_config.LLM_CASSETTE_MODE == RECORD:
+            return None
+        if cls._shared_fragment_store is None:
+            cls._shared_fragment_store = ResumeFragmentStore()
+            cls._shared_fragment_store.prune()
+        return cls._shared_fragment_store
+
+    @staticmethod
+    def _preprocess_template_string(template: str) -> str:
+        return textwrap.dedent(template)
+
+    @staticmethod
+    def _clean_html(output: str) -> str:
+        return output.replace("```html", "").replace("```", "").strip()
+
+    @staticmethod
+    def _parse_json_section(section_name: str, output: str):
+        # Returns (data, error), error is None when the answer is valid JSON matching the section's schema.
+        output = output.replace("```json", "").replace("```", "").strip()
+        try:
+            data = json.loads(output)
+        except json.JSONDecodeError as e:
+            return None, f"invalid JSON: {e}"
+        return data, resume_json_renderer.validate_section(section_name, data)
+
+    def render_section(self, section_name: str, output: str) -> str:
+        # Turns the model's answer for one section into HTML. Invalid JSON sections are left out of the resume.
+        if self.output_format != "json":
+            return self._clean_html(output)
+        data, error = self._parse_json_section(section_name, output)
+        if error is not None:
+            logger.error(f"Dropping resume section {section_name}, the model's answer is not usable: {error}")
+            return ""
+        return resume_json_renderer.render_section(section_name, data)
+
+    def set_resume(self, resume):
+        self.resume = resume
+
+    def set_job_description_from_text(self, job_description_text: str, summarize: bool = None):
+        # The summary keeps only what matters for tailoring, so every section prompt that embeds it gets smaller
+        if summarize is None:
+            summarize = global_config.LLM_SUMMARIZE_JOB_DESCRIPTION
+        if summarize and job_description_text:
+            job_description_text = self.summarize_job_description(job_description_text)
+        self.job_description = job_description_text
+
+    def summarize_job_description(self, job_description_text: str) -> str:
+        prompt = ChatPromptTemplate.from_template(self._preprocess_template_string(self.strings.summarize_prompt_template))
+        with LLMCostTracker.context(prompt_type="summarize_job_description"):
+            reply = self.llm_summarizer(prompt.format_prompt(text=job_description_text))
+        return reply.content.replace("*", "").replace("#", "").strip()
+
+    def _collect_skills(self) -> set:
+        skills = set()
+        for experience in self.resume.experience_details or []:
+            skills.update(experience.skills_acquired or [])
+        return skills
+
+    def _section_inputs(self) -> dict:
+        # Maps each resume section to the prompt that writes it and the values that fill that prompt.
+        return {
+            "header": (self.strings.prompt_header, {
+                "personal_information": self.resume.personal_information,
+            }),
+            "education": (self.strings.prompt_education, {
+                "education_details": self.resume.education_details,
+            }),
+            "experience": (self.strings.prompt_working_experience, {
+                "experience_details": self.resume.experience_details,
+                "job_description": self.job_description,
+            }),
+            "projects": (self.strings.prompt_projects, {
+                "projects": self.resume.projects,
+                "job_description": self.job_description,
+            }),
+            "achievements": (self.strings.prompt_achievements, {
+                "achievements": self.resume.achievements,
+                "job_description": self.job_description,
+            }),
+            "certifications": (self.strings.prompt_certifications, {
+                "certifications": self.resume.certifications,
+                "job_description": self.job_description,
+            }),
+            "additional_skills": (self.strings.prompt_additional_skills, {
+                "languages": self.resume.languages,
+                "interests": self.resume.interests,
+                # Sorted, a set's order changes between processes and would change the prompt (and its cache key)
+                "skills": sorted(self._collect_skills()),
+                "job_description": self.job_description,
+            }),
+        }
+
+    def section_prompts(self, section_names: list = None) -> dict:
+        # Renders the section prompts (all of them by default) without sending them (used directly by batch mode),
+        # compressing the ones that are over their token budget.
+        prompts = {}
+        for section_name, (template, inputs) in self._section_inputs().items():
+            if section_names is not None and section_name not in section_names:
+                continue
+            prompt, compression_stats = self.prompt_budgeter.fit(
+                section_name, self._preprocess_template_string(template), inputs
+            )
+            LLMLogger.log_prompt_compression(compression_stats)
+            prompts[section_name] = prompt
+        return prompts
+
+    def _join_sections(self, section_html: dict) -> str:
+        # Sections are laid out in the order of _section_inputs so the body reads top to bottom like the template
+        section_names = list(self._section_inputs().keys())
+        header_html = section_html.get(section_names[0], "")
+        body_html = [section_html[section_name] for section_name in section_names[1:] if section_name in section_html]
+        return f"{header_html}\n<main>\n" + "\n".join(body_html) + "\n</main>"
+
+    def assemble_html_resume(self, section_outputs: dict, pregenerated: dict = None) -> str:
+        # pregenerated holds sections that are already HTML, e.g. from pregenerate_job_independent_sections()
+        section_html = dict(pregenerated or {})
+        section_html.update({
+            section_name: self.render_section(section_name, output) for section_name, output in section_outputs.items()
+        })
+        return self._join_sections(section_html)
+
+    def fragment_keys(self) -> dict:
+        # Identity of each section's fragment: its inputs, its prompt template and the model writing it
+        return {
+            section_name: ResumeFragmentStore.make_key(
+                section_name, inputs, template, self.llm.llm.model_name, self.output_format
+            )
+            for section_name, (template, inputs) in self._section_inputs().items()
+        }
+
+    def stored_fragments(self, fragment_keys: dict) -> dict:
+        if self.fragment_store is None:
+            return {}
+        stored = {}
+        for section_name, key in fragment_keys.items():
+            html = self.fragment_store.get(key)
+            if html is not None:
+                stored[section_name] = html
+        return stored
+
+    async def _aensure_valid_section(self, section_name: str, prompt, output: str) -> str:
+        # An unusable JSON answer is asked for again, skipping (and replacing) the cached copy of it
+        if self.output_format != "json":
+            return output
+        for attempt in range(1, global_config.LLM_JSON_SECTION_MAX_ATTEMPTS):
+            _, error = self._parse_json_section(section_name, output)
+            if error is None:
+                break
+            logger.warning(f"Resume section {section_name} answer rejected ({error}), asking again "
+                           f"(Attempt {attempt + 1}/{global_config.LLM_JSON_SECTION_MAX_ATTEMPTS})")
+            output = (await self.llm.acall(prompt, refresh_cache=True)).content
+        return output
+
+    async def _agenerate_section(self, section_name: str, prompt) -> str:
+        with LLMCostTracker.context(prompt_type=section_name):
+            reply = await self.llm.acall(prompt)
+            output = await self._aensure_valid_section(section_name, prompt, reply.content)
+        logger.debug(f"Generated resume section: {section_name}")
+        return output
+
+    async def _arepair_section(self, section_name: str, prompt, output) -> str:
+        if output is None:
+            logger.warning(f"Resume section {section_name} has no batch answer, asking the model directly")
+            return await self._agenerate_section(section_name, prompt)
+        with LLMCostTracker.context(prompt_type=section_name):
+            return await self._aensure_valid_section(section_name, prompt, output)
+
+    def repair_sections(self, section_outputs: dict, prompts: dict) -> dict:
+        '''
+        Checks the answers of a batch like the direct calls do: sections without an answer (a failed batch request) and,
+        in JSON mode, answers that do not validate are asked again through the regular client.
+        :param section_outputs: section name -> answer of the batch
+        :param prompts: section name -> prompt sent in the batch
+        '''
+        async def repair():
+            section_names = list(prompts)
+            outputs = await asyncio.gather(*[
+                self._arepair_section(name, prompts[name], section_outputs.get(name)) for name in section_names
+            ])
+            return dict(zip(section_names, outputs))
+        return llm_client_registry.run_async(repair())
+
+    async def agenerate_sections(self, section_names=None) -> dict:
+        # Sections whose inputs, prompt and model are unchanged come from the fragment store, only the others are sent
+        fragment_keys = self.fragment_keys()
+        if section_names is not None:
+            fragment_keys = {name: key for name, key in fragment_keys.items() if name in section_names}
+        section_html = self.stored_fragments(fragment_keys)
+        prompts = self.section_prompts([name for name in fragment_keys if name not in section_html])
+        logger.debug(f"Reusing {len(section_html)} stored resume sections, generating {len(prompts)}")
+        results = await asyncio.gather(*[
+            self._agenerate_section(section_name, prompt) for section_name, prompt in prompts.items()
+        ])
+        for section_name, output in zip(prompts.keys(), results):
+            section_html[section_name] = self.render_section(section_name, output)
+            # Dropped (empty) sections are not stored so the next run asks for them again
+            if self.fragment_store is not None and section_html[section_name]:
+                self.fragment_store.put(fragment_keys[section_name], section_html[section_name])
+        return section_html
+
+    def job_dependent_sections(self) -> list:
+        return [name for name in self._section_inputs() if name not in JOB_INDEPENDENT_SECTIONS]
+
+    def pregenerate_job_independent_sections(self) -> dict:
+        '''
+        Generates the sections that do not depend on the job description (header, education) as HTML, to be passed as
+        `pregenerated` when generating the resumes of any number of jobs for the same resume.
+        '''
+        return llm_client_registry.run_async(self.agenerate_sections(JOB_INDEPENDENT_SECTIONS))
+
+    async def agenerate_html_resume(self, pregenerated: dict = None) -> str:
+        section_html = dict(pregenerated or {})
+        section_html.update(await self.agenerate_sections(
+            [name for name in self._section_inputs() if name not in section_html]
+        ))
+        return self._join_sections(section_html)
+
+    def generate_html_resume(self, pregenerated: dict = None) -> str:
+        # Runs on the shared LLM event loop so the async connection pool stays warm between documents
+        return llm_client_registry.run_async(self.agenerate_html_resume(pregenerated))
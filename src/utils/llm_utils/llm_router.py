@@ -0,0 +1,122 @@
+import threading
+import time
+from typing import Dict, List
+from local_config import global_config
+from src.logging import logger
+from src.utils.llm_utils.llm_cost_tracker import LLMCostTracker
+from src.utils.llm_utils.llm_rate_limiter import LLMRateLimiter
+
+"""
+This module contains the pieces LlmManager uses to route prompts to model tiers. Prompt categories (summarize, classify,
+html...) map to a tier through global_config.LLM_PROMPT_CATEGORY_TIERS, each tier is tried in the order given by
+global_config.LLM_TIER_FALLBACK_ORDER, and latency/cost is recorded per tier. Tiers whose circuit breaker is open fail
+fast (see llm_hedging) so the next tier takes over. A rate limited tier does not fall back: the 429 goes up to
+OpenAiActionWrapper, which holds that model's calls and retries, instead of quietly moving the prompt to a weaker model.
+"""
+
+
+class TierStats:
+    _lock = threading.Lock()
+    # tier -> {"calls": int, "failures": int, "latencies": [seconds], "cost": float}
+    stats: Dict[str, Dict] = {}
+
+    @classmethod
+    def record(cls, tier: str, latency: float, reply=None, model_name: str = "", failed: bool = False):
+        cost = 0.0
+        usage = getattr(reply, "usage_metadata", None) or {}
+        if usage:
+            cost = LLMCostTracker.cost_of(model_name, usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+        with cls._lock:
+            tier_stats = cls.stats.setdefault(tier, {"calls": 0, "failures": 0, "latencies": [], "cost": 0.0})
+            tier_stats["calls"] += 1
+            tier_stats["failures"] += int(failed)
+            tier_stats["cost"] += cost
+            if not failed:
+                tier_stats["latencies"].append(latency)
+
+    @staticmethod
+    def _percentile(latencies: List[float], percentile: float) -> float:
+        if not latencies:
+            return 0.0
+        ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))]
+
+    @classmethod
+    def summary(cls) -> Dict[str, Dict]:
+        with cls._lock:
+            return {
+                tier: {
+                    "calls": tier_stats["calls"],
+                    "failures": tier_stats["failures"],
+                    "cost": tier_stats["cost"],
+                    "latency_mean": sum(tier_stats["latencies"]) / len(tier_stats["latencies"]) if tier_stats["latencies"] else 0.0,
+                    "latency_p50": cls._percentile(tier_stats["latencies"], 50),
+                    "latency_p95": cls._percentile(tier_stats["latencies"], 95),
+                }
+                for tier, tier_stats in cls.stats.items()
+            }
+
+
+def tiers_for_category(category: str) -> List[str]:
+    category_tiers = global_config.LLM_PROMPT_CATEGORY_TIERS
+    tier = category_tiers.get(category, category_tiers["default"])
+    return global_config.LLM_TIER_FALLBACK_ORDER.get(tier, [tier])
+
+
+class RoutedLlm:
+    """
+    View of an LlmManager bound to one prompt category. It exposes the same invoke/ainvoke/model_name surface as
+    LlmManager so it can be handed to OpenAiActionWrapper, and falls back to the next tier when a tier fails.
+    """
+
+    def __init__(self, llm_manager, category: str):
+        self.llm_manager = llm_manager
+        self.category = category
+        self.tiers = tiers_for_category(category)
+
+    @property
+    def model_name(self) -> str:
+        return self.llm_manager.tier_model(self.tiers[0]).llm_model
+
+    @property
+    def temperature(self) -> float:
+        return self.llm_manager.tier_model(self.tiers[0]).temperature
+
+    def downgrade(self, llm_model: str):
+        self.llm_manager.downgrade(llm_model)
+
+    def invoke(self, prompt):
+        last_error = None
+        for tier in self.tiers:
+            model = self.llm_manager.tier_model(tier)
+            start = time.perf_counter()
+            try:
+                reply = self.llm_manager.hedged_invoke(model, prompt)
+                TierStats.record(tier, time.perf_counter() - start, reply, model.llm_model)
+                return reply
+            except Exception as e:
+                TierStats.record(tier, time.perf_counter() - start, model_name=model.llm_model, failed=True)
+                if LLMRateLimiter.is_rate_limit_error(e):
+                    e.rate_limited_model = model.llm_model
+                    raise
+                logger.warning(f"Tier {tier} ({model.llm_model}) failed for {self.category} prompt: {e}")
+                last_error = e
+        raise last_error
+
+    async def ainvoke(self, prompt):
+        last_error = None
+        for tier in self.tiers:
+            model = self.llm_manager.tier_model(tier)
+            start = time.perf_counter()
+            try:
+                reply = await self.llm_manager.hedged_ainvoke(model, prompt)
+                TierStats.record(tier, time.perf_counter() - start, reply, model.llm_model)
+                return reply
+            except Exception as e:
+                TierStats.record(tier, time.perf_counter() - start, model_name=model.llm_model, failed=True)
+                if LLMRateLimiter.is_rate_limit_error(e):
+                    e.rate_limited_model = model.llm_model
+                    raise
+                logger.warning(f"Tier {tier} ({model.llm_model}) failed for {self.category} prompt: {e}")
+                last_error = e
+        raise last_error
@@ -0,0 +1,211 @@
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from src.generate_templates.resume_json_renderer import render_section
+
+"""
+This module is a small local stand-in for the OpenAI chat completions endpoint, used to load test the pipeline offline.
+It answers resume section prompts with canned HTML (or JSON when the prompt asks for it), reports token usage, and can
+add latency drawn from a distribution and inject 429s and server errors at configurable rates.
+
+Start it with `python -m src.utils.llm_utils.mock_openai_server --port 8089 --latency lognormal:0.5,0.4 --rate-limit-rate 0.05`
+and point the pipeline at it by setting global_config.LLM_API_URL = "http://127.0.0.1:8089/v1".
+"""
+
+# Sample content of every resume section, rendered to HTML or dumped as JSON depending on what the prompt asks for
+CANNED_SECTIONS: Dict[str, Dict] = {
+    "header": {
+        "name": "Jane Doe", "location": "Berlin, Germany", "phone": "+49 30 1234567", "email": "jane.doe@example.com",
+        "linkedin": "https://www.linkedin.com/in/janedoe", "github": "https://github.com/janedoe",
+    },
+    "education": {"entries": [{
+        "institution": "Technical University of Berlin", "location": "Berlin", "degree": "MSc in Computer Science",
+        "grade": "1.3", "dates": "2014 – 2016", "courses": [{"name": "Distributed Systems", "grade": "1.0"}],
+    }]},
+    "experience": {"entries": [{
+        "company": "Example GmbH", "location": "Berlin", "title": "Senior Software Engineer", "dates": "2020 – Present",
+        "bullets": ["Led the migration of the billing platform to event driven services",
+                    "Cut p95 API latency by 40% through caching and query tuning"],
+    }]},
+    "projects": {"entries": [{
+        "name": "open-profiler", "link": "https://github.com/janedoe/open-profiler",
+        "bullets": ["Sampling profiler for Python services, 2k stars on GitHub"],
+    }]},
+    "achievements": {"items": [{"name": "Engineering Excellence Award", "description": "Recognised for platform reliability work"}]},
+    "certifications": {"items": [{"name": "AWS Solutions Architect", "description": "Professional level certification"}]},
+    "additional_skills": {"skills": ["Python", "PostgreSQL", "Kubernetes", "Terraform"], "languages": ["English: Fluent"]},
+}
+
+# Phrase of the prompt's instructions that identifies the section it asks for
+SECTION_MARKERS = {
+    "polished header": "header",
+    "educational background": "education",
+    "detail the work experience": "experience",
+    "notable side projects": "projects",
+    "significant achievements": "achievements",
+    "significant certifications": "certifications",
+    "additional skills relevant": "additional_skills",
+}
+
+DEFAULT_REPLY = "Key skills: Python, distributed systems, cloud infrastructure. Requirements: 5+ years of experience."
+
+
+class MockSettings:
+    def __init__(self, latency: str = "fixed:0", error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 retry_after: float = 1.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample_latency(self) -> float:
+        # "fixed:SECONDS", "uniform:LOW,HIGH", "normal:MEAN,STDDEV" or "lognormal:MEDIAN,SIGMA"
+        kind, _, params = self.latency.partition(":")
+        values = [float(value) for value in params.split(",") if value]
+        with self._lock:
+            if kind == "fixed":
+                return values[0] if values else 0.0
+            if kind == "uniform":
+                return self.random.uniform(values[0], values[1])
+            if kind == "normal":
+                return max(0.0, self.random.gauss(values[0], values[1]))
+            if kind == "lognormal":
+                return values[0] * self.random.lognormvariate(0, values[1])
+        raise ValueError(f"Unknown latency distribution: {self.latency}")
+
+    def draw_failure(self) -> Optional[int]:
+        # Returns the HTTP status to fail this request with, or None to answer normally
+        with self._lock:
+            roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def canned_reply(prompt: str) -> str:
+    section_name = next((section for marker, section in SECTION_MARKERS.items() if marker in prompt), None)
+    if section_name is None:
+        return DEFAULT_REPLY
+    if "single JSON object" in prompt:
+        return json.dumps(CANNED_SECTIONS[section_name])
+    return render_section(section_name, CANNED_SECTIONS[section_name])
+
+
+def chat_completion(model: str, messages: List[Dict], request_id: int) -> Dict:
+    prompt = "\n".join(str(message.get("content", "")) for message in messages)
+    content = canned_reply(prompt)
+    prompt_tokens = estimate_tokens(prompt)
+    completion_tokens = estimate_tokens(content)
+    return {
+        "id": f"chatcmpl-mock-{request_id}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "system_fingerprint": "mock",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "logprobs": None,
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": 0},
+        },
+    }
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    settings: MockSettings = MockSettings()
+    request_ids = itertools.count(1)
+    stats_lock = threading.Lock()
+    # status code -> number of responses, served at GET /stats
+    stats: Dict[int, int] = {}
+
+    def _send_json(self, status: int, body: Dict, headers: Dict[str, str] = None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+        with MockOpenAIHandler.stats_lock:
+            MockOpenAIHandler.stats[status] = MockOpenAIHandler.stats.get(status, 0) + 1
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with MockOpenAIHandler.stats_lock:
+                self._send_json(200, {str(status): count for status, count in MockOpenAIHandler.stats.items()})
+            return
+        self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(self.settings.sample_latency())
+
+        failure = self.settings.draw_failure()
+        if failure == 429:
+            self._send_json(429, {"error": {
+                "message": "Rate limit reached (mock server)", "type": "requests", "code": "rate_limit_exceeded",
+            }}, headers={"retry-after": str(self.settings.retry_after)})
+            return
+        if failure == 500:
+            self._send_json(500, {"error": {"message": "Internal error (mock server)", "type": "server_error"}})
+            return
+        self._send_json(200, chat_completion(body.get("model", "mock"), body.get("messages", []), next(self.request_ids)))
+
+    def log_message(self, format, *args):
+        # Keeps load tests quiet, /stats has the counts
+        pass
+
+
+def serve(host: str = "127.0.0.1", port: int = 8089, settings: MockSettings = None) -> ThreadingHTTPServer:
+    """Starts the server on a background thread and returns it, call shutdown() to stop it."""
+    MockOpenAIHandler.settings = settings or MockSettings()
+    server = ThreadingHTTPServer((host, port), MockOpenAIHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-openai-server", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI compatible chat completions server for offline load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="fixed:0",
+                        help="fixed:S, uniform:LOW,HIGH, normal:MEAN,STDDEV or lognormal:MEDIAN,SIGMA (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests answered with a 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="retry-after header sent with 429s (seconds)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    mock_server = serve(args.host, args.port, MockSettings(
+        args.latency, args.error_rate, args.rate_limit_rate, args.retry_after, args.seed,
+    ))
+    print(f"Mock OpenAI server listening on http://{args.host}:{args.port}/v1")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mock_server.shutdown()
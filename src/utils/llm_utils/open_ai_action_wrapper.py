@@ -1,65 +1,197 @@
-import openai
-import time
-from typing import Dict, List
-from langchain_core.messages.ai import AIMessage
-from langchain_openai import ChatOpenAI
-from local_config import global_config
-from loguru import logger
-from requests.exceptions import HTTPError as HTTPStatusError
-from src.utils.llm_utils.llm_logger import LLMLogger
-
-"""
-This module contains a class that wraps the ChatOpenAi object and provides wrapper functions to simplify calling
-chat GPT models
-"""
-
-class OpenAiActionWrapper:
-
-    def __init__(self, llm: ChatOpenAI):
-        self.llm = llm
-
-    def __call__(self, messages: List[Dict[str, str]]) -> str:
-        for attempt in range(global_config.MAX_OPEN_AI_RETRIES):
-            try:
-                reply = self.llm.invoke(messages)
-                parsed_reply = self.parse_llmresult(reply)
-                LLMLogger.log_request(prompts=messages, parsed_reply=parsed_reply)
-                return reply
-            except (openai.RateLimitError, HTTPStatusError) as err:
-                if isinstance(err, HTTPStatusError) and err.response.status_code == 429:
-                    logger.warning(f"HTTP 429 Too Many Requests: Waiting for {global_config.OPEN_AI_DELAY} seconds before retrying (Attempt {attempt + 1}/{global_config.MAX_OPEN_AI_RETRIES})...")
-                    time.sleep(global_config.OPEN_AI_DELAY)
-                else:
-                    wait_time = self.parse_wait_time_from_error_message(str(err))
-                    logger.warning(f"Rate limit exceeded or API error. Waiting for {wait_time} seconds before retrying (Attempt {attempt + 1}/{global_config.MAX_OPEN_AI_RETRIES})...")
-                    time.sleep(wait_time)
-            except Exception as e:
-                logger.error(f"Unexpected error occurred: {str(e)}, retrying in {global_config.OPEN_AI_DELAY} seconds... (Attempt {attempt + 1}/{global_config.MAX_OPEN_AI_RETRIES})")
-                time.sleep(global_config.OPEN_AI_DELAY)
-
-        logger.critical("Failed to get a response from the model after multiple attempts.")
-        raise Exception("Failed to get a response from the model after multiple attempts.")
-
-    def parse_llmresult(self, llmresult: AIMessage) -> Dict[str, Dict]:
-        # Parse the LLM result into a structured format.
-        content = llmresult.content
-        response_metadata = llmresult.response_metadata
-        id_ = llmresult.id
-        usage_metadata = llmresult.usage_metadata
-
-        parsed_result = {
-            "content": content,
-            "response_metadata": {
-                "model_name": response_metadata.get("model_name", ""),
-                "system_fingerprint": response_metadata.get("system_fingerprint", ""),
-                "finish_reason": response_metadata.get("finish_reason", ""),
-                "logprobs": response_metadata.get("logprobs", None),
-            },
-            "id": id_,
-            "usage_metadata": {
-                "input_tokens": usage_metadata.get("input_tokens", 0),
-                "output_tokens": usage_metadata.get("output_tokens", 0),
-                "total_tokens": usage_metadata.get("total_tokens", 0),
-            },
-        }
+import asyncio
+import openai
+import time
+from typing import Dict, List
+from langchain_core.messages.ai import AIMessage
+from langchain_openai import ChatOpenAI
+from local_config import global_config
+from loguru import logger
+from src.utils.llm_utils.llm_cassette import RECORD, CassetteMissError
+from src.utils.llm_utils.llm_cost_tracker import LLMCostTracker
+from src.utils.llm_utils.llm_hedging import CircuitOpenError
+from src.utils.llm_utils.llm_logger import LLMLogger
+from src.utils.llm_utils.llm_rate_limiter import LLMRateLimiter
+from src.utils.llm_utils.llm_response_cache import LLMResponseCache
+from src.utils.tracing import Tracer
+
+"""
+This module contains a class that wraps the ChatOpenAi object and provides wrapper functions to simplify calling
+chat GPT models
+"""
+
+class OpenAiActionWrapper:
+    # Shared between every wrapper in the process so hit/miss counters reflect the whole run.
+    _shared_cache: LLMResponseCache = None
+
+    def __init__(self, llm: ChatOpenAI, cache: LLMResponseCache = None, bypass_cache: bool = False,
+                 rate_limiter: LLMRateLimiter = None):
+        self.llm = llm
+        self.rate_limiter = rate_limiter or LLMRateLimiter()
+        # A cache hit would never reach the cassette, so a recorded run asks the model for everything
+        self.bypass_cache = bypass_cache or global_config.LLM_CASSETTE_MODE == RECORD
+        if cache is None and global_config.LLM_CACHE_ENABLED:
+            if OpenAiActionWrapper._shared_cache is None:
+                OpenAiActionWrapper._shared_cache = LLMResponseCache()
+            cache = OpenAiActionWrapper._shared_cache
+        self.cache = cache
+
+    def _model_name(self) -> str:
+        return str(getattr(self.llm, "model_name", None) or getattr(self.llm, "model", ""))
+
+    def _cache_key(self, messages) -> str:
+        temperature = getattr(self.llm, "temperature", None)
+        return LLMResponseCache.make_key(self._model_name(), temperature, messages)
+
+    @staticmethod
+    def _estimate_tokens(messages) -> int:
+        return LLMRateLimiter.estimate_tokens(LLMResponseCache.render_prompt(messages))
+
+    def _get_cached_reply(self, messages, cache_key: str):
+        cached = self.cache.get(cache_key)
+        LLMLogger.log_cache_stats(self.cache.stats())
+        if cached is None:
+            return None
+        LLMLogger.log_request(prompts=messages, parsed_reply=cached, cache_hit=True)
+        return AIMessage(
+            content=cached["content"],
+            response_metadata=cached["response_metadata"],
+            id=cached["id"],
+            usage_metadata={
+                key: cached["usage_metadata"][key] for key in ("input_tokens", "output_tokens", "total_tokens")
+            },
+        )
+
+    def _enforce_budget(self):
+        # Raises BudgetExceededError when the run is out of budget, or switches to the cheaper model if configured to.
+        downgrade_model = LLMCostTracker.enforce_budget()
+        if downgrade_model is None or self._model_name() == downgrade_model:
+            return
+        logger.warning(f"LLM budget reached, downgrading {self._model_name()} to {downgrade_model}")
+        if hasattr(self.llm, "downgrade"):
+            self.llm.downgrade(downgrade_model)
+        else:
+            self.llm.model_name = downgrade_model
+
+    def _lookup_cache(self, messages, refresh_cache: bool = False):
+        # Returns (use_cache, cache_key, cached_reply) for the given messages. With refresh_cache the cached reply is
+        # ignored and overwritten by the new one.
+        use_cache = self.cache is not None and not self.bypass_cache
+        if not use_cache:
+            return False, None, None
+        cache_key = self._cache_key(messages)
+        if refresh_cache:
+            return True, cache_key, None
+        return True, cache_key, self._get_cached_reply(messages, cache_key)
+
+    def _record_reply(self, messages, reply: AIMessage, use_cache: bool, cache_key: str):
+        parsed_reply = self.parse_llmresult(reply)
+        LLMLogger.log_request(prompts=messages, parsed_reply=parsed_reply)
+        if use_cache:
+            self.cache.put(cache_key, parsed_reply["response_metadata"]["model_name"], parsed_reply)
+
+    def _retry_wait_time(self, err: Exception, attempt: int) -> float:
+        # Decides how long this worker should sleep before the next attempt based on the error we got back.
+        is_rate_limited = isinstance(err, openai.RateLimitError) or LLMRateLimiter.is_rate_limit_error(err)
+        if is_rate_limited:
+            wait_time = LLMRateLimiter.retry_after_from_error(err)
+            if wait_time is None:
+                wait_time = LLMRateLimiter.backoff_time(attempt)
+            # A routed call reports the tier's model that was rate limited, it is not always the first tier's
+            model_name = getattr(err, "rate_limited_model", None) or self._model_name()
+            logger.warning(f"Rate limit exceeded: holding all {model_name} calls for {wait_time:.2f} seconds before retrying (Attempt {attempt + 1}/{global_config.MAX_OPEN_AI_RETRIES})...")
+            # The shared limiter makes every worker wait, the next acquire() does the sleeping
+            self.rate_limiter.block(model_name, wait_time)
+            return 0
+        wait_time = LLMRateLimiter.backoff_time(attempt)
+        logger.error(f"Unexpected error occurred: {str(err)}, retrying in {wait_time:.2f} seconds... (Attempt {attempt + 1}/{global_config.MAX_OPEN_AI_RETRIES})")
+        return wait_time
+
+    def _llm_span(self):
+        # Span of one call as seen by the caller, retries and rate limit waits included
+        return Tracer.span("llm.call", model=self._model_name(), prompt_type=LLMCostTracker.current_prompt_type())
+
+    def __call__(self, messages: List[Dict[str, str]], refresh_cache: bool = False) -> str:
+        with self._llm_span() as span:
+            self._enforce_budget()
+            use_cache, cache_key, cached_reply = self._lookup_cache(messages, refresh_cache)
+            span["cache_hit"] = cached_reply is not None
+            if cached_reply is not None:
+                return cached_reply
+
+            estimated_tokens = self._estimate_tokens(messages)
+            for attempt in range(global_config.MAX_OPEN_AI_RETRIES):
+                try:
+                    self.rate_limiter.acquire(self._model_name(), estimated_tokens)
+                    reply = self.llm.invoke(messages)
+                    self._record_reply(messages, reply, use_cache, cache_key)
+                    return reply
+                except (CircuitOpenError, CassetteMissError):
+                    # The provider is known to be failing or the cassette has no recording, retrying cannot help
+                    raise
+                except Exception as err:
+                    time.sleep(self._retry_wait_time(err, attempt))
+
+            logger.critical("Failed to get a response from the model after multiple attempts.")
+            raise Exception("Failed to get a response from the model after multiple attempts.")
+
+    async def acall(self, messages: List[Dict[str, str]], refresh_cache: bool = False) -> str:
+        # Same as __call__ but awaits the model so several prompts can be in flight at once.
+        with self._llm_span() as span:
+            self._enforce_budget()
+            use_cache, cache_key, cached_reply = self._lookup_cache(messages, refresh_cache)
+            span["cache_hit"] = cached_reply is not None
+            if cached_reply is not None:
+                return cached_reply
+
+            estimated_tokens = self._estimate_tokens(messages)
+            for attempt in range(global_config.MAX_OPEN_AI_RETRIES):
+                try:
+                    await self.rate_limiter.aacquire(self._model_name(), estimated_tokens)
+                    reply = await self.llm.ainvoke(messages)
+                    self._record_reply(messages, reply, use_cache, cache_key)
+                    return reply
+                except (CircuitOpenError, CassetteMissError):
+                    # The provider is known to be failing or the cassette has no recording, retrying cannot help
+                    raise
+                except Exception as err:
+                    # A 429 blocks the model in the limiter, which may mean file IO, so it is kept off the event loop
+                    await asyncio.sleep(await asyncio.to_thread(self._retry_wait_time, err, attempt))
+
+            logger.critical("Failed to get a response from the model after multiple attempts.")
+            raise Exception("Failed to get a response from the model after multiple attempts.")
+
+    @staticmethod
+    def cached_input_tokens(llmresult: AIMessage) -> int:
+        # Input tokens the provider served from its prompt cache. Newer langchain reports them in usage_metadata,
+        # older versions only pass OpenAI's raw token_usage through response_metadata.
+        usage_details = (llmresult.usage_metadata or {}).get("input_token_details") or {}
+        if usage_details.get("cache_read") is not None:
+            return usage_details["cache_read"]
+        token_usage = llmresult.response_metadata.get("token_usage") or {}
+        prompt_tokens_details = token_usage.get("prompt_tokens_details") or {}
+        return prompt_tokens_details.get("cached_tokens") or 0
+
+    def parse_llmresult(self, llmresult: AIMessage) -> Dict[str, Dict]:
+        # Parse the LLM result into a structured format.
+        content = llmresult.content
+        response_metadata = llmresult.response_metadata
+        id_ = llmresult.id
+        usage_metadata = llmresult.usage_metadata or {}
+
+        parsed_result = {
+            "content": content,
+            "response_metadata": {
+                "model_name": response_metadata.get("model_name", ""),
+                "system_fingerprint": response_metadata.get("system_fingerprint", ""),
+                "finish_reason": response_metadata.get("finish_reason", ""),
+                "logprobs": response_metadata.get("logprobs", None),
+            },
+            "id": id_,
+            "usage_metadata": {
+                "input_tokens": usage_metadata.get("input_tokens", 0),
+                "output_tokens": usage_metadata.get("output_tokens", 0),
+                "total_tokens": usage_metadata.get("total_tokens", 0),
+                "cached_input_tokens": self.cached_input_tokens(llmresult),
+            },
+        }
         return parsed_result
\ No newline at end of file
@@ -0,0 +1,170 @@
+import re
+from typing import Dict, Tuple
+from langchain_core.prompts import ChatPromptTemplate
+from local_config import global_config
+from loguru import logger
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken normally comes with langchain-openai, fall back to an estimate without it
+    tiktoken = None
+
+"""
+This module measures rendered prompts against a per prompt token budget and compresses the inputs of prompts that are
+over it. Compression is deterministic and applied in steps, re-measuring after each one:
+1. strip boilerplate (EEO statements, benefits, duplicated lines...) from the job description
+2. truncate long bullet lists (key_responsibilities...) in the resume data, every job and project is kept
+3. drop low value resume sections (interests, languages...) from prompts that embed the whole resume (cover letter)
+4. cut the job description down to whatever budget is left
+"""
+
+# Paragraphs of a job description containing any of these are legal/marketing text that does not help tailoring
+BOILERPLATE_PATTERNS = re.compile(
+    r"equal opportunity|equal employment|affirmative action|without regard to|reasonable accommodation|"
+    r"e-verify|privacy (policy|notice)|benefits include|we offer|perks|401\(k\)|pto\b|paid time off|"
+    r"follow us on|apply now|click apply|recruitment fraud|background check",
+    re.IGNORECASE,
+)
+
+
+# model name -> tiktoken encoding, None when it could not be loaded
+_encodings: Dict[str, object] = {}
+
+
+def _encoding_for(model_name: str):
+    if tiktoken is None:
+        return None
+    if model_name not in _encodings:
+        try:
+            try:
+                _encodings[model_name] = tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                _encodings[model_name] = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # tiktoken downloads its encodings on first use, offline (or replayed) runs fall back to the estimate
+            logger.warning(f"tiktoken encoding unavailable ({e}), estimating prompt tokens from their length")
+            _encodings[model_name] = None
+    return _encodings[model_name]
+
+
+class PromptBudgeter:
+
+    def __init__(self, model_name: str = None):
+        self.model_name = model_name or global_config.LLM_MODEL
+        self._encoding = _encoding_for(self.model_name)
+
+    def count_tokens(self, text: str) -> int:
+        if self._encoding is None:
+            return max(1, len(text) // 4)
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    @staticmethod
+    def budget_for(prompt_type: str) -> int:
+        budgets = global_config.LLM_PROMPT_TOKEN_BUDGETS
+        return budgets.get(prompt_type, budgets["default"])
+
+    @staticmethod
+    def strip_boilerplate(text: str) -> str:
+        seen = set()
+        paragraphs = []
+        for paragraph in re.split(r"\n\s*\n", text):
+            key = " ".join(paragraph.split()).lower()
+            if not key or key in seen or BOILERPLATE_PATTERNS.search(key):
+                continue
+            seen.add(key)
+            paragraphs.append("\n".join(line.strip() for line in paragraph.strip().splitlines() if line.strip()))
+        return "\n\n".join(paragraphs)
+
+    @staticmethod
+    def _model_fields(value):
+        # Read from the class, pydantic 2.11 deprecates model_fields on instances
+        return getattr(type(value), "model_fields", None) or getattr(type(value), "__fields__", None)
+
+    @staticmethod
+    def truncate_lists(value, max_items: int, list_names=None):
+        # Caps the bullet lists named in list_names (key_responsibilities...) wherever they are nested at max_items.
+        # Lists of entries (jobs, projects...) are kept whole, only the bullets of each entry are cut.
+        if list_names is None:
+            list_names = global_config.LLM_PROMPT_BULLET_LISTS
+        if isinstance(value, (list, tuple)):
+            return [PromptBudgeter.truncate_lists(item, max_items, list_names) for item in value]
+        fields = PromptBudgeter._model_fields(value)
+        if not fields:
+            return value
+        update = {}
+        for name in fields:
+            field_value = getattr(value, name)
+            if name in list_names and isinstance(field_value, (list, tuple)):
+                update[name] = list(field_value)[:max_items]
+            elif isinstance(field_value, (list, tuple)) or PromptBudgeter._model_fields(field_value):
+                update[name] = PromptBudgeter.truncate_lists(field_value, max_items, list_names)
+        copy = getattr(value, "model_copy", None) or value.copy
+        return copy(update=update)
+
+    @staticmethod
+    def drop_section(value, section_name: str):
+        # Only whole resumes (the cover letter prompt embeds one) lose sections, a prompt dedicated to one section
+        # keeps its data.
+        if getattr(value, section_name, None) is None or not hasattr(value, "personal_information"):
+            return value
+        copy = getattr(value, "model_copy", None) or value.copy
+        return copy(update={section_name: None})
+
+    def _render(self, template: str, inputs: Dict) -> Tuple[object, int]:
+        prompt = ChatPromptTemplate.from_template(template).format_prompt(**inputs)
+        return prompt, self.count_tokens(prompt.to_string())
+
+    def _compression_steps(self):
+        # Each step maps the current inputs to more compact ones, they are tried in order until the prompt fits.
+        yield "strip_boilerplate", lambda inputs: {
+            key: self.strip_boilerplate(value) if key == "job_description" and isinstance(value, str) else value
+            for key, value in inputs.items()
+        }
+        for max_items in global_config.LLM_PROMPT_LIST_LIMITS:
+            yield f"truncate_lists_{max_items}", lambda inputs, max_items=max_items: {
+                key: self.truncate_lists(value, max_items) for key, value in inputs.items()
+            }
+        for section_name in global_config.LLM_PROMPT_DROPPABLE_SECTIONS:
+            yield f"drop_{section_name}", lambda inputs, section_name=section_name: {
+                key: self.drop_section(value, section_name) for key, value in inputs.items()
+            }
+
+    def fit(self, prompt_type: str, template: str, inputs: Dict):
+        """
+        Renders the template with the inputs, compressing the inputs when the prompt is over its token budget.
+        :return: the rendered prompt value and a dict with the token counts before and after compression.
+        """
+        budget = self.budget_for(prompt_type)
+        prompt, original_tokens = self._render(template, inputs)
+        tokens = original_tokens
+        applied_steps = []
+
+        for step_name, step in self._compression_steps():
+            if tokens <= budget:
+                break
+            inputs = step(inputs)
+            prompt, compressed_tokens = self._render(template, inputs)
+            if compressed_tokens != tokens:
+                applied_steps.append(step_name)
+            tokens = compressed_tokens
+
+        job_description = inputs.get("job_description")
+        if tokens > budget and isinstance(job_description, str) and job_description:
+            # Last resort, keep the beginning of the job description (title, responsibilities, requirements)
+            overflow_chars = (tokens - budget) * 4
+            inputs = dict(inputs, job_description=job_description[:max(0, len(job_description) - overflow_chars)])
+            prompt, tokens = self._render(template, inputs)
+            applied_steps.append("truncate_job_description")
+
+        stats = {
+            "prompt_type": prompt_type,
+            "budget": budget,
+            "tokens_before": original_tokens,
+            "tokens_after": tokens,
+            "steps": applied_steps,
+        }
+        if applied_steps:
+            logger.debug(f"Compressed {prompt_type} prompt from {original_tokens} to {tokens} tokens with {applied_steps}")
+        if tokens > budget:
+            logger.warning(f"{prompt_type} prompt is still {tokens} tokens after compression, budget is {budget}")
+        return prompt, stats
@@ -1,4 +1,7 @@
-from src.generate_templates.cover_letter_template import prompt_header_template
+from src.generate_templates.cover_letter_template import prompt_cover_letter_template
+
+# Static instructions and the HTML template come first, then the resume (stable for one candidate) and the job
+# description last, so the provider can serve the shared prefix from its prompt cache across jobs.
 
 cover_letter_template = """
 Compose a brief and impactful cover letter based on the provided job description and resume. The letter should be no longer than three paragraphs and should be written in a professional, yet conversational tone. Avoid using any placeholders, and ensure that the letter flows naturally and is tailored to the job.
@@ -10,13 +13,14 @@ Please write the cover letter in a way that directly addresses the job role and
 ## Rules:
 - Do not include any introductions, explanations, or additional information.
 
+""" + prompt_cover_letter_template + """
 ## Details :
-- **Job Description:**
-```
-{job_description}
-```
 - **My resume:**
 ```
 {resume}
 ```
-"""+ prompt_cover_letter_template
\ No newline at end of file
+- **Job Description:**
+```
+{job_description}
+```
+"""
\ No newline at end of file
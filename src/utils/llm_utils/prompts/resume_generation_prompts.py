@@ -1,4 +1,8 @@
-from src.generate_templates.resume_template import prompt_header_template, prompt_working_experience_template, prompt_projects_template, prompt_additional_skills_template, prompt_certifications_template, prompt_achievements_template
+from src.generate_templates.resume_template import prompt_header_template, prompt_education_template, prompt_working_experience_template, prompt_projects_template, prompt_additional_skills_template, prompt_certifications_template, prompt_achievements_template
+
+# Every prompt is laid out static part first: instructions, then the HTML template, then the candidate's data and the
+# job description last. Providers cache identical prompt prefixes, so across many jobs for one candidate everything but
+# the job description is served from the prompt cache.
 
 prompt_header = """
 Act as an HR expert and resume writer specializing in ATS-friendly resumes. Your task is to create a professional and polished header for the resume. The header should:
@@ -8,10 +12,25 @@ Act as an HR expert and resume writer specializing in ATS-friendly resumes. Your
 
 To implement this:
 - If any of the contact information fields (e.g., LinkedIn profile, GitHub profile) are not provided (i.e., `None`), omit them from the header.
-
+""" + prompt_header_template + """
 - **My information:**  
   {personal_information}
-""" + prompt_header_template
+"""
+
+prompt_education = """
+Act as an HR expert and resume writer specializing in ATS-friendly resumes. Your task is to articulate the educational background for a resume. For each educational entry, ensure you include:
+
+1. **Institution Name and Location**: Specify the university or educational institution's name and location.
+2. **Degree and Field of Study**: Clearly indicate the degree earned and the field of study.
+3. **Grade**: Include your final grade, if available.
+4. **Relevant Coursework**: List key courses with their grades to showcase your academic strengths.
+
+To implement this:
+- If any of the education details (e.g., grade, exams) are not provided (i.e., `None`), omit those sections when filling out the template.
+""" + prompt_education_template + """
+- **My information:**  
+  {education_details}
+"""
 
 prompt_working_experience = """
 Act as an HR expert and resume writer with a specialization in creating ATS-friendly resumes. Your task is to detail the work experience for a resume, ensuring it aligns with the provided job description. For each job entry, ensure you include:
@@ -25,14 +44,13 @@ Ensure that the descriptions highlight relevant experience and align with the jo
 
 To implement this:
 - If any of the work experience details (e.g., responsibilities, achievements) are not provided (i.e., `None`), omit those sections when filling out the template.
-
-
+""" + prompt_working_experience_template + """
 - **My information:**  
   {experience_details}
 
 - **Job Description:**  
   {job_description}
-"""+ prompt_working_experience_template
+"""
 
 
 prompt_projects = """
@@ -46,14 +64,13 @@ Ensure that the project descriptions demonstrate your skills and achievements re
 
 To implement this:
 - If any of the project details (e.g., link, achievements) are not provided (i.e., `None`), omit those sections when filling out the template.
-
-
+""" + prompt_projects_template + """
 - **My information:**  
   {projects}
 
 - **Job Description:**  
   {job_description}
-"""+ prompt_projects_template
+"""
 
 
 prompt_achievements = """
@@ -66,14 +83,13 @@ Ensure that the achievements are clearly presented and effectively highlight you
 
 To implement this:
 - If any of the achievement details (e.g., certifications, descriptions) are not provided (i.e., `None`), omit those sections when filling out the template.
-
-
+""" + prompt_achievements_template + """
 - **My information:**  
   {achievements}
 
 - **Job Description:**  
   {job_description}
-"""+ prompt_achievements_template
+"""
 
 
 prompt_certifications = """
@@ -87,13 +103,13 @@ Ensure that the certifications are clearly presented and effectively highlight y
 To implement this:
 
 If any of the certification details (e.g., descriptions) are not provided (i.e., None), omit those sections when filling out the template.
-
+""" + prompt_certifications_template + """
 - **My information:**  
   {certifications}
 
 - **Job Description:**  
   {job_description}
-"""+ prompt_certifications_template
+"""
 
 
 prompt_additional_skills = """
@@ -108,8 +124,7 @@ Ensure that the skills listed are relevant and accurately reflect your expertise
 
 To implement this:
 - If any of the skill details (e.g., languages, interests, skills) are not provided (i.e., `None`), omit those sections when filling out the template.
-
-
+""" + prompt_additional_skills_template + """
 - **My information:**  
   {languages}
   {interests}
@@ -117,7 +132,7 @@ To implement this:
 
 - **Job Description:**  
   {job_description}
-"""+ prompt_additional_skills_template
+"""
 
 summarize_prompt_template = """
 As a seasoned HR expert, your task is to identify and outline the key skills and requirements necessary for the position of this job. Use the provided job description as input to extract all relevant information. This will involve conducting a thorough analysis of the job's responsibilities and the industry standards. You should consider both the technical and soft skills needed to excel in this role. Additionally, specify any educational qualifications, certifications, or experiences that are essential. Your analysis should also reflect on the evolving nature of this role, considering future trends and how they might affect the required competencies.
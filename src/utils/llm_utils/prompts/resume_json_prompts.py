@@ -0,0 +1,30 @@
+from src.generate_templates.resume_json_renderer import json_output_instructions
+from src.generate_templates.resume_template import prompt_header_template, prompt_education_template, prompt_working_experience_template, prompt_projects_template, prompt_additional_skills_template, prompt_certifications_template, prompt_achievements_template
+from src.utils.llm_utils.prompts import resume_generation_prompts
+
+# Same prompts as resume_generation_prompts, with the HTML template swapped for the JSON shape of the section. The
+# instructions and the candidate data stay identical, the HTML is filled in locally by resume_json_renderer.
+
+prompt_header = resume_generation_prompts.prompt_header.replace(
+    prompt_header_template, json_output_instructions("header"))
+
+prompt_education = resume_generation_prompts.prompt_education.replace(
+    prompt_education_template, json_output_instructions("education"))
+
+prompt_working_experience = resume_generation_prompts.prompt_working_experience.replace(
+    prompt_working_experience_template, json_output_instructions("experience"))
+
+prompt_projects = resume_generation_prompts.prompt_projects.replace(
+    prompt_projects_template, json_output_instructions("projects"))
+
+prompt_achievements = resume_generation_prompts.prompt_achievements.replace(
+    prompt_achievements_template, json_output_instructions("achievements"))
+
+prompt_certifications = resume_generation_prompts.prompt_certifications.replace(
+    prompt_certifications_template, json_output_instructions("certifications"))
+
+prompt_additional_skills = resume_generation_prompts.prompt_additional_skills.replace(
+    prompt_additional_skills_template, json_output_instructions("additional_skills"))
+
+# The job description summary is plain text in both formats
+summarize_prompt_template = resume_generation_prompts.summarize_prompt_template
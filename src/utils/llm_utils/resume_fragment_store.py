@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from local_config import global_config
+from src.logging import logger
+
+"""
+This module keeps the HTML fragment of every generated resume section on disk, addressed by what produced it: the
+section, the hash of its inputs (the Resume section and job description it was written from), the hash of the prompt
+template and the model. When a candidate edits one bullet only the sections whose inputs changed miss the store, every
+other section is reused without an LLM call.
+"""
+
+
+def _to_jsonable(value):
+    # Resume sections are pydantic models, skills are collected in a set
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    return str(value)
+
+
+def content_hash(value) -> str:
+    serialized = json.dumps(value, default=_to_jsonable, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class ResumeFragmentStore:
+
+    def __init__(self, directory: Path = None):
+        self.directory = Path(directory or global_config.RESUME_FRAGMENT_STORE_DIRECTORY)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(section_name: str, inputs: Dict, template: str, model_name: str, output_format: str) -> Dict[str, str]:
+        input_hash = content_hash(inputs)
+        prompt_hash = content_hash(template)
+        fragment_hash = content_hash([section_name, input_hash, prompt_hash, model_name, output_format])
+        return {
+            "key": f"{section_name}-{fragment_hash[:32]}",
+            "section": section_name,
+            "input_hash": input_hash,
+            "prompt_hash": prompt_hash,
+            "model": model_name,
+        }
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: Dict[str, str]) -> Optional[str]:
+        path = self._path(key["key"])
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                fragment = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Touch the file so stale fragments can be pruned by age
+        os.utime(path)
+        return fragment["html"]
+
+    def put(self, key: Dict[str, str], html: str):
+        path = self._path(key["key"])
+        temporary_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(temporary_path, "w", encoding="utf-8") as f:
+                json.dump({**key, "html": html, "created_at": time.time()}, f, ensure_ascii=False)
+            # Atomic, concurrent runs never read a half written fragment
+            os.replace(temporary_path, path)
+        except OSError as e:
+            logger.error(f"Failed to store resume fragment {key['key']}: {e}")
+
+    def prune(self, max_age_seconds: float = None):
+        # Removes fragments that have not been used for max_age_seconds
+        max_age_seconds = max_age_seconds or global_config.RESUME_FRAGMENT_STORE_MAX_AGE_SECONDS
+        cutoff = time.time() - max_age_seconds
+        for path in self.directory.glob("*.json"):
+            if path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
@@ -3,63 +3,123 @@ This module is responsible for generating resumes and cover letters using the LL
 """
 # app/libs/resume_and_cover_builder/resume_generator.py
 from string import Template
-from typing import Any
-from src.libs.resume_and_cover_builder.llm.llm_generate_resume import LLMResumer
-from src.libs.resume_and_cover_builder.llm.llm_generate_resume_from_job import LLMResumeJobDescription
-from src.libs.resume_and_cover_builder.llm.llm_generate_cover_letter_from_job import LLMCoverLetterJobDescription
-from .module_loader import load_module
-from .config import global_config
+from typing import Any, Dict
+from src.utils.llm_utils.llm_batch_clients import BatchClient
+from src.utils.llm_utils.llm_cost_tracker import LLMCostTracker
+from src.utils.llm_utils.llm_cover_letter import LLMCoverLetterJobDescription
+from src.utils.llm_utils.llm_manager import LlmManager
+from src.utils.llm_utils.llm_resumer import LLMResumer
+from src.utils.llm_utils.resume_fragment_store import content_hash
+from src.utils.tracing import Tracer
+from local_config import global_config
 
 class ResumeGenerator:
     def __init__(self):
-        pass
+        # resume content hash -> HTML of the sections that do not depend on the job description
+        self.job_independent_sections: Dict[str, Dict[str, str]] = {}
     
     def set_resume_object(self, resume_object):
          self.resume_object = resume_object
          
 
-    def _create_resume(self, gpt_answerer: Any, style_path):
-        # Imposta il resume nell'oggetto gpt_answerer
-        gpt_answerer.set_resume(self.resume_object)
-        
+    def _apply_template(self, body_html: str, style_path) -> str:
         # Leggi il template HTML
         template = Template(global_config.html_template)
         
         try:
-            with open(style_path, "r") as f:
+            with Tracer.span("style.load", step="read"), open(style_path, "r") as f:
                 style_css = f.read()  # Correzione: chiama il metodo `read` con le parentesi
         except FileNotFoundError:
             raise ValueError(f"Il file di stile non è stato trovato nel percorso: {style_path}")
         except Exception as e:
             raise RuntimeError(f"Errore durante la lettura del file CSS: {e}")
-        
-        # Genera l'HTML del resume
-        body_html = gpt_answerer.generate_html_resume()
-        
+
         # Applica i contenuti al template
         return template.substitute(body=body_html, style_css=style_css)
 
+    def _create_resume(self, gpt_answerer: Any, style_path, pregenerated: Dict[str, str] = None):
+        # Imposta il resume nell'oggetto gpt_answerer
+        gpt_answerer.set_resume(self.resume_object)
+
+        # Genera l'HTML del resume
+        body_html = gpt_answerer.generate_html_resume(pregenerated)
+        return self._apply_template(body_html, style_path)
+
+    def pregenerate_job_independent_sections(self, llm_manager: LlmManager = None) -> Dict[str, str]:
+        '''
+        Generates the header and education once per version of the resume object, every tailored resume of that
+        version splices them in and only asks the LLM for the job dependent sections.
+        '''
+        resume_version = content_hash(self.resume_object)
+        if resume_version not in self.job_independent_sections:
+            gpt_answerer = LLMResumer(global_config.API_KEY, llm_manager=llm_manager)
+            gpt_answerer.set_resume(self.resume_object)
+            with LLMCostTracker.context(job_id="job_independent_sections"):
+                self.job_independent_sections[resume_version] = gpt_answerer.pregenerate_job_independent_sections()
+        return self.job_independent_sections[resume_version]
+
     def create_resume(self, style_path):
-        strings = load_module(global_config.STRINGS_MODULE_RESUME_PATH, global_config.STRINGS_MODULE_NAME)
-        gpt_answerer = LLMResumer(global_config.API_KEY, strings)
-        return self._create_resume(gpt_answerer, style_path)
+        # Section prompts are sent to the model concurrently, see LLMResumer.agenerate_html_resume
+        gpt_answerer = LLMResumer(global_config.API_KEY)
+        with LLMCostTracker.context(job_id="base_resume"):
+            return self._create_resume(gpt_answerer, style_path)
 
-    def create_resume_job_description_text(self, style_path: str, job_description_text: str):
-        strings = load_module(global_config.STRINGS_MODULE_RESUME_JOB_DESCRIPTION_PATH, global_config.STRINGS_MODULE_NAME)
-        gpt_answerer = LLMResumeJobDescription(global_config.API_KEY, strings)
+    def create_resume_job_description_text(self, style_path: str, job_description_text: str, job_id: str = "tailored_resume"):
+        pregenerated = self.pregenerate_job_independent_sections()
+        gpt_answerer = LLMResumer(global_config.API_KEY)
         gpt_answerer.set_job_description_from_text(job_description_text)
-        return self._create_resume(gpt_answerer, style_path)
+        # Every LLM call for this document is billed to job_id, see LLMCostTracker.summary()
+        with LLMCostTracker.context(job_id=job_id):
+            return self._create_resume(gpt_answerer, style_path, pregenerated)
+
+    def create_resumes_job_description_batch(self, style_path: str, job_descriptions: Dict[str, str],
+                                             batch_client: BatchClient = None) -> Dict[str, str]:
+        '''
+        Tailors the resume for many jobs at once through LlmManager's batch mode. The job independent sections are
+        generated once, every job dependent section prompt of every job is submitted in a single batch file, and once
+        the batch completes each job's sections are assembled into HTML.
+        :param job_descriptions: job id -> job description text
+        :return: job id -> full resume html
+        '''
+        llm_manager = LlmManager(global_config.API_KEY)
+        pregenerated = self.pregenerate_job_independent_sections(llm_manager)
+        resumers = {}
+        prompts = {}
+        for job_id, job_description_text in job_descriptions.items():
+            gpt_answerer = LLMResumer(global_config.API_KEY, llm_manager=llm_manager)
+            gpt_answerer.set_resume(self.resume_object)
+            # Summaries would be one synchronous call per job, the batch sends the raw description instead
+            gpt_answerer.set_job_description_from_text(job_description_text, summarize=False)
+            prompts[job_id] = gpt_answerer.section_prompts(gpt_answerer.job_dependent_sections())
+            for section_name, prompt in prompts[job_id].items():
+                llm_manager.add_batch_request(f"{job_id}::{section_name}", prompt, job_id=job_id, prompt_type=section_name)
+            resumers[job_id] = gpt_answerer
+
+        batch_id = llm_manager.submit_batch(batch_client)
+        replies = llm_manager.collect_batch(batch_id, batch_client)
+
+        resumes_html = {}
+        for job_id, gpt_answerer in resumers.items():
+            section_outputs = {
+                custom_id.split("::", 1)[1]: reply.content
+                for custom_id, reply in replies.items() if custom_id.split("::", 1)[0] == job_id
+            }
+            # Failed requests and unusable JSON answers are asked again directly instead of leaving the section out
+            with LLMCostTracker.context(job_id=job_id):
+                section_outputs = gpt_answerer.repair_sections(section_outputs, prompts[job_id])
+            resumes_html[job_id] = self._apply_template(
+                gpt_answerer.assemble_html_resume(section_outputs, pregenerated), style_path
+            )
+        return resumes_html
 
     def create_cover_letter_job_description(self, style_path: str, job_description_text: str):
-        strings = load_module(global_config.STRINGS_MODULE_COVER_LETTER_JOB_DESCRIPTION_PATH, global_config.STRINGS_MODULE_NAME)
-        gpt_answerer = LLMCoverLetterJobDescription(global_config.API_KEY, strings)
+        # The cover letter prompt is fitted to its token budget, see LLMCoverLetterJobDescription.cover_letter_prompt
+        gpt_answerer = LLMCoverLetterJobDescription(global_config.API_KEY)
         gpt_answerer.set_resume(self.resume_object)
         gpt_answerer.set_job_description_from_text(job_description_text)
-        cover_letter_html = gpt_answerer.generate_cover_letter()
-        template = Template(global_config.html_template)
-        with open(style_path, "r") as f:
-            style_css = f.read()
-        return template.substitute(body=cover_letter_html, style_css=style_css)
+        with LLMCostTracker.context(job_id="cover_letter"):
+            cover_letter_html = gpt_answerer.generate_cover_letter()
+        return self._apply_template(cover_letter_html, style_path)
     
     
     
\ No newline at end of file
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+from local_config import global_config
+from src.logging import logger
+
+"""
+This module keeps the PDFs already printed on disk, addressed by the hash of what produced them: the render backend,
+the final HTML (styles included), the print options and the version of the font bundle. Printing the same document
+again (a batch re-run after a crash, a base resume regenerated unchanged) copies the stored PDF instead of leasing a
+browser. The cache holds at most PDF_RENDER_CACHE_MAX_BYTES; past that the least recently used PDFs are evicted, a hit
+refreshes the modification time of its file.
+"""
+
+
+class PDFRenderCache:
+    _shared: "PDFRenderCache" = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, directory: Path = None, max_bytes: int = None):
+        self.directory = Path(directory or global_config.PDF_RENDER_CACHE_DIRECTORY)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes or global_config.PDF_RENDER_CACHE_MAX_BYTES
+        self._lock = threading.Lock()
+        self._size = sum(path.stat().st_size for path in self.directory.glob("*.pdf"))
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def shared(cls) -> Optional["PDFRenderCache"]:
+        """The cache of the process, None when PDF_RENDER_CACHE_ENABLED is off."""
+        if not global_config.PDF_RENDER_CACHE_ENABLED:
+            return None
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = PDFRenderCache()
+            return cls._shared
+
+    @staticmethod
+    def make_key(backend: str, html_content: str, options: Dict, assets_version: str = "") -> str:
+        # The transfer mode changes how Chrome hands the PDF over, not the PDF
+        options = {name: value for name, value in options.items() if name != "transferMode"}
+        serialized = json.dumps([backend, html_content, options, assets_version], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.pdf"
+
+    def _hit(self, path: Path) -> bool:
+        try:
+            # Marks the PDF as recently used for the eviction
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        if not self._hit(path):
+            return None
+        try:
+            return path.read_bytes()
+        except OSError:
+            return None
+
+    def copy_to(self, key: str, output_path: Path) -> bool:
+        """Copies the stored PDF to output_path, returns False on a miss."""
+        path = self._path(key)
+        if not self._hit(path):
+            return False
+        try:
+            shutil.copyfile(path, output_path)
+            return True
+        except OSError:
+            return False
+
+    def _store(self, key: str, write):
+        path = self._path(key)
+        temporary_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            write(temporary_path)
+            size = temporary_path.stat().st_size
+            # Atomic, concurrent renders never read a half written PDF
+            os.replace(temporary_path, path)
+        except OSError as e:
+            logger.error(f"Failed to store the PDF {key} in the render cache: {e}")
+            temporary_path.unlink(missing_ok=True)
+            return
+        with self._lock:
+            self._size += size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def put(self, key: str, pdf_data: bytes):
+        self._store(key, lambda path: path.write_bytes(pdf_data))
+
+    def put_file(self, key: str, pdf_path: Path):
+        self._store(key, lambda path: shutil.copyfile(pdf_path, path))
+
+    def _evict(self):
+        # Least recently used first, down to 90% of the quota so evictions do not run on every store
+        files = []
+        for path in self.directory.glob("*.pdf"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        self._size = sum(size for _, size, _ in files)
+        evicted = 0
+        for _, size, path in sorted(files, key=lambda file: file[0]):
+            if self._size <= self.max_bytes * 0.9:
+                break
+            path.unlink(missing_ok=True)
+            self._size -= size
+            evicted += 1
+        logger.debug(f"Evicted {evicted} PDFs from the render cache, {self._size / (1024 * 1024):.1f} MB left")
@@ -0,0 +1,139 @@
+import base64
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Optional, Sequence, Union
+from local_config import global_config
+from src.utils.chrome_render_pool import ChromeRenderPool
+from src.utils.chrome_utils import PDF_PRINT_OPTIONS
+from src.utils.pdf_render_cache import PDFRenderCache
+from src.utils.render_assets import RenderAssets
+from src.utils.tracing import Tracer
+
+"""
+This module is the entry point of PDF generation: get_pdf_renderer() returns the backend selected by
+global_config.PDF_RENDER_BACKEND behind one interface, so the resume and cover letter flows do not depend on how the
+HTML is printed.
+- "chrome": headless Chrome from the shared render pool, exact CSS support
+- "reportlab": pure Python (src/utils/reportlab_renderer.py), no browser to launch or keep in memory, supports the
+  subset of HTML and CSS the resume styles use
+Every backend sits behind the PDF render cache, a document printed before is served from disk without rendering it.
+"""
+
+
+class PDFRenderer(ABC):
+    name: str = None
+
+    @abstractmethod
+    def _render(self, html_content: str) -> bytes:
+        pass
+
+    def _render_to_file(self, html_content: str, output_path: Path) -> int:
+        pdf_data = self._render(html_content)
+        with Tracer.span("file.write"), open(output_path, "wb") as file:
+            file.write(pdf_data)
+        return len(pdf_data)
+
+    def _render_many(self, html_docs: List[str], output_paths: Optional[List[Path]]) -> List[Union[bytes, Path]]:
+        if output_paths is None:
+            return [self._render(html_content) for html_content in html_docs]
+        for html_content, output_path in zip(html_docs, output_paths):
+            self._render_to_file(html_content, output_path)
+        return output_paths
+
+    def _cache_key(self, html_content: str) -> str:
+        return PDFRenderCache.make_key(self.name, html_content, PDF_PRINT_OPTIONS, RenderAssets.version())
+
+    def render(self, html_content: str) -> bytes:
+        cache = PDFRenderCache.shared()
+        if cache is None:
+            return self._render(html_content)
+        key = self._cache_key(html_content)
+        pdf_data = cache.get(key)
+        if pdf_data is None:
+            pdf_data = self._render(html_content)
+            cache.put(key, pdf_data)
+        return pdf_data
+
+    def render_to_file(self, html_content: str, output_path: Path) -> int:
+        """Writes the PDF of the HTML to output_path, returns its size in bytes."""
+        cache = PDFRenderCache.shared()
+        if cache is None:
+            return self._render_to_file(html_content, output_path)
+        key = self._cache_key(html_content)
+        if cache.copy_to(key, output_path):
+            return Path(output_path).stat().st_size
+        size = self._render_to_file(html_content, output_path)
+        cache.put_file(key, output_path)
+        return size
+
+    def render_many(self, html_docs: Sequence[str], output_paths: Sequence[Path] = None) -> List[Union[bytes, Path]]:
+        """
+        Renders the documents, only those missing from the cache reach the backend.
+        :return: the PDFs in order, or the output paths once the PDFs were written to them when output_paths is given.
+        """
+        html_docs = list(html_docs)
+        output_paths = list(output_paths) if output_paths is not None else None
+        cache = PDFRenderCache.shared()
+        if cache is None:
+            return self._render_many(html_docs, output_paths)
+
+        keys = [self._cache_key(html_content) for html_content in html_docs]
+        results: List[Union[bytes, Path, None]] = []
+        for index, key in enumerate(keys):
+            if output_paths is None:
+                results.append(cache.get(key))
+            else:
+                results.append(output_paths[index] if cache.copy_to(key, output_paths[index]) else None)
+        missing = [index for index, result in enumerate(results) if result is None]
+        if missing:
+            rendered = self._render_many([html_docs[index] for index in missing],
+                                         [output_paths[index] for index in missing] if output_paths is not None else None)
+            for index, result in zip(missing, rendered):
+                results[index] = result
+                if output_paths is None:
+                    cache.put(keys[index], result)
+                else:
+                    cache.put_file(keys[index], output_paths[index])
+        return results
+
+
+class ChromePDFRenderer(PDFRenderer):
+    name = "chrome"
+
+    def _render(self, html_content: str) -> bytes:
+        return base64.b64decode(ChromeRenderPool.shared().render(html_content))
+
+    def _render_to_file(self, html_content: str, output_path: Path) -> int:
+        return ChromeRenderPool.shared().render_to_file(html_content, output_path)
+
+    def _render_many(self, html_docs: List[str], output_paths: Optional[List[Path]]) -> List[Union[bytes, Path]]:
+        # Printed in parallel on tabs of one browser
+        results = ChromeRenderPool.shared().render_many(html_docs, output_paths)
+        return results if output_paths is not None else [base64.b64decode(result) for result in results]
+
+
+class ReportLabPDFRenderer(PDFRenderer):
+    name = "reportlab"
+
+    def __init__(self):
+        from src.utils.reportlab_renderer import ReportLabRenderer
+        self._renderer = ReportLabRenderer()
+
+    def _render(self, html_content: str) -> bytes:
+        if not isinstance(html_content, str) or not html_content.strip():
+            raise ValueError("The HTML content must be a non empty string.")
+        with Tracer.span("pdf.render", backend="reportlab"):
+            return self._renderer.render(html_content)
+
+
+PDF_RENDERERS = {
+    "chrome": ChromePDFRenderer,
+    "reportlab": ReportLabPDFRenderer,
+}
+
+
+def get_pdf_renderer(backend: str = None) -> PDFRenderer:
+    backend = backend or global_config.PDF_RENDER_BACKEND
+    if backend not in PDF_RENDERERS:
+        raise ValueError(f"Unknown PDF render backend {backend}, expected one of {list(PDF_RENDERERS)}")
+    return PDF_RENDERERS[backend]()
@@ -0,0 +1,303 @@
+import argparse
+import base64
+import hashlib
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import urllib.request
+import zipfile
+from urllib.parse import parse_qs, urlsplit
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from local_config import global_config
+from src.logging import logger
+
+"""
+This module provides the fonts and icons of the HTML documents from a local bundle, so renders need no network and come
+out the same on every machine. html_template links the bundle stylesheet (assets/render_bundle/bundle.css); before a
+page is printed the link is replaced with the stylesheet itself, its font files inlined as data: URIs, keeping only the
+text font families the document names. The inlined stylesheet is built once per process. With RENDER_ASSETS_OFFLINE,
+stylesheets still pulled from Google Fonts or cdnjs (e.g. by the @import of a style) are dropped when the bundle has
+everything they provide: Font Awesome, or Google Fonts families that are all bundled. The others are kept, a family
+missing from the bundle is still loaded from the network.
+
+The bundle is built with `python -m src.utils.render_assets build` (needs fonttools and brotli): the text fonts are cut
+down to Google Fonts' latin subset and Font Awesome to the icons of the templates. The font files are taken from Google
+Fonts and cdnjs, or with `--source pypi` from the packages shipping the same files on PyPI (fontpkg-<family>, Google
+Fonts' TTFs, and fontawesomefree), for machines that can reach PyPI only.
+"""
+
+BUNDLE_DIRECTORY = Path(__file__).resolve().parents[2] / "assets" / "render_bundle"
+BUNDLE_LINK = re.compile(r'<link[^>]+href="[^"]*render_bundle/bundle\.css"[^>]*>')
+REMOTE_ASSETS = re.compile(
+    r'<link[^>]+href="(https://(?:fonts\.googleapis\.com|cdnjs\.cloudflare\.com)/[^"]*)"[^>]*>'
+    r'|@import\s+url\(\s*["\']?(https://fonts\.googleapis\.com/[^)"\']*)["\']?\s*\)\s*;?'
+)
+BUNDLED_FAMILY = re.compile(r'@font-face\{font-family:"([^"]+)"')
+FONT_URL = re.compile(r'url\((["\']?)(fonts/[^)"\']+)\1\)')
+
+# Families of html_template and the resume styles -> (weight, style) of each file bundled
+GOOGLE_FONT_FAMILIES: Dict[str, Tuple[Tuple[int, str], ...]] = {
+    "Barlow": ((400, "normal"), (600, "normal"), (400, "italic")),
+    "Roboto": ((400, "normal"), (500, "normal"), (700, "normal"), (400, "italic")),
+    "Poppins": ((300, "normal"), (400, "normal"), (600, "normal"), (700, "normal"), (400, "italic")),
+    "Open Sans": ((400, "normal"), (600, "normal"), (400, "italic")),
+    "Josefin Sans": ((400, "normal"), (600, "normal"), (700, "normal")),
+}
+
+# Font Awesome icons used by the templates, by webfont
+# 5.15.4 rather than the 5.15.3 the templates linked: the 5.15.3 wheel of fontawesomefree ships Font Awesome 6 beta
+FONT_AWESOME_VERSION = "5.15.4"
+FONT_AWESOME_ICONS = {
+    "fa-solid-900": ("map-marker-alt", "phone", "phone-alt", "envelope", "globe", "link"),
+    "fa-brands-400": ("linkedin", "linkedin-in", "github", "twitter", "stack-overflow"),
+}
+
+# Weight names of the static font files of the Google Fonts repository
+WEIGHT_NAMES = {100: "Thin", 200: "ExtraLight", 300: "Light", 400: "Regular", 500: "Medium", 600: "SemiBold", 700: "Bold",
+                800: "ExtraBold", 900: "Black"}
+
+# Google Fonts' latin subset
+LATIN_UNICODES = "U+0000-00FF,U+0131,U+0152-0153,U+02BB-02BC,U+02C6,U+02DA,U+02DC,U+2000-206F,U+2074,U+20AC,U+2122,U+2191,U+2193,U+2212,U+2215,U+FEFF,U+FFFD"
+
+
+class RenderAssets:
+    _css: Optional[str] = None
+    # Inlined rules of the stylesheet, with the text font family of each @font-face (None for every other rule)
+    _rules: Optional[List[Tuple[Optional[str], str]]] = None
+    _families: Optional[Set[str]] = None
+    _version: Optional[str] = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _inline_font(match) -> str:
+        font_path = BUNDLE_DIRECTORY / match.group(2)
+        data = base64.b64encode(font_path.read_bytes()).decode("ascii")
+        return f'url("data:font/{font_path.suffix.lstrip(".")};base64,{data}")'
+
+    @classmethod
+    def css(cls) -> str:
+        """The bundle stylesheet with its fonts inlined, read from disk on first use only."""
+        with cls._lock:
+            if cls._css is None:
+                try:
+                    stylesheet = (BUNDLE_DIRECTORY / "bundle.css").read_text(encoding="utf-8")
+                    cls._css = FONT_URL.sub(cls._inline_font, stylesheet)
+                except OSError as e:
+                    logger.error(f"Render asset bundle unavailable, documents are printed without its fonts: {e}")
+                    cls._css = ""
+                cls._rules = []
+                for rule in cls._css.splitlines():
+                    match = BUNDLED_FAMILY.match(rule)
+                    family = match.group(1) if match and match.group(1) in GOOGLE_FONT_FAMILIES else None
+                    cls._rules.append((family, rule))
+            return cls._css
+
+    @classmethod
+    def document_css(cls, html_content: str) -> str:
+        # Only the text font families the document names are inlined, the others would only weigh on its parsing
+        cls.css()
+        html_content = html_content.lower()
+        return "\n".join(rule for family, rule in cls._rules if family is None or family.lower() in html_content)
+
+    @classmethod
+    def version(cls) -> str:
+        # Hash of the inlined bundle, PDFs printed with another version of the fonts are not reused from the cache
+        if cls._version is None:
+            cls._version = hashlib.sha256(cls.css().encode("utf-8")).hexdigest()[:16]
+        return cls._version
+
+    @classmethod
+    def bundled_families(cls) -> Set[str]:
+        # Font families with an @font-face in the bundle, Font Awesome included
+        if cls._families is None:
+            cls._families = set(BUNDLED_FAMILY.findall(cls.css()))
+        return cls._families
+
+    @classmethod
+    def _drop_bundled(cls, match) -> str:
+        url = match.group(1) or match.group(2)
+        if urlsplit(url).netloc == "cdnjs.cloudflare.com":
+            bundled = "font-awesome" in url
+        else:
+            # css2 takes one family= per family ("Open Sans:ital,wght@..."), the older css API "Roboto:400|Barlow"
+            families = {family.split(":")[0].strip()
+                        for value in parse_qs(urlsplit(url).query).get("family", []) for family in value.split("|")}
+            bundled = bool(families) and families <= cls.bundled_families()
+        if bundled:
+            return ""
+        logger.debug(f"Keeping {url} offline, the render asset bundle does not provide it")
+        return match.group(0)
+
+    @classmethod
+    def localize(cls, html_content: str) -> str:
+        if global_config.RENDER_ASSETS_OFFLINE:
+            html_content = REMOTE_ASSETS.sub(cls._drop_bundled, html_content)
+        # After the remote stylesheets are dropped, a family named only in their URLs is not inlined
+        return BUNDLE_LINK.sub(lambda _: f"<style>{cls.document_css(html_content)}</style>", html_content, count=1)
+
+
+def _font_file_name(family: str, weight: int, style: str) -> str:
+    return f"{family.replace(' ', '')}-{weight}-{style}.woff2"
+
+
+def subset_font(font_data: bytes, output_path: Path, unicodes: Iterable[int]):
+    from io import BytesIO
+    from fontTools import subset
+    options = subset.Options()
+    options.flavor = "woff2"
+    options.layout_features = ["*"]
+    font = subset.load_font(BytesIO(font_data), options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=unicodes)
+    subsetter.subset(font)
+    subset.save_font(font, str(output_path), options)
+
+
+def parse_unicode_ranges(ranges: str) -> set:
+    unicodes = set()
+    for unicode_range in ranges.replace("U+", "").split(","):
+        start, _, end = unicode_range.strip().partition("-")
+        unicodes.update(range(int(start, 16), int(end or start, 16) + 1))
+    return unicodes
+
+
+def font_awesome_css(all_css: str, icons: Dict[str, Tuple[str, ...]]) -> Tuple[str, Dict[str, set]]:
+    """
+    Cuts the Font Awesome stylesheet down to its base rules and the given icons.
+    :return: the stylesheet, and the code points of the icons by webfont.
+    """
+    rules = [
+        re.search(r"\.fa,\.fab,\.fad,\.fal,\.far,\.fas\{[^}]*\}", all_css).group(0),
+        '.fab{font-family:"Font Awesome 5 Brands"}',
+        '.fas{font-family:"Font Awesome 5 Free";font-weight:900}',
+        '@font-face{font-family:"Font Awesome 5 Brands";font-style:normal;font-weight:400;font-display:block;'
+        'src:url(fonts/fa-brands-400.woff2) format("woff2")}',
+        '@font-face{font-family:"Font Awesome 5 Free";font-style:normal;font-weight:900;font-display:block;'
+        'src:url(fonts/fa-solid-900.woff2) format("woff2")}',
+    ]
+    code_points = {}
+    for webfont, names in icons.items():
+        code_points[webfont] = set()
+        for name in names:
+            content = re.search(rf'\.fa-{re.escape(name)}:before\{{content:"\\([0-9a-f]+)"\}}', all_css).group(1)
+            code_points[webfont].add(int(content, 16))
+            rules.append(f'.fa-{name}:before{{content:"\\{content}"}}')
+    return "\n".join(rules), code_points
+
+
+def write_bundle_css(directory: Path, font_awesome_stylesheet: str):
+    # One @font-face per bundled text font file, named Family-weight-style.woff2
+    rules = []
+    for family, variants in GOOGLE_FONT_FAMILIES.items():
+        for weight, style in variants:
+            file_name = _font_file_name(family, weight, style)
+            if (directory / "fonts" / file_name).exists():
+                rules.append(f'@font-face{{font-family:"{family}";font-style:{style};font-weight:{weight};'
+                             f'font-display:block;src:url(fonts/{file_name}) format("woff2")}}')
+    rules.append(font_awesome_stylesheet)
+    (directory / "bundle.css").write_text("\n".join(rules) + "\n", encoding="utf-8")
+
+
+def _download(url: str) -> bytes:
+    # Google Fonts serves woff2 to browsers that announce they support it
+    request = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0 Chrome/120.0 Safari/537.36"})
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return response.read()
+
+
+def instantiate_font(font_data: bytes, weight: int) -> bytes:
+    # A variable font pinned to the weight, its other axes (e.g. width) at their default
+    from io import BytesIO
+    from fontTools.ttLib import TTFont
+    from fontTools.varLib import instancer
+    font = TTFont(BytesIO(font_data))
+    location = {axis.axisTag: axis.defaultValue for axis in font["fvar"].axes}
+    location["wght"] = weight
+    output = BytesIO()
+    instancer.instantiateVariableFont(font, location).save(output)
+    return output.getvalue()
+
+
+class GoogleFontsSource:
+
+    def text_font(self, family: str, weight: int, style: str) -> bytes:
+        query = f"{family.replace(' ', '+')}:ital,wght@{int(style == 'italic')},{weight}"
+        css = _download(f"https://fonts.googleapis.com/css2?family={query}").decode("utf-8")
+        font_url = re.search(r"/\* latin \*/\s*@font-face\s*\{[^}]*?url\((https://[^)]+)\)", css).group(1)
+        return _download(font_url)
+
+    def font_awesome_css(self) -> str:
+        return _download(f"https://cdnjs.cloudflare.com/ajax/libs/font-awesome/{FONT_AWESOME_VERSION}/css/all.min.css"
+                         ).decode("utf-8")
+
+    def font_awesome_webfont(self, webfont: str) -> bytes:
+        return _download(f"https://cdnjs.cloudflare.com/ajax/libs/font-awesome/{FONT_AWESOME_VERSION}/webfonts/{webfont}.woff2")
+
+
+class PyPISource:
+    # The font files read out of the wheels of fontpkg-<family> (Google Fonts' TTFs) and fontawesomefree
+
+    def __init__(self, download_directory: Path):
+        self.download_directory = download_directory
+        self._wheels: Dict[str, zipfile.ZipFile] = {}
+
+    def _wheel(self, requirement: str) -> zipfile.ZipFile:
+        if requirement not in self._wheels:
+            subprocess.run([sys.executable, "-m", "pip", "download", "--no-deps", "--only-binary", ":all:",
+                            "--dest", str(self.download_directory), requirement], check=True, capture_output=True)
+            package = re.split(r"[=<>]", requirement)[0].replace("-", "_")
+            self._wheels[requirement] = zipfile.ZipFile(next(self.download_directory.glob(f"{package}-*.whl")))
+        return self._wheels[requirement]
+
+    def text_font(self, family: str, weight: int, style: str) -> bytes:
+        wheel = self._wheel(f"fontpkg-{family.lower().replace(' ', '-')}")
+        name = family.replace(" ", "")
+        weight_name = WEIGHT_NAMES[weight]
+        if style == "italic":
+            weight_name = "Italic" if weight == 400 else f"{weight_name}Italic"
+        files = {Path(file_name).name: file_name for file_name in wheel.namelist() if file_name.endswith(".ttf")}
+        if f"{name}-{weight_name}.ttf" in files:
+            return wheel.read(files[f"{name}-{weight_name}.ttf"])
+        # Families only shipped as variable fonts: Family[wght].ttf and Family-Italic[wght].ttf
+        prefix = f"{name}-Italic[" if style == "italic" else f"{name}["
+        variable = next(file_name for base_name, file_name in sorted(files.items()) if base_name.startswith(prefix))
+        return instantiate_font(wheel.read(variable), weight)
+
+    def font_awesome_css(self) -> str:
+        wheel = self._wheel(f"fontawesomefree=={FONT_AWESOME_VERSION}")
+        return wheel.read("fontawesomefree/static/fontawesomefree/css/all.min.css").decode("utf-8")
+
+    def font_awesome_webfont(self, webfont: str) -> bytes:
+        wheel = self._wheel(f"fontawesomefree=={FONT_AWESOME_VERSION}")
+        return wheel.read(f"fontawesomefree/static/fontawesomefree/webfonts/{webfont}.woff2")
+
+
+def build(directory: Path = BUNDLE_DIRECTORY, source: str = "google"):
+    (directory / "fonts").mkdir(parents=True, exist_ok=True)
+    latin = parse_unicode_ranges(LATIN_UNICODES)
+    with tempfile.TemporaryDirectory() as download_directory:
+        fonts = PyPISource(Path(download_directory)) if source == "pypi" else GoogleFontsSource()
+        for family, variants in GOOGLE_FONT_FAMILIES.items():
+            for weight, style in variants:
+                subset_font(fonts.text_font(family, weight, style),
+                            directory / "fonts" / _font_file_name(family, weight, style), latin)
+                logger.info(f"Bundled {family} {weight} {style}")
+
+        stylesheet, code_points = font_awesome_css(fonts.font_awesome_css(), FONT_AWESOME_ICONS)
+        for webfont, unicodes in code_points.items():
+            subset_font(fonts.font_awesome_webfont(webfont), directory / "fonts" / f"{webfont}.woff2", unicodes)
+    write_bundle_css(directory, stylesheet)
+    logger.info(f"Render asset bundle written to {directory}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds the local font and icon bundle of the HTML documents")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--directory", type=Path, default=BUNDLE_DIRECTORY)
+    parser.add_argument("--source", choices=["google", "pypi"], default="google",
+                        help="Where the font files come from: Google Fonts and cdnjs, or their packages on PyPI")
+    args = parser.parse_args()
+    build(args.directory, args.source)
@@ -0,0 +1,479 @@
+import re
+import threading
+from html import escape
+from html.parser import HTMLParser
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT, TA_RIGHT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont, TTFError
+from reportlab.platypus import (Flowable, HRFlowable, ListFlowable, ListItem, Paragraph, SimpleDocTemplate, Spacer,
+                                Table, TableStyle)
+from src.logging import logger
+from src.utils.chrome_utils import PDF_PRINT_OPTIONS
+from src.utils.render_assets import BUNDLE_DIRECTORY
+
+"""
+This module prints the HTML documents of the resume styles (src/generate_templates/styles/resumes) to PDF with
+reportlab, without a browser. It understands the subset of HTML and CSS the templates use: block elements, lists,
+links, two column flex rows (entry headers), background colours and bottom borders, and the type, colour, alignment and
+margin properties of simple selectors (tag, .class, #id and descendant combinations). Anything else (shadows, rounded
+corners, grid layouts) is ignored. Sans-serif text (the body and headings of every style) is set in the Roboto TrueType
+fonts of the render bundle, characters Roboto has no glyph for (arrows, symbols) in the bundled DejaVu Sans. Serif and
+monospace text uses the PDF standard fonts (Times, Courier), as does everything when the bundled fonts cannot be loaded.
+Icon fonts are left out, so documents differ in looks from the Chrome ones but not in content.
+"""
+
+BLOCK_TAGS = {"html", "body", "header", "footer", "section", "article", "main", "div", "p", "h1", "h2", "h3", "h4",
+              "h5", "h6", "ul", "ol", "li", "table", "tr", "blockquote", "address"}
+VOID_TAGS = {"br", "hr", "img", "meta", "link", "input", "col", "source"}
+SKIPPED_TAGS = {"head", "style", "script", "title", "noscript"}
+INHERITED_PROPERTIES = ("color", "font-family", "font-size", "font-weight", "font-style", "text-align", "line-height")
+NAMED_COLORS = {"black": "#000000", "white": "#ffffff", "red": "#ff0000", "green": "#008000", "blue": "#0000ff",
+                "gray": "#808080", "grey": "#808080", "navy": "#000080", "darkblue": "#00008b"}
+DEFAULT_STYLE = {"color": "#000000", "font-family": "sans-serif", "font-size": "12pt", "font-weight": "normal",
+                 "font-style": "normal", "text-align": "left", "line-height": "1.2"}
+# TrueType fonts of the render bundle: reportlab name -> file, the Roboto family and the fallback for missing glyphs
+TTF_DIRECTORY = BUNDLE_DIRECTORY / "fonts" / "ttf"
+SANS_FONTS = {"Roboto": "Roboto-Regular.ttf", "Roboto-Bold": "Roboto-Bold.ttf", "Roboto-Italic": "Roboto-Italic.ttf",
+              "Roboto-BoldItalic": "Roboto-BoldItalic.ttf"}
+FALLBACK_FONT = ("DejaVuSans", "DejaVuSans.ttf")
+# Browser defaults of the elements the templates rely on, before the style sheet applies
+USER_AGENT_STYLES = {
+    "h1": {"font-size": "2em", "font-weight": "bold", "margin-bottom": "0.67em"},
+    "h2": {"font-size": "1.5em", "font-weight": "bold", "margin-top": "0.83em", "margin-bottom": "0.83em"},
+    "h3": {"font-size": "1.17em", "font-weight": "bold", "margin-top": "1em", "margin-bottom": "1em"},
+    "p": {"margin-top": "1em", "margin-bottom": "1em"},
+    "strong": {"font-weight": "bold"}, "b": {"font-weight": "bold"}, "em": {"font-style": "italic"},
+    "i": {"font-style": "italic"}, "ul": {"margin-top": "1em", "margin-bottom": "1em"},
+}
+
+
+class _BundledFonts:
+    # Registered with reportlab once per process
+    _registered: Optional[bool] = None
+    _sans_glyphs: frozenset = frozenset()
+    _fallback_glyphs: frozenset = frozenset()
+    _lock = threading.Lock()
+
+    @classmethod
+    def available(cls) -> bool:
+        with cls._lock:
+            if cls._registered is None:
+                try:
+                    for name, file_name in list(SANS_FONTS.items()) + [FALLBACK_FONT]:
+                        pdfmetrics.registerFont(TTFont(name, str(TTF_DIRECTORY / file_name)))
+                    pdfmetrics.registerFontFamily("Roboto", normal="Roboto", bold="Roboto-Bold", italic="Roboto-Italic",
+                                                  boldItalic="Roboto-BoldItalic")
+                    cls._sans_glyphs = frozenset(pdfmetrics.getFont("Roboto").face.charToGlyph)
+                    cls._fallback_glyphs = frozenset(pdfmetrics.getFont(FALLBACK_FONT[0]).face.charToGlyph)
+                    cls._registered = True
+                except (OSError, TTFError) as e:
+                    logger.warning(f"Bundled TrueType fonts unavailable, the reportlab renderer uses Helvetica: {e}")
+                    cls._registered = False
+            return cls._registered
+
+    @classmethod
+    def with_fallback(cls, text: str) -> str:
+        # Characters Roboto has no glyph for are set in the fallback font rather than printed as empty boxes
+        if not cls.available() or all(ord(char) in cls._sans_glyphs for char in text):
+            return text
+        parts = []
+        for char in text:
+            code_point = ord(char)
+            if code_point not in cls._sans_glyphs and code_point in cls._fallback_glyphs:
+                parts.append(f'<font face="{FALLBACK_FONT[0]}">{char}</font>')
+            else:
+                parts.append(char)
+        return "".join(parts)
+
+
+class _Node:
+    def __init__(self, tag: str, attrs: Dict[str, str], parent: Optional["_Node"]):
+        self.tag = tag
+        self.attrs = attrs
+        self.parent = parent
+        self.children: List = []
+        self.classes = set((attrs.get("class") or "").split())
+        self.style: Dict[str, str] = {}
+
+
+class _TreeBuilder(HTMLParser):
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = _Node("document", {}, None)
+        self.current = self.root
+        self.css: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        node = _Node(tag, {name: value or "" for name, value in attrs}, self.current)
+        self.current.children.append(node)
+        if tag not in VOID_TAGS:
+            self.current = node
+
+    def handle_endtag(self, tag):
+        node = self.current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            self.current = node.parent
+
+    def handle_data(self, data):
+        if self.current.tag == "style":
+            self.css.append(data)
+        else:
+            self.current.children.append(data)
+
+
+def _parse_css(css: str) -> List[Tuple[List[List[str]], Tuple[int, int, int], int, Dict[str, str]]]:
+    """:return: the rules of the style sheet as (compound selectors, specificity, position, declarations)."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)
+    css = re.sub(r"@import[^;]*;", "", css)
+    # Keep the content of @media print blocks, drop other at-rules with nested blocks
+    while True:
+        match = re.search(r"@media([^{]*)\{", css)
+        if match is None:
+            break
+        depth, end = 1, match.end()
+        while depth and end < len(css):
+            depth += {"{": 1, "}": -1}.get(css[end], 0)
+            end += 1
+        inner = css[match.end():end - 1] if "print" in match.group(1) else ""
+        css = css[:match.start()] + inner + css[end:]
+
+    rules = []
+    for position, (selectors, body) in enumerate(re.findall(r"([^{}]+)\{([^{}]*)\}", css)):
+        declarations = {}
+        for declaration in body.split(";"):
+            name, _, value = declaration.partition(":")
+            if value.strip():
+                declarations[name.strip().lower()] = value.replace("!important", "").strip()
+        for selector in selectors.split(","):
+            selector = selector.strip()
+            if not selector or selector.startswith("@") or ":" in selector.replace("::", ":"):
+                continue
+            compounds = [part for part in re.split(r"\s*>\s*|\s+", selector) if part]
+            specificity = (
+                sum(part.count("#") for part in compounds),
+                sum(part.count(".") for part in compounds),
+                sum(1 for part in compounds if re.match(r"[a-zA-Z]", part)),
+            )
+            rules.append((compounds, specificity, position, declarations))
+    return rules
+
+
+def _matches_compound(node: _Node, compound: str) -> bool:
+    tag = re.match(r"[a-zA-Z][a-zA-Z0-9]*|\*", compound)
+    if tag and tag.group(0) not in ("*", node.tag):
+        return False
+    if any(cls not in node.classes for cls in re.findall(r"\.([\w-]+)", compound)):
+        return False
+    return all(node.attrs.get("id") == node_id for node_id in re.findall(r"#([\w-]+)", compound))
+
+
+def _matches(node: _Node, compounds: List[str]) -> bool:
+    if not _matches_compound(node, compounds[-1]):
+        return False
+    ancestor = node.parent
+    for compound in reversed(compounds[:-1]):
+        while ancestor is not None and not _matches_compound(ancestor, compound):
+            ancestor = ancestor.parent
+        if ancestor is None:
+            return False
+        ancestor = ancestor.parent
+    return True
+
+
+def _length(value: str, font_size: float, default: float = 0.0) -> float:
+    # CSS length in points, em and % relative to font_size
+    match = re.match(r"(-?[\d.]+)\s*(pt|px|em|rem|%|in|cm|mm)?", (value or "").strip())
+    if match is None:
+        return default
+    number, unit = float(match.group(1)), match.group(2)
+    return {
+        "pt": number, "px": number * 0.75, "em": number * font_size, "rem": number * 12, "%": number * font_size / 100,
+        "in": number * 72, "cm": number * 72 / 2.54, "mm": number * 72 / 25.4, None: number * 0.75,
+    }[unit]
+
+
+def _color(value: str) -> Optional[colors.Color]:
+    value = (value or "").strip().lower()
+    value = NAMED_COLORS.get(value, value)
+    hex_match = re.fullmatch(r"#([0-9a-f]{3,8})", value)
+    if hex_match:
+        digits = hex_match.group(1)
+        if len(digits) in (3, 4):
+            digits = "".join(digit * 2 for digit in digits)
+        channels = [int(digits[i:i + 2], 16) / 255 for i in range(0, len(digits), 2)]
+        return colors.Color(*channels[:3], alpha=channels[3] if len(channels) == 4 else 1)
+    rgb_match = re.fullmatch(r"rgba?\(([^)]*)\)", value)
+    if rgb_match:
+        channels = [float(channel) for channel in rgb_match.group(1).replace("/", ",").split(",") if channel.strip()]
+        return colors.Color(*(channel / 255 for channel in channels[:3]), alpha=channels[3] if len(channels) > 3 else 1)
+    return None
+
+
+def _is_visible(color: Optional[colors.Color]) -> bool:
+    return color is not None and color.alpha > 0 and (color.red, color.green, color.blue, color.alpha) != (1, 1, 1, 1)
+
+
+class ReportLabRenderer:
+
+    def __init__(self):
+        self.page_size = A4
+        self.margins = {side: PDF_PRINT_OPTIONS[f"margin{side.title()}"] * inch
+                        for side in ("top", "bottom", "left", "right")}
+        self.frame_width = self.page_size[0] - self.margins["left"] - self.margins["right"]
+
+    # -- styles
+
+    def _compute_styles(self, node: _Node, rules, inherited: Dict[str, str]):
+        for child in node.children:
+            if not isinstance(child, _Node):
+                continue
+            style = {name: inherited[name] for name in INHERITED_PROPERTIES}
+            declarations = dict(USER_AGENT_STYLES.get(child.tag, {}))
+            for compounds, _, _, rule_declarations in sorted(
+                    (rule for rule in rules if _matches(child, rule[0])), key=lambda rule: (rule[1], rule[2])):
+                declarations.update(rule_declarations)
+            declarations.update(dict(
+                (name.strip().lower(), value.strip()) for name, _, value in
+                (part.partition(":") for part in child.attrs.get("style", "").split(";")) if value.strip()
+            ))
+            self._expand_shorthands(declarations)
+            parent_size = float(inherited["font-size"].rstrip("pt"))
+            for name, value in declarations.items():
+                if name.startswith("--"):
+                    continue
+                style[name] = value
+            # Custom properties (var(--x)) are resolved against the declarations of the ancestors
+            style = {name: self._resolve_var(value, child, rules) for name, value in style.items()}
+            style["font-size"] = f"{_length(style['font-size'], parent_size, parent_size):.2f}pt"
+            child.style = style
+            self._compute_styles(child, rules, style)
+
+    @staticmethod
+    def _expand_shorthands(declarations: Dict[str, str]):
+        for box in ("margin", "padding"):
+            if box in declarations:
+                values = declarations.pop(box).split()
+                values = (values * 4)[:4] if len(values) == 1 else values
+                if len(values) == 2:
+                    values = values * 2
+                if len(values) == 3:
+                    values = values + [values[1]]
+                for side, value in zip(("top", "right", "bottom", "left"), values):
+                    declarations.setdefault(f"{box}-{side}", value)
+        if "background" in declarations and "background-color" not in declarations:
+            declarations["background-color"] = declarations["background"].split()[0]
+        if "font" in declarations:
+            declarations.pop("font")
+
+    @staticmethod
+    def _resolve_var(value: str, node: _Node, rules) -> str:
+        match = re.search(r"var\((--[\w-]+)\s*(?:,\s*([^)]*))?\)", value)
+        if match is None:
+            return value
+        for compounds, _, _, declarations in rules:
+            if match.group(1) in declarations:
+                return value.replace(match.group(0), declarations[match.group(1)])
+        return value.replace(match.group(0), match.group(2) or "")
+
+    @staticmethod
+    def _font_name(style: Dict[str, str]) -> str:
+        family = style["font-family"].lower()
+        bold = style["font-weight"] in ("bold", "bolder") or style["font-weight"].isdigit() and int(style["font-weight"]) >= 600
+        italic = style["font-style"] in ("italic", "oblique")
+        if "mono" in family or "courier" in family:
+            base, bold_name, italic_name, both = "Courier", "Courier-Bold", "Courier-Oblique", "Courier-BoldOblique"
+        elif ("serif" in family and "sans" not in family) or "times" in family or "georgia" in family:
+            base, bold_name, italic_name, both = "Times-Roman", "Times-Bold", "Times-Italic", "Times-BoldItalic"
+        elif _BundledFonts.available():
+            base, bold_name, italic_name, both = "Roboto", "Roboto-Bold", "Roboto-Italic", "Roboto-BoldItalic"
+        else:
+            base, bold_name, italic_name, both = "Helvetica", "Helvetica-Bold", "Helvetica-Oblique", "Helvetica-BoldOblique"
+        return both if bold and italic else bold_name if bold else italic_name if italic else base
+
+    def _paragraph_style(self, style: Dict[str, str], alignment: str = None) -> ParagraphStyle:
+        font_size = float(style["font-size"].rstrip("pt"))
+        line_height = style.get("line-height", "1.2")
+        leading = font_size * float(line_height) if re.fullmatch(r"[\d.]+", line_height) \
+            else _length(line_height, font_size, font_size * 1.2)
+        return ParagraphStyle(
+            "html",
+            fontName=self._font_name(style),
+            fontSize=font_size,
+            leading=max(leading, font_size),
+            textColor=_color(style["color"]) or colors.black,
+            alignment={"center": TA_CENTER, "right": TA_RIGHT, "justify": TA_JUSTIFY}.get(
+                alignment or style["text-align"], TA_LEFT),
+            spaceBefore=_length(style.get("margin-top"), font_size),
+            spaceAfter=_length(style.get("margin-bottom"), font_size),
+        )
+
+    # -- inline content
+
+    def _inline_markup(self, node: _Node, block_style: Dict[str, str]) -> str:
+        parts = []
+        for child in node.children:
+            if isinstance(child, str):
+                parts.append(_BundledFonts.with_fallback(escape(re.sub(r"\s+", " ", child), quote=False)))
+            elif child.tag == "br":
+                parts.append("<br/>")
+            elif child.tag not in SKIPPED_TAGS and child.style.get("display") != "none":
+                parts.append(self._styled_markup(child, block_style, self._inline_markup(child, child.style)))
+        return "".join(parts)
+
+    def _styled_markup(self, node: _Node, outer: Dict[str, str], markup: str) -> str:
+        style = node.style
+        if self._font_name(style) != self._font_name(outer):
+            markup = f'<font face="{self._font_name(style)}">{markup}</font>'
+        if style["color"] != outer["color"] and _color(style["color"]) is not None:
+            markup = f'<font color="#{_color(style["color"]).hexval()[2:8]}">{markup}</font>'
+        if style["font-size"] != outer["font-size"]:
+            markup = f'<font size="{style["font-size"].rstrip("pt")}">{markup}</font>'
+        if node.tag == "a" and node.attrs.get("href"):
+            markup = f'<a href="{escape(node.attrs["href"])}">{markup}</a>'
+        return markup
+
+    # -- blocks
+
+    @staticmethod
+    def _is_block(node) -> bool:
+        return isinstance(node, _Node) and (node.tag in BLOCK_TAGS or node.style.get("display") in ("block", "flex"))
+
+    def _paragraph(self, node: _Node, markup: str, alignment: str = None) -> Optional[Paragraph]:
+        markup = markup.strip()
+        if not markup:
+            return None
+        return Paragraph(markup, self._paragraph_style(node.style, alignment))
+
+    def _flex_row(self, node: _Node) -> List[Flowable]:
+        items = [child for child in node.children if isinstance(child, _Node) or child.strip()]
+        if node.style.get("justify-content") == "space-between" and len(items) == 2 \
+                and all(isinstance(item, _Node) for item in items):
+            # Entry headers: name on the left, location or dates on the right
+            cells = [self._paragraph(item, self._inline_markup(item, item.style), alignment)
+                     for item, alignment in zip(items, ("left", "right"))]
+            table = Table([cells], colWidths=[self.frame_width * 0.62, self.frame_width * 0.38])
+            table.setStyle(TableStyle([("LEFTPADDING", (0, 0), (-1, -1), 0), ("RIGHTPADDING", (0, 0), (-1, -1), 0),
+                                       ("TOPPADDING", (0, 0), (-1, -1), 0), ("BOTTOMPADDING", (0, 0), (-1, -1), 1),
+                                       ("VALIGN", (0, 0), (-1, -1), "TOP")]))
+            return [table]
+        # Any other row (contact details...) wraps like text
+        markup = "&nbsp;&nbsp;&nbsp;".join(
+            self._styled_markup(item, node.style, self._inline_markup(item, item.style)).strip()
+            if isinstance(item, _Node) else escape(item.strip(), quote=False) for item in items
+        )
+        paragraph = self._paragraph(node, markup)
+        return [paragraph] if paragraph else []
+
+    def _list(self, node: _Node) -> List[Flowable]:
+        items = []
+        for child in node.children:
+            if isinstance(child, _Node) and child.tag == "li":
+                flowables = self._blocks(child) if any(self._is_block(c) for c in child.children) \
+                    else [self._paragraph(child, self._inline_markup(child, child.style))]
+                flowables = [flowable for flowable in flowables if flowable is not None]
+                if flowables:
+                    items.append(ListItem(flowables))
+        if not items:
+            return []
+        font_size = float(node.style["font-size"].rstrip("pt"))
+        return [ListFlowable(
+            items,
+            bulletType="1" if node.tag == "ol" else "bullet",
+            start=None if node.tag == "ol" else "•",
+            bulletFontSize=font_size,
+            bulletFontName=self._font_name(dict(node.style, **{"font-weight": "normal", "font-style": "normal"})),
+            leftIndent=max(_length(node.style.get("padding-left"), font_size), font_size),
+            spaceBefore=_length(node.style.get("margin-top"), font_size),
+            spaceAfter=_length(node.style.get("margin-bottom"), font_size),
+        )]
+
+    def _block(self, node: _Node) -> List[Flowable]:
+        if node.tag in ("ul", "ol"):
+            flowables = self._list(node)
+        elif node.style.get("display") == "flex" and not any(
+                isinstance(child, _Node) and child.tag in ("ul", "ol", "div", "section") for child in node.children):
+            # Rows of text (entry headers, contact details), rows of lists or boxes are laid out one below the other
+            flowables = self._flex_row(node)
+        elif any(self._is_block(child) for child in node.children):
+            flowables = self._blocks(node)
+        else:
+            paragraph = self._paragraph(node, self._inline_markup(node, node.style))
+            flowables = [paragraph] if paragraph else []
+        if node.tag == "hr":
+            flowables = [HRFlowable(width="100%", thickness=0.5, color=colors.grey)]
+
+        border = node.style.get("border-bottom", "")
+        if border and "none" not in border:
+            width = _length(border.split()[0], float(node.style["font-size"].rstrip("pt")), 0.75)
+            color = next((_color(part) for part in border.split() if _color(part) is not None), colors.grey)
+            flowables.append(HRFlowable(width="100%", thickness=max(width, 0.25), color=color, spaceBefore=1,
+                                        spaceAfter=2))
+
+        background = _color(node.style.get("background-color"))
+        if flowables and _is_visible(background) and node.tag not in ("body", "html"):
+            # Boxed blocks (the header of most styles) become a one cell table with the background
+            font_size = float(node.style["font-size"].rstrip("pt"))
+            padding = max(_length(node.style.get("padding-left"), font_size), 4)
+            table = Table([[flowables]], colWidths=[self.frame_width])
+            table.setStyle(TableStyle([("BACKGROUND", (0, 0), (-1, -1), background),
+                                       ("LEFTPADDING", (0, 0), (-1, -1), padding),
+                                       ("RIGHTPADDING", (0, 0), (-1, -1), padding),
+                                       ("TOPPADDING", (0, 0), (-1, -1), padding),
+                                       ("BOTTOMPADDING", (0, 0), (-1, -1), padding)]))
+            flowables = [table]
+        if node.tag not in ("p", "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol") and flowables:
+            font_size = float(node.style["font-size"].rstrip("pt"))
+            bottom = _length(node.style.get("margin-bottom"), font_size)
+            if bottom > 0:
+                flowables.append(Spacer(1, bottom))
+        return flowables
+
+    def _blocks(self, node: _Node) -> List[Flowable]:
+        flowables, inline = [], []
+
+        def flush():
+            paragraph = self._paragraph(node, "".join(inline))
+            if paragraph:
+                flowables.append(paragraph)
+            inline.clear()
+
+        for child in node.children:
+            if isinstance(child, _Node) and (child.tag in SKIPPED_TAGS or child.style.get("display") == "none"):
+                continue
+            if self._is_block(child) or (isinstance(child, _Node) and child.tag == "hr"):
+                flush()
+                flowables.extend(self._block(child))
+            elif isinstance(child, str):
+                inline.append(escape(re.sub(r"\s+", " ", child), quote=False))
+            elif child.tag == "br":
+                inline.append("<br/>")
+            else:
+                inline.append(self._styled_markup(child, node.style, self._inline_markup(child, child.style)))
+        flush()
+        return flowables
+
+    def render(self, html_content: str) -> bytes:
+        builder = _TreeBuilder()
+        builder.feed(html_content)
+        builder.close()
+        root = builder.root
+        root.style = dict(DEFAULT_STYLE)
+        self._compute_styles(root, _parse_css("\n".join(builder.css)), root.style)
+
+        buffer = BytesIO()
+        document = SimpleDocTemplate(
+            buffer, pagesize=self.page_size, topMargin=self.margins["top"], bottomMargin=self.margins["bottom"],
+            leftMargin=self.margins["left"], rightMargin=self.margins["right"],
+        )
+        story = self._blocks(root) or [Spacer(1, 1)]
+        document.build(story)
+        return buffer.getvalue()
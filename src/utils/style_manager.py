@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 import logging
+from src.utils.tracing import Tracer
 
 '''
 TODO Explain what this class does, and how it should be used by other objects.
@@ -16,6 +17,7 @@ class StyleManager:
         logging.debug(f"Project root determined as: {project_root}")
         logging.debug(f"Styles directory set to: {self.styles_directory}")
 
+    @Tracer.traced("style.load", step="scan")
     def get_styles(self) -> Dict[str, Tuple[str, str]]:
         """
         Retrieve the available styles from the styles directory.
@@ -0,0 +1,189 @@
+import contextvars
+import functools
+import json
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from local_config import global_config
+from src.logging import logger
+
+"""
+This module records where the time of a run goes. Code wraps its slow steps (LLM calls, PDF renders, style loads, file
+writes) in Tracer.span(); every span feeds an HDR-style latency histogram keyed by its name and attributes, and, when
+global_config.TRACE_OTEL_EXPORT is on, is kept to be written out as OpenTelemetry (OTLP/JSON) spans. Nested spans are
+linked to their parent through a context variable, so this also works across asyncio tasks.
+"""
+
+_current_span = contextvars.ContextVar("trace_current_span", default=None)
+
+
+class LatencyHistogram:
+    """
+    Log-linear histogram in the spirit of HdrHistogram: values (in microseconds) are bucketed by power of two and each
+    power of two is split into 2 ** significant_bits linear sub-buckets, so every recorded value keeps a relative
+    precision of about 1 / 2 ** significant_bits whatever its magnitude, in a few hundred counters at most.
+    """
+
+    def __init__(self, significant_bits: int = None):
+        self.significant_bits = significant_bits or global_config.TRACE_HISTOGRAM_SIGNIFICANT_BITS
+        self.counts: Dict[Tuple[int, int], int] = {}
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def _bucket(self, microseconds: int) -> Tuple[int, int]:
+        exponent = max(0, microseconds.bit_length() - self.significant_bits)
+        return exponent, microseconds >> exponent
+
+    @staticmethod
+    def _bucket_value(bucket: Tuple[int, int]) -> int:
+        # Highest value of the bucket, percentiles are reported as upper bounds like HdrHistogram does
+        exponent, sub_bucket = bucket
+        return ((sub_bucket + 1) << exponent) - 1
+
+    def record(self, seconds: float):
+        bucket = self._bucket(max(0, int(seconds * 1_000_000)))
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def percentile(self, percentile: float) -> float:
+        if not self.count:
+            return 0.0
+        target = max(1, int(round(percentile / 100 * self.count)))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= target:
+                return min(self._bucket_value(bucket) / 1_000_000, self.max_seconds)
+        return self.max_seconds
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "total_seconds": self.total_seconds,
+            "mean_seconds": self.total_seconds / self.count if self.count else 0.0,
+            "max_seconds": self.max_seconds,
+            "percentiles": {str(p): self.percentile(p) for p in (50, 90, 95, 99, 99.9)},
+            # [upper bound in microseconds, count] pairs, enough to merge histograms of several runs
+            "buckets": [[self._bucket_value(bucket), count] for bucket, count in sorted(self.counts.items())],
+        }
+
+
+class Tracer:
+    _lock = threading.Lock()
+    histograms: Dict[str, LatencyHistogram] = {}
+    # Finished spans in OTLP form, only kept when TRACE_OTEL_EXPORT is on
+    spans: List[Dict] = []
+
+    @staticmethod
+    def histogram_key(name: str, attributes: Dict) -> str:
+        # Attributes become part of the key, so callers only pass low cardinality ones (model, prompt type...)
+        tags = ",".join(f"{key}={value}" for key, value in sorted(attributes.items()) if value is not None)
+        return f"{name}{{{tags}}}" if tags else name
+
+    @staticmethod
+    @contextmanager
+    def span(name: str, **attributes):
+        """
+        Times the block. Yields the attribute dict, values added to it inside the block (e.g. cache_hit) are recorded
+        with the span.
+        """
+        if not global_config.TRACE_ENABLED:
+            yield attributes
+            return
+        parent = _current_span.get()
+        span = {
+            "trace_id": parent["trace_id"] if parent else secrets.token_hex(16),
+            "span_id": secrets.token_hex(8),
+            "parent_span_id": parent["span_id"] if parent else None,
+        }
+        token = _current_span.set(span)
+        start_ns = time.time_ns()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield attributes
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            _current_span.reset(token)
+            Tracer._finish(name, attributes, span, start_ns, duration, error)
+
+    @staticmethod
+    def traced(name: str, **attributes):
+        # Decorator version of span() for functions that are timed as a whole
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with Tracer.span(name, **attributes):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @classmethod
+    def _finish(cls, name: str, attributes: Dict, span: Dict, start_ns: int, duration: float,
+                error: Optional[BaseException]):
+        key = cls.histogram_key(name, attributes)
+        with cls._lock:
+            if key not in cls.histograms:
+                cls.histograms[key] = LatencyHistogram()
+            cls.histograms[key].record(duration)
+            if not global_config.TRACE_OTEL_EXPORT or len(cls.spans) >= global_config.TRACE_MAX_SPANS:
+                return
+            cls.spans.append({
+                "traceId": span["trace_id"],
+                "spanId": span["span_id"],
+                "parentSpanId": span["parent_span_id"] or "",
+                "name": name,
+                "kind": 1,
+                "startTimeUnixNano": str(start_ns),
+                "endTimeUnixNano": str(start_ns + int(duration * 1_000_000_000)),
+                "attributes": [
+                    {"key": key, "value": {"stringValue": str(value)}}
+                    for key, value in attributes.items() if value is not None
+                ],
+                "status": {"code": 2, "message": str(error)} if error is not None else {"code": 1},
+            })
+
+    @classmethod
+    def summary_table(cls) -> str:
+        with cls._lock:
+            rows = [
+                (key, histogram.count, histogram.percentile(50), histogram.percentile(90), histogram.percentile(99),
+                 histogram.max_seconds, histogram.total_seconds)
+                for key, histogram in sorted(cls.histograms.items())
+            ]
+        if not rows:
+            return "No spans recorded"
+        name_width = max(len("span"), *(len(row[0]) for row in rows))
+        lines = [f"{'span':<{name_width}}  {'count':>6}  {'p50 s':>8}  {'p90 s':>8}  {'p99 s':>8}  {'max s':>8}  {'total s':>9}"]
+        lines.append("-" * len(lines[0]))
+        for key, count, p50, p90, p99, maximum, total in rows:
+            lines.append(f"{key:<{name_width}}  {count:>6}  {p50:>8.3f}  {p90:>8.3f}  {p99:>8.3f}  {maximum:>8.3f}  {total:>9.3f}")
+        return "\n".join(lines)
+
+    @classmethod
+    def export(cls):
+        # Writes the histograms (and the OTLP spans if enabled) next to the other run outputs
+        output_directory = global_config.LOG_OUTPUT_FILE_PATH
+        with cls._lock:
+            histograms = {key: histogram.to_dict() for key, histogram in cls.histograms.items()}
+            spans = list(cls.spans)
+        try:
+            output_directory.mkdir(parents=True, exist_ok=True)
+            with open(output_directory / "latency_histograms.json", "w", encoding="utf-8") as f:
+                json.dump(histograms, f, indent=4)
+            if spans:
+                with open(output_directory / "traces.otel.json", "w", encoding="utf-8") as f:
+                    json.dump({"resourceSpans": [{
+                        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "resume-builder"}}]},
+                        "scopeSpans": [{"scope": {"name": "src.utils.tracing"}, "spans": spans}],
+                    }]}, f)
+        except OSError as e:
+            logger.error(f"Failed to export traces to {output_directory}: {e}")
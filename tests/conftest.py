@@ -0,0 +1,46 @@
+from pathlib import Path
+import pytest
+from local_config import global_config
+from src.utils.llm_utils import mock_openai_server
+from src.utils.llm_utils.llm_logger import LLMLogger
+from src.utils.llm_utils.llm_resumer import LLMResumer
+
+"""
+Every file the code under test writes (caches, state files, logs, batches) goes to a temporary directory instead of
+data_folder/output: the test's own one while it runs, and a directory of the session for what is written at exit.
+"""
+
+
+def rebase_output_paths(directory: Path, setattr):
+    output = Path(global_config.LOG_OUTPUT_FILE_PATH)
+    for name, value in list(vars(global_config).items()):
+        if isinstance(value, Path) and (value == output or output in value.parents):
+            setattr(global_config, name, directory / value.relative_to(output))
+
+
+@pytest.fixture(scope="session", autouse=True)
+def session_output(tmp_path_factory):
+    # Not restored, the cost summary is written by an atexit hook after the session ends
+    directory = tmp_path_factory.mktemp("output")
+    rebase_output_paths(directory, setattr)
+    return directory
+
+
+@pytest.fixture(autouse=True)
+def isolated_output(session_output, tmp_path, monkeypatch):
+    rebase_output_paths(tmp_path, monkeypatch.setattr)
+    # Cache stats are only written at exit once a cache lookup was logged, pytest has closed its output by then
+    monkeypatch.setattr(LLMLogger, "_cache_stats", None)
+    # The process wide fragment store is created in the directory of the test that first needs it
+    monkeypatch.setattr(LLMResumer, "_shared_fragment_store", None)
+    return tmp_path
+
+
+@pytest.fixture
+def mock_server(monkeypatch):
+    # Local OpenAI compatible server answering every section prompt with canned content
+    server = mock_openai_server.serve(port=0)
+    monkeypatch.setattr(global_config, "LLM_API_URL", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.setattr(global_config, "API_KEY", "sk-test")
+    yield server
+    server.shutdown()
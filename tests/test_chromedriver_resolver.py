@@ -0,0 +1,135 @@
+import os
+import sys
+from pathlib import Path
+import pytest
+from webdriver_manager.chrome import ChromeDriverManager
+from src.utils import chromedriver_resolver
+from src.utils.chromedriver_resolver import ChromeDriverResolver, major_version
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="the fake executables are shell scripts")
+
+
+def fake_executable(path: Path, output: str) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"#!/bin/sh\necho '{output}'\n", encoding="utf-8")
+    path.chmod(0o755)
+    return path
+
+
+class Machine:
+    # The Chrome and chromedrivers installed on a fake machine, and every --version run
+    def __init__(self, directory: Path, monkeypatch):
+        self.directory = directory
+        self.chrome = fake_executable(directory / "chrome" / "chrome", "Google Chrome 120.0.6099.109")
+        self.drivers = []
+        self.version_runs = []
+        self.downloads = 0
+        real_executable_version = chromedriver_resolver.executable_version
+
+        def executable_version(path):
+            self.version_runs.append(Path(path).name)
+            return real_executable_version(path)
+
+        def install(manager):
+            self.downloads += 1
+            return str(self.add_driver("downloaded", "ChromeDriver 120.0.6099.109 (abc)"))
+
+        monkeypatch.setattr(chromedriver_resolver, "executable_version", executable_version)
+        monkeypatch.setattr(chromedriver_resolver, "find_chrome_binary", lambda: self.chrome)
+        monkeypatch.setattr(ChromeDriverResolver, "_local_drivers", staticmethod(lambda: list(self.drivers)))
+        monkeypatch.setattr(ChromeDriverManager, "install", install)
+
+    def add_driver(self, name: str, output: str) -> Path:
+        return fake_executable(self.directory / "drivers" / name / "chromedriver", output)
+
+    def update_chrome(self, output: str):
+        fake_executable(self.chrome, output)
+        # A new mtime even on file systems with coarse timestamps
+        stat = self.chrome.stat()
+        os.utime(self.chrome, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+@pytest.fixture
+def machine(tmp_path, monkeypatch):
+    return Machine(tmp_path, monkeypatch)
+
+
+def resolver(machine, offline=False) -> ChromeDriverResolver:
+    return ChromeDriverResolver(machine.directory / "chromedriver.json", offline=offline)
+
+
+def test_major_version():
+    assert major_version("120.0.6099.109") == "120"
+    assert major_version(None) is None
+
+
+def test_local_driver_matching_the_chrome_major_version_is_used(machine):
+    machine.drivers.append(machine.add_driver("old", "ChromeDriver 119.0.6045.105 (abc)"))
+    matching = machine.add_driver("matching", "ChromeDriver 120.0.6099.71 (abc)")
+    machine.drivers.append(matching)
+
+    assert resolver(machine).resolve() == str(matching)
+    assert machine.downloads == 0
+
+
+def test_recorded_driver_is_reused_without_running_anything(machine):
+    machine.drivers.append(machine.add_driver("matching", "ChromeDriver 120.0.6099.71 (abc)"))
+    driver_path = resolver(machine).resolve()
+    machine.version_runs.clear()
+
+    assert resolver(machine).resolve() == driver_path
+    assert machine.version_runs == []
+
+
+def test_chrome_update_resolves_the_driver_again(machine):
+    machine.drivers.append(machine.add_driver("120", "ChromeDriver 120.0.6099.71 (abc)"))
+    resolver(machine).resolve()
+    machine.update_chrome("Google Chrome 121.0.6167.85")
+    driver_121 = machine.add_driver("121", "ChromeDriver 121.0.6167.85 (abc)")
+    machine.drivers.append(driver_121)
+
+    assert resolver(machine).resolve() == str(driver_121)
+
+
+def test_driver_is_downloaded_when_none_matches(machine):
+    machine.drivers.append(machine.add_driver("old", "ChromeDriver 119.0.6045.105 (abc)"))
+    assert resolver(machine).resolve().endswith("downloaded/chromedriver")
+    assert machine.downloads == 1
+
+
+def test_offline_resolution_fails_without_a_matching_driver(machine):
+    machine.drivers.append(machine.add_driver("old", "ChromeDriver 119.0.6045.105 (abc)"))
+    with pytest.raises(RuntimeError, match="CHROMEDRIVER_OFFLINE"):
+        resolver(machine, offline=True).resolve()
+    assert machine.downloads == 0
+
+
+def test_failed_driver_is_not_picked_again(machine):
+    failing = machine.add_driver("failing", "ChromeDriver 120.0.6099.71 (abc)")
+    machine.drivers.append(failing)
+    first = resolver(machine)
+    assert first.resolve() == str(failing)
+
+    first.invalidate()
+
+    # Online a fresh driver is downloaded rather than trying the local ones again
+    assert resolver(machine).resolve().endswith("downloaded/chromedriver")
+    assert machine.downloads == 1
+
+
+def test_offline_skips_failed_drivers_for_other_local_ones(machine):
+    failing = machine.add_driver("failing", "ChromeDriver 120.0.6099.71 (abc)")
+    other = machine.add_driver("other", "ChromeDriver 120.0.6099.109 (abc)")
+    machine.drivers.extend([failing, other])
+    first = resolver(machine, offline=True)
+    assert first.resolve() == str(failing)
+
+    first.invalidate()
+
+    assert resolver(machine, offline=True).resolve() == str(other)
+
+
+def test_unknown_chrome_version_is_never_matched_locally(machine):
+    machine.update_chrome("")
+    machine.drivers.append(machine.add_driver("matching", "ChromeDriver 120.0.6099.71 (abc)"))
+    assert resolver(machine).resolve().endswith("downloaded/chromedriver")
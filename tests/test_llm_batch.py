@@ -0,0 +1,117 @@
+from pathlib import Path
+from typing import Dict, List
+import pytest
+from src.data_objects.resume import Resume
+from src.utils.llm_utils import llm_manager as llm_manager_module
+from src.utils.llm_utils.llm_batch_clients import BATCH_COMPLETED, LocalBatchClient, canned_responder
+from src.utils.llm_utils.llm_manager import LlmManager
+from src.utils.llm_utils.resume_generator import ResumeGenerator
+
+STYLE_PATH = "src/generate_templates/styles/resumes/style_cloyola.css"
+JOB_DESCRIPTIONS = {
+    "acme": "Python developer at Acme Rockets",
+    "globex": "Data engineer at Globex Corporation",
+}
+
+
+def echo_responder(request_body: Dict) -> str:
+    return "echo: " + request_body["messages"][-1]["content"]
+
+
+class ScrambledBatchClient(LocalBatchClient):
+    # Returns the results in reverse order with some of them failed, like OpenAI may
+    def __init__(self, batch_directory: Path, responder=echo_responder, failed_custom_ids=(), statuses=()):
+        super().__init__(batch_directory, responder)
+        self.failed_custom_ids = set(failed_custom_ids)
+        self.statuses = list(statuses)
+
+    def status(self, batch_id: str) -> str:
+        if self.statuses:
+            return self.statuses.pop(0)
+        return super().status(batch_id)
+
+    def download_results(self, batch_id: str) -> List[Dict]:
+        results = []
+        for result in reversed(super().download_results(batch_id)):
+            if result["custom_id"] in self.failed_custom_ids:
+                result["response"] = {"status_code": 500, "body": {"error": {"message": "server error"}}}
+            results.append(result)
+        return results
+
+
+@pytest.fixture
+def manager():
+    return LlmManager("sk-test")
+
+
+def test_batch_replies_are_keyed_by_custom_id(manager, tmp_path):
+    manager.add_batch_request("acme::summary", "first prompt", job_id="acme", prompt_type="summary")
+    manager.add_batch_request("globex::summary", "second prompt", job_id="globex", prompt_type="summary")
+    batch_client = ScrambledBatchClient(tmp_path / "batches")
+
+    batch_id = manager.submit_batch(batch_client)
+    replies = manager.collect_batch(batch_id, batch_client)
+
+    assert manager.batch_requests == []
+    assert {custom_id: reply.content for custom_id, reply in replies.items()} == {
+        "acme::summary": "echo: first prompt",
+        "globex::summary": "echo: second prompt",
+    }
+    assert replies["acme::summary"].usage_metadata["input_tokens"] == len("first prompt") // 4
+
+
+def test_failed_batch_requests_are_left_out(manager, tmp_path):
+    manager.add_batch_request("acme::summary", "first prompt")
+    manager.add_batch_request("acme::skills", "second prompt")
+    batch_client = ScrambledBatchClient(tmp_path / "batches", failed_custom_ids=["acme::skills"])
+
+    replies = manager.collect_batch(manager.submit_batch(batch_client), batch_client)
+
+    assert list(replies) == ["acme::summary"]
+
+
+def test_collect_batch_polls_until_the_batch_completes(manager, tmp_path, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(llm_manager_module.time, "sleep", sleeps.append)
+    manager.add_batch_request("acme::summary", "prompt")
+    batch_client = ScrambledBatchClient(tmp_path / "batches", statuses=["validating", "in_progress", BATCH_COMPLETED])
+
+    replies = manager.collect_batch(manager.submit_batch(batch_client), batch_client)
+
+    assert len(sleeps) == 2
+    assert list(replies) == ["acme::summary"]
+
+
+def test_collect_batch_raises_when_the_batch_fails(manager, tmp_path):
+    manager.add_batch_request("acme::summary", "prompt")
+    batch_client = ScrambledBatchClient(tmp_path / "batches", statuses=["expired"])
+
+    with pytest.raises(RuntimeError, match="expired"):
+        manager.collect_batch(manager.submit_batch(batch_client), batch_client)
+
+
+def tagging_responder(request_body: Dict) -> str:
+    # Canned section followed by the job whose description is in the prompt, to check it lands in that job's resume
+    prompt = "\n".join(message["content"] for message in request_body["messages"])
+    job_ids = [job_id for job_id, text in JOB_DESCRIPTIONS.items() if text in prompt]
+    return canned_responder(request_body) + "".join(f"<!-- job:{job_id} -->" for job_id in job_ids)
+
+
+def test_batch_resumes_are_assembled_per_job(mock_server, tmp_path):
+    resume_generator = ResumeGenerator()
+    resume_generator.set_resume_object(
+        Resume(Path("data_folder_example/plain_text_resume.yaml").read_text(encoding="utf-8"))
+    )
+    batch_client = ScrambledBatchClient(tmp_path / "batches", responder=tagging_responder,
+                                        failed_custom_ids=["globex::additional_skills"])
+
+    resumes_html = resume_generator.create_resumes_job_description_batch(STYLE_PATH, JOB_DESCRIPTIONS, batch_client)
+
+    assert set(resumes_html) == {"acme", "globex"}
+    acme_sections = resumes_html["acme"].count("<!-- job:acme -->")
+    assert acme_sections > 0
+    assert "<!-- job:globex -->" not in resumes_html["acme"]
+    assert "<!-- job:acme -->" not in resumes_html["globex"]
+    # The failed section was asked again through the mock server, which does not tag its answers
+    assert resumes_html["globex"].count("<!-- job:globex -->") == acme_sections - 1
+    assert "<main>" in resumes_html["globex"]
@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate
+from src.utils.llm_utils import llm_manager
+from src.utils.llm_utils.llm_cassette import CassetteMissError, LLMCassette
+from src.utils.llm_utils.llm_manager import CassetteModel
+
+
+class CountingModel:
+    def __init__(self, llm_model: str = "gpt-4o"):
+        self.llm_model = llm_model
+        self.temperature = 0.4
+        self.calls = 0
+
+    def _reply(self, prompt) -> AIMessage:
+        self.calls += 1
+        return AIMessage(
+            content=f"reply {self.calls}", id=f"chatcmpl-{self.calls}", response_metadata={"model_name": self.llm_model},
+            usage_metadata={"input_tokens": 10, "output_tokens": 5, "total_tokens": 15},
+        )
+
+    def invoke(self, prompt) -> AIMessage:
+        return self._reply(prompt)
+
+    async def ainvoke(self, prompt) -> AIMessage:
+        return self._reply(prompt)
+
+
+@pytest.fixture
+def cassette_path(tmp_path):
+    return tmp_path / "cassettes" / "test.jsonl"
+
+
+def chat_prompt(text: str):
+    return ChatPromptTemplate.from_template("Summarize: {text}").format_prompt(text=text)
+
+
+def test_recorded_calls_replay_from_a_new_process(cassette_path):
+    recorder = CassetteModel("gpt-4o", CountingModel(), LLMCassette(cassette_path))
+    recorded = recorder.invoke(chat_prompt("a job"))
+
+    replayer = CassetteModel("gpt-4o", cassette=LLMCassette(cassette_path), replay_latency=False)
+    replayed = replayer.invoke(chat_prompt("a job"))
+
+    assert replayed.content == recorded.content
+    assert replayed.id == recorded.id
+    assert replayed.usage_metadata == recorded.usage_metadata
+    assert replayed.response_metadata == recorded.response_metadata
+
+
+def test_repeated_prompts_replay_in_recorded_order(cassette_path):
+    recorder = CassetteModel("gpt-4o", CountingModel(), LLMCassette(cassette_path))
+    for _ in range(2):
+        recorder.invoke("same prompt")
+
+    replayer = CassetteModel("gpt-4o", cassette=LLMCassette(cassette_path), replay_latency=False)
+    # The last recording is served again once they are used up
+    assert [replayer.invoke("same prompt").content for _ in range(3)] == ["reply 1", "reply 2", "reply 2"]
+
+
+def test_calls_are_matched_on_model_and_prompt(cassette_path):
+    CassetteModel("gpt-4o", CountingModel(), LLMCassette(cassette_path)).invoke(chat_prompt("a job"))
+    cassette = LLMCassette(cassette_path)
+
+    with pytest.raises(CassetteMissError):
+        cassette.replay("gpt-4o", chat_prompt("another job"))
+    with pytest.raises(CassetteMissError):
+        cassette.replay("gpt-4o-mini", chat_prompt("a job"))
+    reply, _ = cassette.replay("gpt-4o", chat_prompt("a job"))
+    assert reply.content == "reply 1"
+
+
+def test_async_calls_record_and_replay(cassette_path):
+    recorder = CassetteModel("gpt-4o", CountingModel(), LLMCassette(cassette_path))
+    asyncio.run(recorder.ainvoke("prompt"))
+
+    replayer = CassetteModel("gpt-4o", cassette=LLMCassette(cassette_path), replay_latency=False)
+    assert asyncio.run(replayer.ainvoke("prompt")).content == "reply 1"
+
+
+def test_replay_waits_for_the_recorded_latency(cassette_path, monkeypatch):
+    LLMCassette(cassette_path).record("gpt-4o", "prompt", CountingModel().invoke("prompt"), latency=1.5)
+    sleeps = []
+    monkeypatch.setattr(llm_manager.time, "sleep", sleeps.append)
+
+    CassetteModel("gpt-4o", cassette=LLMCassette(cassette_path), replay_latency=True).invoke("prompt")
+
+    assert sleeps == [1.5]
+
+
+def test_shared_cassette_is_one_instance_per_file(cassette_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(LLMCassette, "_cassettes", {})
+    assert LLMCassette.shared(cassette_path) is LLMCassette.shared(cassette_path)
+    assert LLMCassette.shared(cassette_path) is not LLMCassette.shared(tmp_path / "other.jsonl")
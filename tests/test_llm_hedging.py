@@ -0,0 +1,182 @@
+import asyncio
+import pytest
+from local_config import global_config
+from src.utils.llm_utils import llm_hedging
+from src.utils.llm_utils.llm_hedging import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, LatencyWindow, hedged_ainvoke, hedged_invoke,
+)
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeModel:
+    def __init__(self, llm_model: str, delay: float = 0.0, error: Exception = None):
+        self.llm_model = llm_model
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def _reply(self, prompt):
+        if self.error is not None:
+            raise self.error
+        return f"{self.llm_model}: {prompt}"
+
+    def invoke(self, prompt):
+        self.calls += 1
+        return self._reply(prompt)
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self._reply(prompt)
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(CircuitBreaker, "_breakers", {})
+    monkeypatch.setattr(LatencyWindow, "_windows", {})
+    monkeypatch.setattr(global_config, "LLM_CIRCUIT_BREAKER_FAILURES", 3)
+    monkeypatch.setattr(global_config, "LLM_CIRCUIT_BREAKER_COOLDOWN_SECONDS", 60)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_hedging.time, "time", clock)
+    return clock
+
+
+def open_breaker(model) -> CircuitBreaker:
+    breaker = CircuitBreaker.for_model(model)
+    for _ in range(global_config.LLM_CIRCUIT_BREAKER_FAILURES):
+        breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("model")
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_half_open_breaker_lets_one_trial_through(clock):
+    breaker = open_breaker(FakeModel("gpt-4o"))
+    clock.now += 60
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_trial_outcome_decides_the_state(clock):
+    breaker = open_breaker(FakeModel("gpt-4o"))
+    clock.now += 60
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    clock.now += 60
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.consecutive_failures == 0
+
+
+def test_released_trial_is_handed_to_the_next_call(clock):
+    breaker = open_breaker(FakeModel("gpt-4o"))
+    clock.now += 60
+    breaker.allow()
+    breaker.release_trial()
+    assert breaker.state == OPEN
+    # The cooldown is not restarted, the next call gets the trial straight away
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+
+
+def test_release_trial_does_not_touch_a_closed_breaker():
+    breaker = CircuitBreaker("model")
+    breaker.release_trial()
+    assert breaker.state == CLOSED
+
+
+def test_open_breaker_without_secondary_fails_fast(clock):
+    primary = FakeModel("gpt-4o")
+    open_breaker(primary)
+    with pytest.raises(CircuitOpenError):
+        hedged_invoke(primary, primary, "prompt")
+    assert primary.calls == 0
+
+
+def test_secondary_stands_in_for_an_open_primary(clock):
+    primary, secondary = FakeModel("gpt-4o"), FakeModel("gpt-4o-mini")
+    open_breaker(primary)
+    assert hedged_invoke(primary, secondary, "prompt") == "gpt-4o-mini: prompt"
+    assert primary.calls == 0
+
+
+def test_both_breakers_open(clock):
+    primary, secondary = FakeModel("gpt-4o"), FakeModel("gpt-4o-mini")
+    open_breaker(primary)
+    open_breaker(secondary)
+    with pytest.raises(CircuitOpenError):
+        hedged_invoke(primary, secondary, "prompt")
+
+
+def test_failed_trial_call_reopens_the_breaker(clock):
+    primary = FakeModel("gpt-4o", error=RuntimeError("provider down"))
+    breaker = open_breaker(primary)
+    clock.now += 60
+    with pytest.raises(RuntimeError):
+        hedged_invoke(primary, primary, "prompt")
+    assert breaker.state == OPEN
+    assert breaker.opened_at == clock.now
+
+
+def test_unused_hedge_trial_is_released(clock, monkeypatch):
+    # Hedging is off, allow() turned the secondary half open for a trial call that is never sent
+    monkeypatch.setattr(global_config, "LLM_HEDGING_ENABLED", False)
+    primary, secondary = FakeModel("gpt-4o"), FakeModel("gpt-4o-mini")
+    secondary_breaker = open_breaker(secondary)
+    clock.now += 60
+    assert hedged_invoke(primary, secondary, "prompt") == "gpt-4o: prompt"
+    assert secondary_breaker.state == OPEN
+
+
+def test_slow_call_is_hedged_and_the_loser_hands_back_its_trial(clock, monkeypatch):
+    monkeypatch.setattr(global_config, "LLM_HEDGING_ENABLED", True)
+    monkeypatch.setattr(global_config, "LLM_HEDGE_DEFAULT_DELAY_SECONDS", 0.01)
+    primary, secondary = FakeModel("gpt-4o", delay=5), FakeModel("gpt-4o-mini")
+    primary_breaker = open_breaker(primary)
+    clock.now += 60
+
+    reply = asyncio.run(hedged_ainvoke(primary, secondary, "prompt"))
+
+    assert reply == "gpt-4o-mini: prompt"
+    # The primary's trial was cancelled, not failed: its breaker is ready for another trial
+    assert primary_breaker.state == OPEN
+    assert primary_breaker.consecutive_failures == global_config.LLM_CIRCUIT_BREAKER_FAILURES
+    assert CircuitBreaker.for_model(secondary).state == CLOSED
+
+
+def test_hedge_delay_follows_the_latency_percentile(monkeypatch):
+    monkeypatch.setattr(global_config, "LLM_HEDGE_MIN_SAMPLES", 10)
+    monkeypatch.setattr(global_config, "LLM_HEDGE_PERCENTILE", 90)
+    model = FakeModel("gpt-4o")
+    for latency in range(1, 10):
+        LatencyWindow.observe(model, float(latency))
+    assert LatencyWindow.hedge_delay(model) == global_config.LLM_HEDGE_DEFAULT_DELAY_SECONDS
+    LatencyWindow.observe(model, 10.0)
+    assert LatencyWindow.hedge_delay(model) == 10.0
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import multiprocessing
+import httpx
+import openai
+import pytest
+from src.utils.llm_utils import llm_rate_limiter
+from src.utils.llm_utils.llm_rate_limiter import LLMRateLimiter
+
+LIMITS = {"default": {"requests_per_minute": 60, "tokens_per_minute": 6000}}
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_rate_limiter.time, "time", clock)
+    return clock
+
+
+@pytest.fixture(autouse=True)
+def empty_memory_states(monkeypatch):
+    monkeypatch.setattr(LLMRateLimiter, "_memory_states", {})
+
+
+@pytest.fixture(params=[False, True], ids=["memory", "shared"])
+def limiter(request, tmp_path):
+    return LLMRateLimiter(tmp_path / "rate_limits.json", LIMITS, shared=request.param)
+
+
+def api_error(status_code: int, headers: dict = None) -> openai.APIStatusError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status_code, headers=headers or {}, request=request)
+    return openai.APIStatusError("error", response=response, body=None)
+
+
+def test_requests_bucket_empties_and_refills(limiter, clock):
+    for _ in range(60):
+        assert limiter._try_acquire("gpt-4o", 1) == 0
+    assert limiter._try_acquire("gpt-4o", 1) == pytest.approx(1.0)
+    clock.now += 1
+    assert limiter._try_acquire("gpt-4o", 1) == 0
+
+
+def test_tokens_bucket_waits_for_missing_tokens(limiter, clock):
+    assert limiter._try_acquire("gpt-4o", 5000) == 0
+    # 1000 tokens left, 2000 more refill in 20 seconds at 100 tokens a second
+    assert limiter._try_acquire("gpt-4o", 3000) == pytest.approx(20.0)
+
+
+def test_prompt_larger_than_budget_is_let_through_on_a_full_bucket(limiter, clock):
+    assert limiter._try_acquire("gpt-4o", 10 ** 6) == 0
+
+
+def test_models_have_their_own_buckets(limiter, clock):
+    assert limiter._try_acquire("gpt-4o", 6000) == 0
+    assert limiter._try_acquire("gpt-4o-mini", 6000) == 0
+
+
+def test_block_holds_every_caller_of_the_model(limiter, clock):
+    limiter.block("gpt-4o", 30)
+    assert limiter._try_acquire("gpt-4o", 1) == pytest.approx(30.0)
+    assert limiter._try_acquire("gpt-4o-mini", 1) == 0
+    clock.now += 30
+    assert limiter._try_acquire("gpt-4o", 1) == 0
+
+
+def test_limiters_on_the_same_path_share_buckets(limiter, clock):
+    other = LLMRateLimiter(limiter.state_path, LIMITS, shared=limiter.shared)
+    limiter.block("gpt-4o", 10)
+    assert other._try_acquire("gpt-4o", 1) == pytest.approx(10.0)
+
+
+def test_only_shared_buckets_are_written_to_disk(limiter, clock):
+    limiter._try_acquire("gpt-4o", 100)
+    assert limiter.state_path.exists() == limiter.shared
+    if limiter.shared:
+        state = json.loads(limiter.state_path.read_text(encoding="utf-8"))
+        assert state["gpt-4o"]["tokens"] == pytest.approx(5900)
+
+
+def _count_granted(state_path, attempts, results):
+    limiter = LLMRateLimiter(state_path, LIMITS, shared=True)
+    results.put(sum(limiter._try_acquire("gpt-4o", 1) == 0 for _ in range(attempts)))
+
+
+def test_shared_buckets_are_split_between_processes(tmp_path):
+    context = multiprocessing.get_context()
+    results = context.Queue()
+    workers = [context.Process(target=_count_granted, args=(tmp_path / "rate_limits.json", 50, results))
+               for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    granted = results.get(timeout=30) + results.get(timeout=30)
+    for worker in workers:
+        worker.join()
+    # 60 requests a minute, a couple more may refill while the workers run
+    assert 60 <= granted <= 63
+
+
+def test_acquire_sleeps_until_the_bucket_refills(limiter, clock, monkeypatch):
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr(llm_rate_limiter.time, "sleep", sleep)
+    limiter.block("gpt-4o", 5)
+    limiter.acquire("gpt-4o", 1)
+    assert sleeps == [pytest.approx(5.0)]
+
+
+def test_aacquire_sleeps_until_the_bucket_refills(limiter, clock, monkeypatch):
+    sleeps = []
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr(llm_rate_limiter.asyncio, "sleep", sleep)
+    limiter.block("gpt-4o", 5)
+    asyncio.run(limiter.aacquire("gpt-4o", 1))
+    assert sleeps == [pytest.approx(5.0)]
+
+
+def test_rate_limit_errors_are_recognised():
+    assert LLMRateLimiter.is_rate_limit_error(api_error(429))
+    assert not LLMRateLimiter.is_rate_limit_error(api_error(500))
+    assert not LLMRateLimiter.is_rate_limit_error(ValueError("no response"))
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after-ms": "1500"}, 1.5),
+    ({"retry-after": "7"}, 7.0),
+    ({"retry-after-ms": "250", "retry-after": "7"}, 0.25),
+    ({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}, None),
+    ({}, None),
+])
+def test_retry_after_is_read_from_the_response_headers(headers, expected):
+    assert LLMRateLimiter.retry_after_from_error(api_error(429, headers)) == expected
+
+
+def test_retry_after_without_response():
+    assert LLMRateLimiter.retry_after_from_error(ValueError("no response")) is None
+
+
+def test_backoff_is_capped(monkeypatch):
+    monkeypatch.setattr(llm_rate_limiter.global_config, "LLM_BACKOFF_BASE_SECONDS", 1)
+    monkeypatch.setattr(llm_rate_limiter.global_config, "LLM_BACKOFF_MAX_SECONDS", 8)
+    monkeypatch.setattr(llm_rate_limiter.random, "uniform", lambda low, high: high)
+    assert [LLMRateLimiter.backoff_time(attempt) for attempt in range(5)] == [1, 2, 4, 8, 8]
@@ -0,0 +1,68 @@
+import pytest
+from src.utils.llm_utils import llm_response_cache
+from src.utils.llm_utils.llm_response_cache import LLMResponseCache
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_response_cache.time, "time", clock)
+    return clock
+
+
+def reply(content: str) -> dict:
+    return {"content": content, "usage_metadata": {"input_tokens": 1, "output_tokens": 1, "total_tokens": 2}}
+
+
+def test_key_depends_on_model_temperature_and_prompt():
+    key = LLMResponseCache.make_key("gpt-4o", 0.4, "prompt")
+    assert key == LLMResponseCache.make_key("gpt-4o", 0.4, "prompt")
+    assert key != LLMResponseCache.make_key("gpt-4o-mini", 0.4, "prompt")
+    assert key != LLMResponseCache.make_key("gpt-4o", 0.0, "prompt")
+    assert key != LLMResponseCache.make_key("gpt-4o", 0.4, "other prompt")
+
+
+def test_hit_and_miss_are_counted(tmp_path, clock):
+    cache = LLMResponseCache(tmp_path / "cache.sqlite3", max_entries=10, max_age_seconds=0)
+    assert cache.get("a") is None
+    cache.put("a", "gpt-4o", reply("first"))
+    assert cache.get("a") == reply("first")
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, clock):
+    cache = LLMResponseCache(tmp_path / "cache.sqlite3", max_entries=2, max_age_seconds=0)
+    cache.put("a", "gpt-4o", reply("a"))
+    clock.now += 1
+    cache.put("b", "gpt-4o", reply("b"))
+    clock.now += 1
+    # Reading "a" makes "b" the least recently used entry
+    assert cache.get("a") is not None
+    clock.now += 1
+    cache.put("c", "gpt-4o", reply("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") == reply("a")
+    assert cache.get("c") == reply("c")
+
+
+def test_entries_expire_after_max_age(tmp_path, clock):
+    cache = LLMResponseCache(tmp_path / "cache.sqlite3", max_entries=0, max_age_seconds=60)
+    cache.put("a", "gpt-4o", reply("a"))
+    clock.now += 59
+    assert cache.get("a") is not None
+    clock.now += 2
+    assert cache.get("a") is None
+
+
+def test_cache_is_shared_through_the_database_file(tmp_path, clock):
+    LLMResponseCache(tmp_path / "cache.sqlite3").put("a", "gpt-4o", reply("a"))
+    assert LLMResponseCache(tmp_path / "cache.sqlite3").get("a") == reply("a")
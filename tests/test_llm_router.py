@@ -0,0 +1,111 @@
+import asyncio
+import httpx
+import openai
+import pytest
+from src.utils.llm_utils.llm_router import RoutedLlm, TierStats, tiers_for_category
+
+
+def api_error(status_code: int) -> openai.APIStatusError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    return openai.APIStatusError("error", response=httpx.Response(status_code, request=request), body=None)
+
+
+class FakeModel:
+    def __init__(self, llm_model: str, error: Exception = None):
+        self.llm_model = llm_model
+        self.temperature = 0.4
+        self.error = error
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        if self.error is not None:
+            raise self.error
+        return f"{self.llm_model}: {prompt}"
+
+
+class FakeLlmManager:
+    def __init__(self, models):
+        self.models = models
+
+    def tier_model(self, tier: str) -> FakeModel:
+        return self.models[tier]
+
+    def hedged_invoke(self, model: FakeModel, prompt):
+        return model.invoke(prompt)
+
+    async def hedged_ainvoke(self, model: FakeModel, prompt):
+        return model.invoke(prompt)
+
+
+@pytest.fixture(autouse=True)
+def empty_tier_stats(monkeypatch):
+    monkeypatch.setattr(TierStats, "stats", {})
+
+
+def invoke(routed: RoutedLlm, prompt: str, use_async: bool):
+    if use_async:
+        return asyncio.run(routed.ainvoke(prompt))
+    return routed.invoke(prompt)
+
+
+def test_categories_map_to_their_fallback_order():
+    assert tiers_for_category("summarize") == ["fast", "strong"]
+    assert tiers_for_category("html") == ["strong", "fast"]
+    assert tiers_for_category("unknown category") == ["strong", "fast"]
+
+
+@pytest.mark.parametrize("use_async", [False, True], ids=["sync", "async"])
+def test_first_tier_answers(use_async):
+    fast, strong = FakeModel("gpt-4o-mini"), FakeModel("gpt-4o")
+    routed = RoutedLlm(FakeLlmManager({"fast": fast, "strong": strong}), "summarize")
+
+    assert invoke(routed, "prompt", use_async) == "gpt-4o-mini: prompt"
+    assert strong.prompts == []
+    assert TierStats.summary()["fast"]["calls"] == 1
+
+
+@pytest.mark.parametrize("use_async", [False, True], ids=["sync", "async"])
+def test_failed_tier_falls_back_to_the_next_one(use_async):
+    fast, strong = FakeModel("gpt-4o-mini", api_error(500)), FakeModel("gpt-4o")
+    routed = RoutedLlm(FakeLlmManager({"fast": fast, "strong": strong}), "summarize")
+
+    assert invoke(routed, "prompt", use_async) == "gpt-4o: prompt"
+    summary = TierStats.summary()
+    assert summary["fast"]["failures"] == 1
+    assert summary["strong"] == dict(summary["strong"], calls=1, failures=0)
+
+
+@pytest.mark.parametrize("use_async", [False, True], ids=["sync", "async"])
+def test_rate_limited_tier_does_not_fall_back(use_async):
+    fast, strong = FakeModel("gpt-4o-mini", api_error(429)), FakeModel("gpt-4o")
+    routed = RoutedLlm(FakeLlmManager({"fast": fast, "strong": strong}), "summarize")
+
+    with pytest.raises(openai.APIStatusError) as raised:
+        invoke(routed, "prompt", use_async)
+
+    # OpenAiActionWrapper holds the calls of this model and retries it
+    assert raised.value.rate_limited_model == "gpt-4o-mini"
+    assert strong.prompts == []
+
+
+@pytest.mark.parametrize("use_async", [False, True], ids=["sync", "async"])
+def test_last_error_is_raised_when_every_tier_fails(use_async):
+    fast_error, strong_error = api_error(500), api_error(503)
+    routed = RoutedLlm(FakeLlmManager({
+        "fast": FakeModel("gpt-4o-mini", fast_error), "strong": FakeModel("gpt-4o", strong_error),
+    }), "summarize")
+
+    with pytest.raises(openai.APIStatusError) as raised:
+        invoke(routed, "prompt", use_async)
+
+    assert raised.value is strong_error
+
+
+def test_latency_percentiles():
+    for latency in [1.0, 2.0, 3.0, 4.0, 10.0]:
+        TierStats.record("fast", latency)
+    summary = TierStats.summary()["fast"]
+    assert summary["latency_mean"] == pytest.approx(4.0)
+    assert summary["latency_p50"] == 3.0
+    assert summary["latency_p95"] == 10.0
@@ -0,0 +1,105 @@
+import os
+import pytest
+from local_config import global_config
+from src.utils.chrome_utils import PDF_PRINT_OPTIONS
+from src.utils.pdf_render_cache import PDFRenderCache
+from src.utils.pdf_renderer import PDFRenderer
+from src.utils.render_assets import RenderAssets
+
+HTML = "<html><body><h1>Jane Doe</h1></body></html>"
+
+
+class CountingRenderer(PDFRenderer):
+    name = "counting"
+
+    def __init__(self):
+        self.rendered = []
+
+    def _render(self, html_content: str) -> bytes:
+        self.rendered.append(html_content)
+        return b"%PDF " + html_content.encode("utf-8")
+
+
+@pytest.fixture(autouse=True)
+def fresh_shared_cache(monkeypatch):
+    monkeypatch.setattr(PDFRenderCache, "_shared", None)
+
+
+def test_key_covers_everything_that_changes_the_pdf():
+    key = PDFRenderCache.make_key("chrome", HTML, PDF_PRINT_OPTIONS, "v1")
+    assert key == PDFRenderCache.make_key("chrome", HTML, dict(PDF_PRINT_OPTIONS), "v1")
+    assert key != PDFRenderCache.make_key("reportlab", HTML, PDF_PRINT_OPTIONS, "v1")
+    assert key != PDFRenderCache.make_key("chrome", HTML + " ", PDF_PRINT_OPTIONS, "v1")
+    assert key != PDFRenderCache.make_key("chrome", HTML, dict(PDF_PRINT_OPTIONS, landscape=True), "v1")
+    assert key != PDFRenderCache.make_key("chrome", HTML, PDF_PRINT_OPTIONS, "v2")
+
+
+def test_transfer_mode_does_not_change_the_key():
+    options = {name: value for name, value in PDF_PRINT_OPTIONS.items() if name != "transferMode"}
+    assert PDFRenderCache.make_key("chrome", HTML, dict(options, transferMode="ReturnAsStream"), "v1") == \
+        PDFRenderCache.make_key("chrome", HTML, dict(options, transferMode="ReturnAsBase64"), "v1")
+
+
+def test_pdfs_are_stored_and_copied(tmp_path):
+    cache = PDFRenderCache(tmp_path / "cache", max_bytes=10_000)
+    assert cache.get("key") is None
+    cache.put("key", b"%PDF data")
+    assert cache.get("key") == b"%PDF data"
+    assert cache.copy_to("key", tmp_path / "resume.pdf")
+    assert (tmp_path / "resume.pdf").read_bytes() == b"%PDF data"
+    assert not cache.copy_to("other key", tmp_path / "other.pdf")
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_least_recently_used_pdfs_are_evicted(tmp_path):
+    cache = PDFRenderCache(tmp_path / "cache", max_bytes=2500)
+    for age, key in enumerate(["old", "recent"]):
+        cache.put(key, b"x" * 1000)
+        os.utime(cache._path(key), (1000 + age, 1000 + age))
+    # Reading "old" makes it the most recently used
+    assert cache.get("old") is not None
+
+    cache.put("new", b"x" * 1000)
+
+    assert cache.get("recent") is None
+    assert cache.get("old") is not None
+    assert cache.get("new") is not None
+
+
+def test_cache_size_survives_a_restart(tmp_path):
+    PDFRenderCache(tmp_path / "cache").put("key", b"x" * 1000)
+    assert PDFRenderCache(tmp_path / "cache")._size == 1000
+
+
+def test_renderer_only_renders_documents_missing_from_the_cache():
+    renderer = CountingRenderer()
+    assert renderer.render(HTML) == b"%PDF " + HTML.encode("utf-8")
+    results = renderer.render_many([HTML, "<p>cover letter</p>", HTML])
+    assert results == [b"%PDF " + HTML.encode("utf-8"), b"%PDF <p>cover letter</p>", b"%PDF " + HTML.encode("utf-8")]
+    assert renderer.rendered == [HTML, "<p>cover letter</p>"]
+
+
+def test_render_to_file_is_served_from_the_cache(tmp_path):
+    renderer = CountingRenderer()
+    first_size = renderer.render_to_file(HTML, tmp_path / "first.pdf")
+    second_size = renderer.render_to_file(HTML, tmp_path / "second.pdf")
+    assert first_size == second_size
+    assert (tmp_path / "second.pdf").read_bytes() == (tmp_path / "first.pdf").read_bytes()
+    assert renderer.rendered == [HTML]
+
+
+def test_new_font_bundle_renders_again(monkeypatch):
+    renderer = CountingRenderer()
+    monkeypatch.setattr(RenderAssets, "version", classmethod(lambda cls: "bundle-1"))
+    renderer.render(HTML)
+    monkeypatch.setattr(RenderAssets, "version", classmethod(lambda cls: "bundle-2"))
+    renderer.render(HTML)
+    assert renderer.rendered == [HTML, HTML]
+
+
+def test_disabled_cache_always_renders(monkeypatch):
+    monkeypatch.setattr(global_config, "PDF_RENDER_CACHE_ENABLED", False)
+    renderer = CountingRenderer()
+    renderer.render(HTML)
+    renderer.render(HTML)
+    assert renderer.rendered == [HTML, HTML]
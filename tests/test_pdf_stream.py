@@ -0,0 +1,61 @@
+import base64
+import pytest
+from src.utils import chrome_utils
+from src.utils.chrome_utils import write_pdf_stream
+
+
+class FakeDevTools:
+    # Serves IO.read for a stream handle the way Chrome does, in chunks of at most the requested size
+    def __init__(self, data: bytes, base64_encoded: bool = True, fail_after_reads: int = None):
+        self.data = data
+        self.base64_encoded = base64_encoded
+        self.fail_after_reads = fail_after_reads
+        self.position = 0
+        self.commands = []
+
+    def send(self, method: str, params: dict) -> dict:
+        self.commands.append((method, params))
+        if method == "IO.close":
+            return {}
+        reads = sum(1 for command, _ in self.commands if command == "IO.read")
+        if self.fail_after_reads is not None and reads > self.fail_after_reads:
+            raise RuntimeError("target closed")
+        chunk = self.data[self.position:self.position + params["size"]]
+        self.position += len(chunk)
+        return {
+            "data": base64.b64encode(chunk).decode("ascii") if self.base64_encoded else chunk.decode("utf-8"),
+            "base64Encoded": self.base64_encoded,
+            "eof": self.position >= len(self.data),
+        }
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(chrome_utils, "PDF_STREAM_CHUNK_SIZE", 1024)
+
+
+def test_stream_is_copied_chunk_by_chunk(tmp_path):
+    pdf = b"%PDF-1.7\n" + bytes(range(256)) * 20 + b"\n%%EOF"
+    devtools = FakeDevTools(pdf)
+
+    written = write_pdf_stream(devtools.send, "stream-1", tmp_path / "resume.pdf")
+
+    assert written == len(pdf)
+    assert (tmp_path / "resume.pdf").read_bytes() == pdf
+    reads = [params for method, params in devtools.commands if method == "IO.read"]
+    assert len(reads) == -(-len(pdf) // 1024)
+    assert all(params == {"handle": "stream-1", "size": 1024} for params in reads)
+    assert devtools.commands[-1] == ("IO.close", {"handle": "stream-1"})
+
+
+def test_text_chunks_are_written_as_utf8(tmp_path):
+    devtools = FakeDevTools(b"%PDF-1.7 plain text stream", base64_encoded=False)
+    write_pdf_stream(devtools.send, "stream-1", tmp_path / "resume.pdf")
+    assert (tmp_path / "resume.pdf").read_bytes() == b"%PDF-1.7 plain text stream"
+
+
+def test_stream_is_closed_when_a_read_fails(tmp_path):
+    devtools = FakeDevTools(b"x" * 4096, fail_after_reads=2)
+    with pytest.raises(RuntimeError):
+        write_pdf_stream(devtools.send, "stream-1", tmp_path / "resume.pdf")
+    assert devtools.commands[-1] == ("IO.close", {"handle": "stream-1"})
@@ -0,0 +1,78 @@
+import pytest
+from local_config import global_config
+from src.data_objects.resume import ExperienceDetails, Project
+from src.utils.llm_utils.prompt_budget import PromptBudgeter
+
+TEMPLATE = "Tailor this experience:\n{experience_details}\nfor the job:\n{job_description}"
+
+
+@pytest.fixture
+def budgeter():
+    budgeter = PromptBudgeter("gpt-4o")
+    # Four characters per token whether or not tiktoken can load its encoding here
+    budgeter._encoding = None
+    return budgeter
+
+
+def experience(bullets: int) -> ExperienceDetails:
+    return ExperienceDetails(
+        position="Engineer", company="Acme", employment_period="2020 - 2024", location="Remote", industry="Space",
+        key_responsibilities=[{"responsibility": f"Responsibility number {i}"} for i in range(bullets)],
+        skills_acquired=[f"skill {i}" for i in range(bullets)],
+    )
+
+
+def test_strip_boilerplate_drops_legal_text_and_duplicates():
+    text = ("Build rockets in Python.\n\nBuild rockets in  Python.\n\n"
+            "We are an equal opportunity employer.\n\nBenefits include free snacks.")
+    assert PromptBudgeter.strip_boilerplate(text) == "Build rockets in Python."
+
+
+def test_truncate_lists_cuts_bullets_but_keeps_every_entry():
+    truncated = PromptBudgeter.truncate_lists([experience(10), experience(2)], 3)
+    assert len(truncated) == 2
+    assert [len(entry.key_responsibilities) for entry in truncated] == [3, 2]
+    assert [len(entry.skills_acquired) for entry in truncated] == [3, 2]
+    assert truncated[0].company == "Acme"
+
+
+def test_truncate_lists_leaves_other_lists_alone():
+    projects = [Project(name=f"Project {i}", description="A project") for i in range(10)]
+    assert PromptBudgeter.truncate_lists(projects, 3, ["key_responsibilities"]) == projects
+
+
+def test_prompt_under_budget_is_unchanged(budgeter):
+    inputs = {"experience_details": [experience(10)], "job_description": "Python developer"}
+    prompt, stats = budgeter.fit("experience", TEMPLATE, inputs)
+    assert stats["steps"] == []
+    assert stats["tokens_before"] == stats["tokens_after"]
+    assert "Responsibility number 9" in prompt.to_string()
+
+
+def test_compression_steps_stop_once_the_prompt_fits(budgeter, monkeypatch):
+    inputs = {"experience_details": [experience(40)], "job_description": "Python developer"}
+    _, full_tokens = budgeter._render(TEMPLATE, inputs)
+    _, six_bullets_tokens = budgeter._render(TEMPLATE, dict(inputs, experience_details=[experience(6)]))
+    monkeypatch.setitem(global_config.LLM_PROMPT_TOKEN_BUDGETS, "experience", six_bullets_tokens)
+
+    prompt, stats = budgeter.fit("experience", TEMPLATE, inputs)
+
+    assert stats["steps"] == ["truncate_lists_6"]
+    assert stats["tokens_before"] == full_tokens
+    assert stats["tokens_after"] <= six_bullets_tokens
+    assert "Responsibility number 5" in prompt.to_string()
+    assert "Responsibility number 6" not in prompt.to_string()
+
+
+def test_job_description_is_cut_last(budgeter, monkeypatch):
+    job_description = "Python developer. " * 400
+    inputs = {"experience_details": [experience(1)], "job_description": job_description}
+    monkeypatch.setitem(global_config.LLM_PROMPT_TOKEN_BUDGETS, "experience", 200)
+
+    prompt, stats = budgeter.fit("experience", TEMPLATE, inputs)
+
+    assert stats["steps"][-1] == "truncate_job_description"
+    assert stats["tokens_after"] <= 200
+    content = prompt.to_messages()[0].content
+    assert content.startswith("Tailor this experience:")
+    assert "Python developer." in content
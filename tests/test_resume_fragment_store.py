@@ -0,0 +1,78 @@
+import os
+import time
+from pathlib import Path
+import pytest
+from src.data_objects.resume import Resume
+from src.utils.llm_utils import llm_client_registry
+from src.utils.llm_utils.llm_resumer import LLMResumer
+from src.utils.llm_utils.resume_fragment_store import ResumeFragmentStore, content_hash
+
+RESUME_PATH = Path("data_folder_example/plain_text_resume.yaml")
+
+
+def key(inputs=None, template="Write {section}", model_name="gpt-4o", output_format="html"):
+    return ResumeFragmentStore.make_key("experience", inputs or {"company": "Acme"}, template, model_name, output_format)
+
+
+def test_fragments_round_trip(tmp_path):
+    store = ResumeFragmentStore(tmp_path / "fragments")
+    assert store.get(key()) is None
+    store.put(key(), "<section>Acme</section>")
+    assert ResumeFragmentStore(tmp_path / "fragments").get(key()) == "<section>Acme</section>"
+    assert (store.hits, store.misses) == (0, 1)
+
+
+def test_key_changes_with_what_produced_the_fragment():
+    assert key() == key()
+    assert key({"skills": {"python", "sql"}}) == key({"skills": {"sql", "python"}})
+    assert key({"company": "Globex"})["key"] != key()["key"]
+    assert key(template="Rewrite {section}")["key"] != key()["key"]
+    assert key(model_name="gpt-4o-mini")["key"] != key()["key"]
+    assert key(output_format="json")["key"] != key()["key"]
+
+
+def test_content_hash_covers_pydantic_models():
+    resume = Resume(RESUME_PATH.read_text(encoding="utf-8"))
+    edited = Resume(RESUME_PATH.read_text(encoding="utf-8"))
+    assert content_hash(resume) == content_hash(edited)
+    edited.experience_details[0].company = "Globex"
+    assert content_hash(resume.experience_details) != content_hash(edited.experience_details)
+
+
+def test_prune_removes_fragments_unused_for_max_age(tmp_path):
+    store = ResumeFragmentStore(tmp_path / "fragments")
+    store.put(key({"company": "Acme"}), "acme")
+    store.put(key({"company": "Globex"}), "globex")
+    old = time.time() - 3600
+    for path in store.directory.glob("*.json"):
+        os.utime(path, (old, old))
+    # Reading a fragment marks it used
+    store.get(key({"company": "Acme"}))
+
+    store.prune(max_age_seconds=60)
+
+    assert store.get(key({"company": "Acme"})) == "acme"
+    assert store.get(key({"company": "Globex"})) is None
+
+
+def generate_sections(resume: Resume) -> LLMResumer:
+    resumer = LLMResumer("sk-test", output_format="html")
+    resumer.set_resume(resume)
+    resumer.set_job_description_from_text("Python developer at Acme Rockets", summarize=False)
+    llm_client_registry.run_async(resumer.agenerate_sections())
+    return resumer
+
+
+@pytest.mark.usefixtures("mock_server")
+def test_only_sections_with_changed_inputs_are_regenerated():
+    resume = Resume(RESUME_PATH.read_text(encoding="utf-8"))
+    store = generate_sections(resume).fragment_store
+    section_count = store.misses
+    assert section_count > 0 and store.hits == 0
+
+    generate_sections(resume)
+    assert (store.hits, store.misses) == (section_count, section_count)
+
+    resume.experience_details[0].key_responsibilities[0] = {"responsibility": "Led the migration to Python 3"}
+    generate_sections(resume)
+    assert (store.hits, store.misses) == (2 * section_count - 1, section_count + 1)